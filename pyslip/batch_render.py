@@ -0,0 +1,195 @@
+"""
+Render batches of static map images using a pool of worker processes.
+
+Each worker process creates its own tile source and StaticMap renderer once
+and reuses them for every job it's given, so the in-memory tile cache stays
+warm.  All workers share the tile source on-disk cache directory, tiles are
+written atomically so one worker never reads a partial tile saved by another.
+
+Workers don't share tile requests.  A tile not yet on-disk is fetched by
+every worker that needs it before any of them has saved it, so a batch
+over a cold cache may fetch the same tile several times.  If that matters,
+render a first batch covering the area with one process to fill the
+on-disk cache.
+
+A job is a dictionary with these keys:
+    level     the tile level to render
+    centre    a tuple (xgeo, ygeo) of the view centre
+    size      a tuple (width, height) of the image size in pixels
+    layers    optional list of (type, data, kwargs) tuples, where 'type' is
+              one of 'point', 'image', 'text', 'polygon' or 'polyline' and
+              'data' and 'kwargs' are passed to the matching Add*Layer()
+    filename  optional path of the file to write the image to
+
+Results are returned in job order as they complete:
+
+    with BatchRenderer('pyslip.open_street_map') as renderer:
+        for (job, result) in renderer.Render(jobs):
+            ...
+        print('%.1f images/second' % renderer.ImagesPerSecond())
+
+The result for a job is the filename written if the job had a 'filename',
+otherwise the PNG image data as bytes.  If some tiles for the image didn't
+arrive in time the result is still returned, but with those tiles showing
+the tile source 'pending' image.
+"""
+
+import io
+import time
+import importlib
+import multiprocessing
+import wx
+from pyslip.static_map import StaticMap
+import pyslip.log as log
+
+try:
+    log = log.Log('pyslip.log')
+except AttributeError:
+    # means log already set up
+    pass
+
+
+# state of a worker process, set in init_worker()
+_worker = {}
+
+
+def init_worker(tile_module, tile_kwargs, timeout):
+    """Initialise a worker process.
+
+    tile_module  name of the tile source module, eg, 'pyslip.open_street_map'
+    tile_kwargs  dictionary of keyword args for the module Tiles() object
+    timeout      seconds to wait for the tiles of one image
+    """
+
+    _worker['app'] = wx.App(False)
+    module = importlib.import_module(tile_module)
+    tile_src = module.Tiles(**tile_kwargs)
+    tile_src.SetSharedDisk(True)
+    _worker['tile_src'] = tile_src
+    _worker['timeout'] = timeout
+    _worker['renderer'] = None
+
+
+def render_job(job):
+    """Render one job in a worker process.
+
+    job  the job dictionary, see module documentation
+
+    Returns the filename written or the PNG image data as bytes.
+    """
+
+    level = job['level']
+    centre = job['centre']
+    size = job['size']
+
+    renderer = _worker['renderer']
+    if renderer is None:
+        renderer = StaticMap(_worker['tile_src'], level, centre, size)
+        _worker['renderer'] = renderer
+    else:
+        # reuse the renderer, remove the previous job's layers
+        renderer.ClearLayers()
+        renderer.SetSize(size)
+        if not renderer.GotoLevelAndPosition(level, centre):
+            msg = "Tile source doesn't have level %s" % str(level)
+            raise ValueError(msg)
+
+    add_layer = {'point': renderer.AddPointLayer,
+                 'image': renderer.AddImageLayer,
+                 'text': renderer.AddTextLayer,
+                 'polygon': renderer.AddPolygonLayer,
+                 'polyline': renderer.AddPolylineLayer}
+    for (layer_type, data, kwargs) in job.get('layers', []):
+        add_layer[layer_type](data, **kwargs)
+
+    bitmap = renderer.Render(_worker['timeout'])
+
+    filename = job.get('filename', None)
+    if filename:
+        bitmap.SaveFile(filename, wx.BITMAP_TYPE_PNG)
+        return filename
+
+    stream = io.BytesIO()
+    bitmap.ConvertToImage().SaveFile(stream, wx.BITMAP_TYPE_PNG)
+    return stream.getvalue()
+
+
+###############################################################################
+# The batch renderer
+###############################################################################
+
+class BatchRenderer(object):
+    """Render static map images across a pool of worker processes."""
+
+    def __init__(self, tile_module, tile_kwargs=None, processes=None,
+                 timeout=StaticMap.DefaultTimeout):
+        """Initialise a BatchRenderer instance.
+
+        tile_module  name of the tile source module, eg, 'pyslip.gmt_local'
+        tile_kwargs  dictionary of keyword args for the module Tiles() object
+        processes    number of worker processes (default is number of CPUs)
+        timeout      seconds each worker waits for the tiles of one image
+
+        Worker processes are started with the 'spawn' method as wxPython
+        doesn't survive a fork().
+        """
+
+        if tile_kwargs is None:
+            tile_kwargs = {}
+
+        context = multiprocessing.get_context('spawn')
+        self.pool = context.Pool(processes=processes,
+                                 initializer=init_worker,
+                                 initargs=(tile_module, tile_kwargs, timeout))
+
+        self.count = 0              # number of images rendered
+        self.elapsed = 0.0          # seconds spent rendering
+
+    def Render(self, jobs, chunksize=1):
+        """Render a batch of jobs.
+
+        jobs       an iterable of job dictionaries
+        chunksize  number of jobs sent to a worker at a time
+
+        A generator yielding (job, result) tuples in the same order as 'jobs'.
+        A result is yielded as soon as it and all earlier results are done.
+        """
+
+        jobs = list(jobs)
+        start = time.time()
+        count = 0
+        try:
+            results = self.pool.imap(render_job, jobs, chunksize)
+            for (job, result) in zip(jobs, results):
+                count += 1
+                yield (job, result)
+        finally:
+            elapsed = time.time() - start
+            self.count += count
+            self.elapsed += elapsed
+            if elapsed > 0:
+                log('BatchRenderer: %d images in %.2fs, %.1f images/second'
+                    % (count, elapsed, count / elapsed))
+
+    def ImagesPerSecond(self):
+        """Return the rendering rate of all batches so far."""
+
+        if self.elapsed <= 0:
+            return 0.0
+        return self.count / self.elapsed
+
+    def Close(self):
+        """Shut down the worker processes."""
+
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.Close()
+        else:
+            self.pool.terminate()
+        return False
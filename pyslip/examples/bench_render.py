@@ -0,0 +1,340 @@
+"""
+Benchmark pySlip rendering of large layers.
+
+Usage: bench_render.py [-h] [-o <file>] [-r <repeats>] [-s <sizes>]
+                       [-t <dir>] [-l <layers>]
+
+where -h            prints this help and stops
+      -o <file>     write JSON results to <file> (default is stdout)
+      -r <repeats>  number of times each measurement is repeated (default 5)
+      -s <sizes>    comma separated list of object counts
+                    (default 1000,10000,100000,1000000)
+      -t <dir>      directory for the generated tile set (default is a
+                    temporary directory)
+      -l <layers>   comma separated list of layer types to benchmark
+                    (default point,polygon,polyline)
+
+Measures, for synthetic point, polygon and polyline layers of each size:
+    add_layer    time to add the layer
+    draw         time for one Draw() of the view
+    pan_frame    time to draw one frame while panning
+    zoom         time to change level and redraw
+    select       time for a point select in the view centre
+    box_select   time for a box select of the central quarter of the view
+
+The map is a generated local tile set, so no network or installed tiles are
+needed.  Results are JSON so runs on different versions can be compared.
+The widget needs a display, run headless under Xvfb:
+
+    xvfb-run -a python3 bench_render.py -o results.json
+"""
+
+
+import os
+import sys
+import json
+import time
+import pickle
+import random
+import platform
+import tempfile
+import wx
+import pyslip
+import pyslip.gmt_local as tiles
+
+
+######
+# Various benchmark constants
+######
+
+ViewWidth = 800
+ViewHeight = 600
+DefaultAppSize = (ViewWidth, ViewHeight)
+
+DefaultRepeats = 5
+DefaultSizes = [1000, 10000, 100000, 1000000]
+DefaultLayers = ['point', 'polygon', 'polyline']
+
+# the generated tile set
+TileSize = 256
+TileLevels = range(5)
+TileExtent = (-65.0, 295.0, -66.66, 66.66)      # same as GMT tiles
+
+# the benchmark view
+BenchLevel = 2
+BenchCentre = (115.0, 0.0)
+
+# seed for synthetic data, so every run draws the same objects
+RandomSeed = 12345
+
+# number of frames in a pan, and pixels moved each frame
+PanFrames = 20
+PanStep = 10
+
+
+def generate_tiles(tiles_dir):
+    """Generate a local tile set in GMT tile layout.
+
+    tiles_dir  directory to write tiles into
+
+    Does nothing if the tile set already exists.
+    """
+
+    (min_x, max_x, min_y, max_y) = TileExtent
+    for level in TileLevels:
+        level_dir = os.path.join(tiles_dir, '%d' % level)
+        info_file = os.path.join(level_dir, tiles.TileInfoFilename)
+        if os.path.isfile(info_file):
+            continue
+
+        num_tiles = 2 ** level
+        for x in range(num_tiles):
+            col_dir = os.path.join(level_dir, '%d' % x)
+            os.makedirs(col_dir, exist_ok=True)
+            for y in range(num_tiles):
+                bitmap = wx.Bitmap(TileSize, TileSize)
+                dc = wx.MemoryDC(bitmap)
+                if (x + y) % 2:
+                    dc.SetBackground(wx.Brush(wx.Colour(200, 220, 200)))
+                else:
+                    dc.SetBackground(wx.Brush(wx.Colour(220, 220, 240)))
+                dc.Clear()
+                dc.DrawText('%d/%d/%d' % (level, x, y), 10, 10)
+                dc.SelectObject(wx.NullBitmap)
+                bitmap.SaveFile(os.path.join(col_dir, '%d.png' % y),
+                                wx.BITMAP_TYPE_PNG)
+
+        ppd_x = num_tiles * TileSize / (max_x - min_x)
+        ppd_y = num_tiles * TileSize / (max_y - min_y)
+        with open(info_file, 'wb') as fd:
+            pickle.dump((num_tiles, num_tiles, ppd_x, ppd_y), fd)
+
+
+def make_points(rnd, count):
+    """Return a list of 'count' random points on the map."""
+
+    (min_x, max_x, min_y, max_y) = TileExtent
+    return [(rnd.uniform(min_x, max_x), rnd.uniform(min_y, max_y))
+            for _ in range(count)]
+
+
+def make_shapes(rnd, count, closed):
+    """Return a list of 'count' random small polygons or polylines.
+
+    Each shape is a tuple (points, attributes) ready for AddPolygonLayer()
+    or AddPolylineLayer().
+    """
+
+    shapes = []
+    for (x, y) in make_points(rnd, count):
+        points = [(x + rnd.uniform(-1.0, 1.0), y + rnd.uniform(-1.0, 1.0))
+                  for _ in range(5)]
+        if closed:
+            points.append(points[0])
+        shapes.append((points, {}))
+    return shapes
+
+
+def summary(times):
+    """Return a dictionary of statistics of a list of times."""
+
+    times = sorted(times)
+    return {'mean': sum(times) / len(times),
+            'min': times[0],
+            'median': times[len(times) // 2],
+            'max': times[-1]}
+
+
+################################################################################
+# The benchmark frame
+################################################################################
+
+class BenchFrame(wx.Frame):
+    def __init__(self, tiles_dir):
+        """Create the frame holding the widget being measured."""
+
+        wx.Frame.__init__(self, None, size=DefaultAppSize,
+                          title='PySlip %s - rendering benchmark'
+                                % pyslip.__version__)
+        self.tile_src = tiles.Tiles(tiles_dir=tiles_dir)
+        self.pyslip = pyslip.pySlip(self, tile_src=self.tile_src)
+        self.Show(True)
+
+    def goto_start(self):
+        """Put the view at the benchmark start position."""
+
+        self.pyslip.GotoLevelAndPosition(BenchLevel, BenchCentre)
+
+    def zoom(self, level):
+        """Change level and redraw now, the widget would redraw when idle."""
+
+        self.pyslip.GotoLevelAndPosition(level, BenchCentre)
+        self.pyslip.Update()
+
+    def timed(self, func, *args):
+        """Return the seconds taken by func(*args)."""
+
+        start = time.perf_counter()
+        func(*args)
+        return time.perf_counter() - start
+
+    def bench_layer(self, layer_type, count, repeats):
+        """Benchmark one synthetic layer.
+
+        layer_type  one of 'point', 'polygon' or 'polyline'
+        count       number of objects in the layer
+        repeats     number of times each measurement is made
+
+        Returns a dictionary of results.
+        """
+
+        widget = self.pyslip
+        rnd = random.Random(RandomSeed)
+        if layer_type == 'point':
+            data = make_points(rnd, count)
+            add = widget.AddPointLayer
+        elif layer_type == 'polygon':
+            data = make_shapes(rnd, count, closed=True)
+            add = widget.AddPolygonLayer
+        else:
+            data = make_shapes(rnd, count, closed=False)
+            add = widget.AddPolylineLayer
+
+        self.goto_start()
+        start = time.perf_counter()
+        layer_id = add(data, selectable=True, name='bench')
+        add_time = time.perf_counter() - start
+        layer = widget.layer_mapping[layer_id]
+
+        # plain redraw
+        draw = [self.timed(widget.Update) for _ in range(repeats)]
+
+        # pan, one frame per step
+        pan = []
+        for _ in range(repeats):
+            self.goto_start()
+            for _ in range(PanFrames):
+                widget.view_offset_x += PanStep
+                widget.RecalcViewLimits()
+                pan.append(self.timed(widget.Update))
+
+        # zoom in and back out
+        zoom = []
+        for _ in range(repeats):
+            zoom.append(self.timed(self.zoom, BenchLevel + 1))
+            zoom.append(self.timed(self.zoom, BenchLevel))
+
+        # point select in centre of view, box select of central quarter
+        self.goto_start()
+        centre = widget.View2Geo((ViewWidth // 2, ViewHeight // 2))
+        ll = widget.View2Geo((ViewWidth // 4, ViewHeight * 3 // 4))
+        ur = widget.View2Geo((ViewWidth * 3 // 4, ViewHeight // 4))
+        select = [self.timed(widget.layerPSelHandler[layer.type],
+                             layer, centre) for _ in range(repeats)]
+        box_select = [self.timed(widget.layerBSelHandler[layer.type],
+                                 layer, ll, ur) for _ in range(repeats)]
+
+        widget.DeleteLayer(layer_id)
+
+        return {'layer': layer_type,
+                'count': count,
+                'add_layer': add_time,
+                'draw': summary(draw),
+                'pan_frame': summary(pan),
+                'zoom': summary(zoom),
+                'select': summary(select),
+                'box_select': summary(box_select)}
+
+################################################################################
+
+if __name__ == '__main__':
+    import getopt
+    import traceback
+
+    # print some usage information
+    def usage(msg=None):
+        if msg:
+            print(msg+'\n')
+        print(__doc__)        # module docstring used
+
+    # our own handler for uncaught exceptions
+    def excepthook(type, value, tb):
+        msg = '\n' + '=' * 80
+        msg += '\nUncaught exception:\n'
+        msg += ''.join(traceback.format_exception(type, value, tb))
+        msg += '=' * 80 + '\n'
+        print(msg)
+        sys.exit(1)
+
+    # plug our handler into the python system
+    sys.excepthook = excepthook
+
+    argv = sys.argv[1:]
+
+    try:
+        (opts, args) = getopt.getopt(argv, 'hl:o:r:s:t:',
+                                     ['help', 'layers=', 'output=',
+                                      'repeats=', 'sizes=', 'tiles='])
+    except getopt.error:
+        usage()
+        sys.exit(1)
+
+    output = None
+    repeats = DefaultRepeats
+    sizes = DefaultSizes
+    layers = DefaultLayers
+    tiles_dir = None
+
+    for (opt, param) in opts:
+        if opt in ['-h', '--help']:
+            usage()
+            sys.exit(0)
+        elif opt in ['-l', '--layers']:
+            layers = param.split(',')
+            for layer_type in layers:
+                if layer_type not in DefaultLayers:
+                    usage("Unrecognized layer type: %s" % layer_type)
+                    sys.exit(1)
+        elif opt in ['-o', '--output']:
+            output = param
+        elif opt in ['-r', '--repeats']:
+            repeats = int(param)
+        elif opt in ['-s', '--sizes']:
+            sizes = [int(size) for size in param.split(',')]
+        elif opt in ['-t', '--tiles']:
+            tiles_dir = param
+
+    if tiles_dir is None:
+        tiles_dir = os.path.join(tempfile.gettempdir(), 'pyslip_bench_tiles')
+
+    app = wx.App()
+    generate_tiles(tiles_dir)
+    frame = BenchFrame(tiles_dir)
+    wx.Yield()
+
+    results = []
+    for layer_type in layers:
+        for count in sizes:
+            results.append(frame.bench_layer(layer_type, count, repeats))
+            wx.Yield()
+
+    report = {'pyslip_version': pyslip.__version__,
+              'wx_version': wx.version(),
+              'python_version': platform.python_version(),
+              'platform': platform.platform(),
+              'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'view_size': [ViewWidth, ViewHeight],
+              'level': BenchLevel,
+              'centre': BenchCentre,
+              'seed': RandomSeed,
+              'repeats': repeats,
+              'results': results}
+
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, 'w') as fd:
+            fd.write(text + '\n')
+    else:
+        print(text)
+
+    frame.Destroy()
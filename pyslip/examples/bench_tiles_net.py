@@ -0,0 +1,299 @@
+"""
+Benchmark server tile fetching against a local tile server.
+
+Usage: bench_tiles_net.py [-h] [-o <file>] [-s <scripts>] [-d <dwell>]
+                          [-w <workers>] [-l <latency>] [-e <rate>]
+                          [-t <rate>] [-b <bytes/sec>]
+
+where -h               prints this help and stops
+      -o <file>        write JSON results to <file> (default is stdout)
+      -s <scripts>     comma separated list of scripts to run: pan, zoom
+                       (default pan,zoom)
+      -d <dwell>       seconds spent at each step of a script (default 0.2)
+      -w <workers>     number of fetch workers (default 2)
+      -l <latency>     server seconds delay before each response
+      -e <rate>        fraction of requests the server fails with 500
+      -t <rate>        fraction of requests the server answers with 429
+      -b <bytes/sec>   server bandwidth cap for each response
+
+Starts a local tile server (tile_server.py) and drives a tiles_net.Tiles
+source through scripted pans and zooms, as a user would.  Each step of a
+script requests the tiles in an 800x600 view and then waits 'dwell' seconds
+before moving on, whether or not the view is complete.  Reported are:
+    time_to_complete  seconds from a view being asked for until all its
+                      tiles are available (views never completed are counted)
+    tiles_per_second  tiles served per second over the whole script
+    wasted_fetches    tiles served that were not in the view at the time, or
+                      were served more than once
+plus the tile source GetStats() snapshot.
+
+Needs a wx.App, so run headless under Xvfb:
+
+    xvfb-run -a python3 bench_tiles_net.py -l 0.05 -o results.json
+"""
+
+
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import wx
+import pyslip
+import pyslip.tiles_net as tiles_net
+import pyslip.open_street_map as open_street_map
+from pyslip.static_map import StaticMap
+from tile_server import TileServer
+
+
+######
+# Various benchmark constants
+######
+
+ViewSize = (800, 600)
+
+DefaultDwell = 0.2
+DefaultWorkers = 2
+DefaultScripts = ['pan', 'zoom']
+
+# seconds we wait at the end of a script for outstanding tiles
+FinishTimeout = 30.0
+
+# the scripts - lists of (level, centre) view steps
+StartCentre = (150.0, -30.0)
+Scripts = {'pan': [(6, (StartCentre[0] + step*2.0, StartCentre[1]))
+                   for step in range(20)],
+           'zoom': [(level, StartCentre) for level in range(3, 10)]
+                   + [(level, StartCentre) for level in range(8, 2, -1)]}
+
+
+class BenchTiles(open_street_map.Tiles):
+    """OpenStreetMap-like tiles from the local tile server."""
+
+    def __init__(self, server_url, tiles_dir, workers):
+        tiles_net.Tiles.__init__(self, open_street_map.TileLevels,
+                                 self.TileWidth, self.TileHeight,
+                                 tiles_dir=tiles_dir, max_lru=10000,
+                                 servers=[server_url],
+                                 url_path='/{Z}/{X}/{Y}.png',
+                                 max_server_requests=workers,
+                                 shared=False)
+        self.wrap_x = True
+        self.level = min(open_street_map.TileLevels)
+        (self.num_tiles_x, self.num_tiles_y,
+                         self.ppd_x, self.ppd_y) = self.GetInfo(self.level)
+
+
+def view_keys(view):
+    """Return the set of (level, x, y) tile keys visible in a view."""
+
+    (_, _, col_list, row_list) = view.view_tiles()
+    num_x = view.tile_src.num_tiles_x
+    return {(view.level, x % num_x, y) for x in col_list for y in row_list}
+
+
+def run_script(name, steps, server, workers, dwell):
+    """Run one pan/zoom script against a fresh tile source.
+
+    name     the script name
+    steps    list of (level, centre) view steps
+    server   the TileServer
+    workers  number of fetch workers
+    dwell    seconds spent at each step
+
+    Returns a dictionary of results.
+    """
+
+    app = wx.GetApp()
+    tiles_dir = tempfile.mkdtemp(prefix='pyslip_bench_')
+    tile_src = BenchTiles(server.url, tiles_dir, workers)
+    (level, centre) = steps[0]
+    view = StaticMap(tile_src, level, centre, ViewSize)
+
+    # don't let the server probe request count as a fetch
+    tile_src.service.probe_started = True
+    server.reset()
+
+    def available(key):
+        return key in tile_src.cache or key in tile_src.failed_tiles
+
+    views = []          # list of (start_time, keys) for each step
+    outstanding = []    # list of (start_time, keys) of incomplete views
+    complete_times = []
+
+    def check_outstanding():
+        now = time.time()
+        for pending in outstanding[:]:
+            (start, keys) = pending
+            if all(available(key) for key in keys):
+                complete_times.append(now - start)
+                outstanding.remove(pending)
+
+    script_start = time.time()
+    for (level, centre) in steps:
+        view.GotoLevelAndPosition(level, centre)
+        keys = view_keys(view)
+        start = time.time()
+        views.append((start, keys))
+        outstanding.append((start, keys))
+
+        # ask for the view, as a widget Draw() would
+        (_, _, col_list, row_list) = view.view_tiles()
+        for x in col_list:
+            for y in row_list:
+                tile_src.GetTile(x, y)
+
+        # let tiles arrive while the user looks at the view
+        while time.time() - start < dwell:
+            app.ProcessPendingEvents()
+            check_outstanding()
+            time.sleep(0.005)
+
+    # wait for the last view to finish
+    (_, last_keys) = views[-1]
+    deadline = time.time() + FinishTimeout
+    while time.time() < deadline:
+        if all(available(key) for key in last_keys):
+            break
+        app.ProcessPendingEvents()
+        check_outstanding()
+        time.sleep(0.005)
+    check_outstanding()
+    elapsed = time.time() - script_start
+
+    # a served tile is wasted if it wasn't in the view shown when it arrived,
+    # or if it had already been served
+    wasted = 0
+    seen = set()
+    served_ok = 0
+    for (served_time, key, status) in server.served:
+        if status != 200:
+            continue
+        served_ok += 1
+        current = views[0][1]
+        for (view_start, keys) in views:
+            if view_start > served_time:
+                break
+            current = keys
+        if key in seen or key not in current:
+            wasted += 1
+        seen.add(key)
+
+    stats = tile_src.GetStats()
+    tile_src.FlushRequests()
+    shutil.rmtree(tiles_dir, ignore_errors=True)
+
+    return {'script': name,
+            'steps': len(steps),
+            'elapsed': elapsed,
+            'views_completed': len(complete_times),
+            'views_incomplete': len(outstanding),
+            'time_to_complete': {'mean': (sum(complete_times)
+                                          / max(1, len(complete_times))),
+                                 'max': max(complete_times, default=0.0)},
+            'requests': len(server.served),
+            'tiles_served': served_ok,
+            'tiles_per_second': served_ok / elapsed if elapsed else 0.0,
+            'wasted_fetches': wasted,
+            'tile_stats': stats}
+
+################################################################################
+
+if __name__ == '__main__':
+    import getopt
+    import traceback
+
+    # print some usage information
+    def usage(msg=None):
+        if msg:
+            print(msg+'\n')
+        print(__doc__)        # module docstring used
+
+    # our own handler for uncaught exceptions
+    def excepthook(type, value, tb):
+        msg = '\n' + '=' * 80
+        msg += '\nUncaught exception:\n'
+        msg += ''.join(traceback.format_exception(type, value, tb))
+        msg += '=' * 80 + '\n'
+        print(msg)
+        sys.exit(1)
+
+    # plug our handler into the python system
+    sys.excepthook = excepthook
+
+    argv = sys.argv[1:]
+
+    try:
+        (opts, args) = getopt.getopt(argv, 'b:d:e:hl:o:s:t:w:',
+                                     ['bandwidth=', 'dwell=', 'errors=',
+                                      'help', 'latency=', 'output=',
+                                      'scripts=', 'throttle=', 'workers='])
+    except getopt.error:
+        usage()
+        sys.exit(1)
+
+    output = None
+    scripts = DefaultScripts
+    dwell = DefaultDwell
+    workers = DefaultWorkers
+    latency = 0.0
+    error_rate = 0.0
+    throttle_rate = 0.0
+    bandwidth = None
+
+    for (opt, param) in opts:
+        if opt in ['-b', '--bandwidth']:
+            bandwidth = int(param)
+        elif opt in ['-d', '--dwell']:
+            dwell = float(param)
+        elif opt in ['-e', '--errors']:
+            error_rate = float(param)
+        elif opt in ['-h', '--help']:
+            usage()
+            sys.exit(0)
+        elif opt in ['-l', '--latency']:
+            latency = float(param)
+        elif opt in ['-o', '--output']:
+            output = param
+        elif opt in ['-s', '--scripts']:
+            scripts = param.split(',')
+            for name in scripts:
+                if name not in Scripts:
+                    usage("Unrecognized script: %s" % name)
+                    sys.exit(1)
+        elif opt in ['-t', '--throttle']:
+            throttle_rate = float(param)
+        elif opt in ['-w', '--workers']:
+            workers = int(param)
+
+    app = wx.App()
+
+    results = []
+    with TileServer(latency=latency, error_rate=error_rate,
+                    throttle_rate=throttle_rate, bandwidth=bandwidth,
+                    seed=12345) as server:
+        for name in scripts:
+            results.append(run_script(name, Scripts[name], server,
+                                      workers, dwell))
+
+    report = {'pyslip_version': pyslip.__version__,
+              'wx_version': wx.version(),
+              'python_version': platform.python_version(),
+              'platform': platform.platform(),
+              'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'view_size': list(ViewSize),
+              'dwell': dwell,
+              'workers': workers,
+              'server': {'latency': latency,
+                         'error_rate': error_rate,
+                         'throttle_rate': throttle_rate,
+                         'bandwidth': bandwidth},
+              'results': results}
+
+    text = json.dumps(report, indent=2, default=str)
+    if output:
+        with open(output, 'w') as fd:
+            fd.write(text + '\n')
+    else:
+        print(text)
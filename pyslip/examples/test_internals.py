@@ -0,0 +1,336 @@
+"""
+Test some pySlip internals that don't need a window.
+
+Checks the layer feature bookkeeping, the compiled placement transforms,
+projection of geo positions into map space and the packed shape selection
+code against the older, simpler code they replaced.
+
+Usage: test_internals.py [-h|--help]
+"""
+
+
+import sys
+import math
+import random
+import unittest
+import pyslip
+from pyslip.pyslip import _Layer, _MapRenderer
+
+
+######
+# Fake tile sources, just enough for projection
+######
+
+class LinearTiles(object):
+    """Equirectangular tiles, like the GMT tiles."""
+
+    tile_size_x = 256
+    tile_size_y = 256
+    levels = [0, 1, 2, 3, 4]
+    extent = (-65.0, 295.0, -66.66, 66.66)
+
+    def __init__(self):
+        self.level = 0
+
+    def Geo2Tile(self, geo):
+        (xgeo, ygeo) = geo
+        ppd = self.tile_size_x * 2**self.level / 360.0
+        return ((xgeo - self.extent[0]) * ppd / self.tile_size_x,
+                (self.extent[3] - ygeo) * ppd / self.tile_size_y)
+
+class MercatorTiles(LinearTiles):
+    """Web mercator tiles, like the OSM tiles."""
+
+    extent = (-180.0, 180.0, -85.0511287798, 85.0511287798)
+
+    def Geo2Tile(self, geo):
+        (xgeo, ygeo) = geo
+        lat_rad = math.radians(ygeo)
+        n = 2.0**self.level
+        xtile = (xgeo + 180.0) / 360.0 * n
+        ytile = ((1.0 - math.log(math.tan(lat_rad) + (1.0/math.cos(lat_rad)))
+                  / math.pi) / 2.0 * n)
+        return (xtile, ytile)
+
+
+######
+# The placement code used before placement() compiled it to a transform
+######
+
+def old_point_placement(place, x, y, x_off, y_off, dcw=0, dch=0):
+    dcw2 = dcw/2
+    dch2 = dch/2
+
+    if   place == 'cc': x+=dcw2;       y+=dch2
+    elif place == 'nw': x+=x_off;      y+=y_off
+    elif place == 'cn': x+=dcw2;       y+=y_off
+    elif place == 'ne': x+=dcw-x_off;  y+=y_off
+    elif place == 'ce': x+=dcw-x_off;  y+=dch2
+    elif place == 'se': x+=dcw-x_off;  y+=dch-y_off
+    elif place == 'cs': x+=dcw2;       y+=dch-y_off
+    elif place == 'sw': x+=x_off;      y+=dch-y_off
+    elif place == 'cw': x+=x_off;      y+=dch2
+
+    return (x, y)
+
+def old_extent_placement(place, x, y, x_off, y_off, w, h, dcw=0, dch=0):
+    w2 = w/2
+    h2 = h/2
+    dcw2 = dcw/2
+    dch2 = dch/2
+
+    if place == 'cc':   x+=dcw2-w2;       y+=dch2-h2
+    elif place == 'nw': x+=x_off;         y+=y_off
+    elif place == 'cn': x+=dcw2-w2;       y+=y_off
+    elif place == 'ne': x+=dcw-w-x_off;   y+=y_off
+    elif place == 'ce': x+=dcw-w-x_off;   y+=dch2-h2
+    elif place == 'se': x+=dcw-w-x_off;   y+=dch-h-y_off
+    elif place == 'cs': x+=dcw2-w2;       y+=dch-h-y_off
+    elif place == 'sw': x+=x_off;         y+=dch-h-y_off
+    elif place == 'cw': x+=x_off;         y+=dch2-h2
+
+    return (x, y)
+
+
+class TestLayerFeatures(unittest.TestCase):
+
+    def make_layer(self, num):
+        """Make a layer with 'num' features, data[i] is 'f<i>'."""
+
+        data = ['f%d' % i for i in range(num)]
+        return _Layer(id=1, data=data, convert=lambda f: f)
+
+    def check_index(self, layer):
+        """Check the feature ID index agrees with the layer data."""
+
+        self.assertEqual(len(layer.feature_ids), len(layer.data))
+        self.assertEqual(len(layer.feature_index), len(layer.data))
+        for (i, fid) in enumerate(layer.feature_ids):
+            self.assertEqual(layer.feature_index[fid], i)
+
+    def test_remove_reindexes(self):
+        """Check removed features are replaced by the last feature."""
+
+        layer = self.make_layer(6)
+        old = layer.remove_features([1])
+        self.assertEqual(old, ['f1'])
+        self.assertEqual(layer.data, ['f0', 'f5', 'f2', 'f3', 'f4'])
+        self.assertEqual(layer.feature_ids, [0, 5, 2, 3, 4])
+        self.check_index(layer)
+
+        # removing the last feature moves nothing
+        layer.remove_features([4])
+        self.assertEqual(layer.data, ['f0', 'f5', 'f2', 'f3'])
+        self.check_index(layer)
+
+        # a feature that was moved can still be found by its ID
+        layer.replace_features([5], ['new5'])
+        self.assertEqual(layer.data[1], 'new5')
+
+    def test_remove_random(self):
+        """Check random removals and appends keep every ID on its feature."""
+
+        rnd = random.Random(7)
+        layer = self.make_layer(100)
+        expect = {fid: 'f%d' % fid for fid in range(100)}
+        for _ in range(50):
+            fids = rnd.sample(sorted(expect), rnd.randint(1, 4))
+            layer.remove_features(fids)
+            for fid in fids:
+                del expect[fid]
+            (fid,) = layer.append_features(['new'])
+            expect[fid] = 'new'
+            self.check_index(layer)
+            for (fid, item) in expect.items():
+                self.assertEqual(layer.data[layer.feature_index[fid]], item)
+
+    def test_remove_missing(self):
+        """Check removing a missing ID changes nothing."""
+
+        layer = self.make_layer(3)
+        with self.assertRaises(KeyError):
+            layer.remove_features([0, 9])
+        self.assertEqual(layer.data, ['f0', 'f1', 'f2'])
+        self.check_index(layer)
+
+
+class TestPlacement(unittest.TestCase):
+
+    def test_placement(self):
+        """Check compiled placements place as the old code did."""
+
+        rnd = random.Random(1)
+        for _ in range(20000):
+            place = rnd.choice(_MapRenderer.valid_placements + ['xx'])
+            (x, y, x_off, y_off, w, h) = [rnd.randint(-50, 900)
+                                          for _ in range(6)]
+            (dcw, dch) = rnd.choice([(0, 0), (800, 600), (801, 599)])
+
+            expect = old_point_placement(place, x, y, x_off, y_off, dcw, dch)
+            result = _MapRenderer.point_placement(place, x, y, x_off, y_off,
+                                                  dcw, dch)
+            self.assertEqual(result, expect)
+
+            expect = old_extent_placement(place, x, y, x_off, y_off, w, h,
+                                          dcw, dch)
+            result = _MapRenderer.extent_placement(place, x, y, x_off, y_off,
+                                                   w, h, dcw, dch)
+            self.assertEqual(result, expect)
+
+    def test_placement_shared(self):
+        """Check equal placements share one transform."""
+
+        pl1 = _MapRenderer.placement('ne', 3, 4)
+        pl2 = _MapRenderer.placement('ne', 3, 4)
+        self.assertIs(pl1, pl2)
+
+
+class TestProjection(unittest.TestCase):
+
+    def make_renderer(self, tile_src, level):
+        renderer = _MapRenderer(tile_src, (800, 600))
+        tile_src.level = level
+        renderer.level = level
+        renderer.set_projection()
+        return renderer
+
+    def test_project(self):
+        """Check map space times the map size is the tile pixel position."""
+
+        rnd = random.Random(3)
+        for tile_src in (LinearTiles(), MercatorTiles()):
+            for level in tile_src.levels:
+                renderer = self.make_renderer(tile_src, level)
+                for _ in range(200):
+                    geo = (rnd.uniform(-60, 170), rnd.uniform(-60, 60))
+                    (u, v) = renderer.project(geo)
+                    (tx, ty) = tile_src.Geo2Tile(geo)
+                    self.assertAlmostEqual(u*renderer.proj_scale_x,
+                                           tx*tile_src.tile_size_x, places=6)
+                    self.assertAlmostEqual(v*renderer.proj_scale_y,
+                                           ty*tile_src.tile_size_y, places=6)
+
+    def test_project_corners(self):
+        """Check the map corners are at (0, 0) and (1, 1) in map space."""
+
+        for tile_src in (LinearTiles(), MercatorTiles()):
+            renderer = self.make_renderer(tile_src, 2)
+            (llon, rlon, blat, tlat) = tile_src.extent
+            for (geo, expect) in (((llon, tlat), (0, 0)),
+                                  ((rlon, blat), (1, 1))):
+                (u, v) = renderer.project(geo)
+                self.assertAlmostEqual(u, expect[0], places=6)
+                self.assertAlmostEqual(v, expect[1], places=6)
+
+    def test_pack_shape(self):
+        """Check packed shapes are projected with the right extent."""
+
+        renderer = self.make_renderer(MercatorTiles(), 3)
+        points = [(145.0, -20.0), (150.0, -25.0), (140.0, -30.0)]
+        packed = renderer.pack_points(points)
+        self.assertEqual(renderer.unpack_points(packed), points)
+
+        # view-relative points are used as they are
+        (coords, extent) = renderer.pack_shape(packed, False)
+        self.assertIs(coords, packed)
+        self.assertEqual(extent, (140.0, 150.0, -30.0, -20.0))
+
+        # map-relative points are projected
+        (coords, extent) = renderer.pack_shape(packed, True)
+        projected = [renderer.project(geo) for geo in points]
+        self.assertEqual(renderer.unpack_points(coords), projected)
+        us = [u for (u, v) in projected]
+        vs = [v for (u, v) in projected]
+        self.assertEqual(extent, (min(us), max(us), min(vs), max(vs)))
+
+        # no points, no extent
+        (coords, extent) = renderer.pack_shape(renderer.pack_points([]), True)
+        self.assertEqual(len(coords), 0)
+        self.assertIsNone(extent)
+
+
+class TestShapes(unittest.TestCase):
+
+    # the geometry routines don't use the window, so an uninitialised
+    # widget object is enough to call them
+    widget = pyslip.pySlip.__new__(pyslip.pySlip)
+
+    def random_shape(self, rnd, num):
+        """Get a random star shaped polygon, or polyline, of 'num' points."""
+
+        (cx, cy) = (rnd.uniform(-100, 100), rnd.uniform(-100, 100))
+        angles = sorted(rnd.uniform(0, 2*math.pi) for _ in range(num))
+        shape = []
+        for a in angles:
+            r = rnd.uniform(10, 100)
+            shape.append((cx + r*math.cos(a), cy + r*math.sin(a)))
+        return shape
+
+    def test_point_inside_shape(self):
+        """Check the packed polygon test agrees with point_inside_polygon()."""
+
+        rnd = random.Random(5)
+        widget = self.widget
+        for _ in range(200):
+            poly = self.random_shape(rnd, rnd.randint(3, 12))
+            (coords, extent) = widget.pack_shape(widget.pack_points(poly),
+                                                 False)
+            for _ in range(50):
+                (x, y) = (rnd.uniform(-200, 200), rnd.uniform(-200, 200))
+                self.assertEqual(widget.point_inside_shape(x, y, coords,
+                                                           extent),
+                                 widget.point_inside_polygon((x, y), poly))
+
+    def test_point_near_shape(self):
+        """Check the packed polyline test agrees with point_near_polyline()."""
+
+        rnd = random.Random(6)
+        widget = self.widget
+        delta = 50
+        for _ in range(200):
+            polyline = self.random_shape(rnd, rnd.randint(2, 12))
+            (coords, extent) = widget.pack_shape(widget.pack_points(polyline),
+                                                 False)
+            transform = rnd.choice([(1, 1, 0, 0), (2.5, 3.5, -40, 25)])
+            (sx, sy, dx, dy) = transform
+            view_line = [(x*sx + dx, y*sy + dy) for (x, y) in polyline]
+            for _ in range(50):
+                point = (rnd.uniform(-400, 400), rnd.uniform(-400, 400))
+                result = widget.point_near_shape(point, coords, extent,
+                                                 transform, delta)
+                expect = widget.point_near_polyline(point, view_line, delta)
+                if expect is None:
+                    self.assertIsNone(result)
+                else:
+                    self.assertEqual((view_line[result], view_line[result+1]),
+                                     expect)
+
+        # a shape with no points is never near
+        self.assertIsNone(widget.point_near_shape((0, 0), [], None,
+                                                  (1, 1, 0, 0), delta))
+
+################################################################################
+
+if __name__ == '__main__':
+    import getopt
+
+    # print some usage information
+    def usage(msg=None):
+        if msg:
+            print(msg+'\n')
+        print(__doc__)        # module docstring used
+
+    argv = sys.argv[1:]
+
+    try:
+        (opts, args) = getopt.getopt(argv, 'h', ['help'])
+    except getopt.error:
+        usage()
+        sys.exit(1)
+
+    for (opt, param) in opts:
+        if opt in ['-h', '--help']:
+            usage()
+            sys.exit(0)
+
+    unittest.main(argv=sys.argv[:1])
@@ -0,0 +1,191 @@
+"""Test PySlip live track layers.
+
+Usage: test_live_tracks.py [-h] [-t (OSM|GMT)] [-n <tracks>] [-r <rate>]
+
+where -h            prints this help and stops
+      -t (OSM|GMT)  the tile source to use (default GMT)
+      -n <tracks>   number of tracks (default 200)
+      -r <rate>     position updates per second over all tracks
+                    (default 2000)
+
+A background thread moves each track in a random walk and feeds the
+positions to a track layer.  The view is redrawn at the layer frame rate
+no matter how fast positions arrive.
+"""
+
+import sys
+import time
+import random
+import threading
+import wx
+import pyslip
+
+
+######
+# Various demo constants
+######
+
+DefaultAppSize = (1000, 600)
+
+InitViewLevel = 3
+InitViewPosition = (133.87, -23.7)      # Alice Springs
+
+DefaultTracks = 200
+DefaultRate = 2000
+
+# size of one random walk step (degrees)
+StepSize = 0.1
+
+# updates are sent in batches, this many a second
+BatchesPerSecond = 50
+
+################################################################################
+# The main application frame
+################################################################################
+
+class TestFrame(wx.Frame):
+    def __init__(self, num_tracks, rate):
+        wx.Frame.__init__(self, None, size=DefaultAppSize,
+                          title=('PySlip %s - live track test'
+                                 % pyslip.__version__))
+        self.SetMinSize(DefaultAppSize)
+        self.panel = wx.Panel(self, wx.ID_ANY)
+        self.panel.SetBackgroundColour(wx.WHITE)
+        self.panel.ClearBackground()
+        self.Bind(wx.EVT_CLOSE, self.onClose)
+
+        # create the tile source object
+        self.tile_src = Tiles.Tiles()
+
+        # build the GUI
+        box = wx.BoxSizer(wx.HORIZONTAL)
+        self.panel.SetSizer(box)
+        self.pyslip = pyslip.pySlip(self.panel, tile_src=self.tile_src,
+                                    style=wx.SIMPLE_BORDER)
+        box.Add(self.pyslip, proportion=1, border=1, flag=wx.EXPAND)
+        self.panel.SetSizer(box)
+        self.panel.Layout()
+        self.Centre()
+        self.Show(True)
+
+        # add the track layer
+        self.track_layer = self.pyslip.AddTrackLayer(trail=30, colour='red',
+                                                     width=2, radius=3,
+                                                     fade=True, fps=20,
+                                                     name='<track_layer>')
+
+        # start the background feed
+        self.running = True
+        self.feed = threading.Thread(target=self.feed_tracks,
+                                     args=(num_tracks, rate))
+        self.feed.daemon = True
+        self.feed.start()
+
+        # set initial view position
+        wx.CallLater(25, self.final_setup, InitViewLevel, InitViewPosition)
+
+    def final_setup(self, level, position):
+        """Perform final setup.
+
+        level     zoom level required
+        position  position to be in centre of view
+
+        We do this in a CallLater() function for those operations that
+        must not be done while the GUI is "fluid".
+        """
+
+        self.pyslip.GotoLevelAndPosition(level, position)
+
+    def feed_tracks(self, num_tracks, rate):
+        """Feed random walk positions to the track layer.
+
+        num_tracks  number of tracks
+        rate        position updates per second over all tracks
+
+        Runs in a background thread.
+        """
+
+        (xgeo, ygeo) = InitViewPosition
+        rnd = random.Random()
+        positions = [[xgeo + rnd.uniform(-10.0, 10.0),
+                      ygeo + rnd.uniform(-10.0, 10.0)]
+                     for _ in range(num_tracks)]
+
+        batch_size = max(1, rate // BatchesPerSecond)
+        track = 0
+        while self.running:
+            batch = []
+            for _ in range(batch_size):
+                posn = positions[track]
+                posn[0] += rnd.uniform(-StepSize, StepSize)
+                posn[1] += rnd.uniform(-StepSize, StepSize)
+                batch.append((track, posn[0], posn[1]))
+                track = (track + 1) % num_tracks
+            self.pyslip.AddTrackPositions(self.track_layer, batch)
+            time.sleep(1.0 / BatchesPerSecond)
+
+    def onClose(self, event):
+        self.running = False
+        self.Destroy()
+
+################################################################################
+
+if __name__ == '__main__':
+    import getopt
+    import traceback
+
+    # print some usage information
+    def usage(msg=None):
+        if msg:
+            print(msg+'\n')
+        print(__doc__)        # module docstring used
+
+    # our own handler for uncaught exceptions
+    def excepthook(type, value, tb):
+        msg = '\n' + '=' * 80
+        msg += '\nUncaught exception:\n'
+        msg += ''.join(traceback.format_exception(type, value, tb))
+        msg += '=' * 80 + '\n'
+        print(msg)
+        sys.exit(1)
+
+    # plug our handler into the python system
+    sys.excepthook = excepthook
+
+    argv = sys.argv[1:]
+
+    try:
+        (opts, args) = getopt.getopt(argv, 'hn:r:t:',
+                                     ['help', 'number=', 'rate=', 'tiles='])
+    except getopt.error:
+        usage()
+        sys.exit(1)
+
+    tile_source = 'GMT'
+    num_tracks = DefaultTracks
+    rate = DefaultRate
+    for (opt, param) in opts:
+        if opt in ['-h', '--help']:
+            usage()
+            sys.exit(0)
+        elif opt in ('-n', '--number'):
+            num_tracks = int(param)
+        elif opt in ('-r', '--rate'):
+            rate = int(param)
+        elif opt in ('-t', '--tiles'):
+            tile_source = param
+    tile_source = tile_source.lower()
+
+    # set up the appropriate tile source
+    if tile_source == 'gmt':
+        import pyslip.gmt_local as Tiles
+    elif tile_source == 'osm':
+        import pyslip.open_street_map as Tiles
+    else:
+        usage('Bad tile source: %s' % tile_source)
+        sys.exit(3)
+
+    # start wxPython app
+    app = wx.App()
+    TestFrame(num_tracks, rate).Show()
+    app.MainLoop()
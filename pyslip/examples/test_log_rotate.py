@@ -0,0 +1,179 @@
+"""
+Test rotation of the pySlip log file.
+
+The log writer thread is given a log file in a temporary directory and
+made to rotate it, checking old log files are shifted up and dropped.
+
+Usage: test_log_rotate.py [-h|--help]
+"""
+
+
+import os
+import sys
+import gzip
+import queue
+import shutil
+import builtins
+import tempfile
+import unittest
+from unittest import mock
+from pyslip.log import LogWriter
+
+
+class TestLogRotate(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.logfile = os.path.join(self.dir, 'test.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def make_writer(self, **kwargs):
+        """Make a writer on a new log file, not started."""
+
+        logfd = open(self.logfile, 'w')
+        self.addCleanup(lambda: self.writer.logfd.close())
+        self.writer = LogWriter(logfd, queue.Queue(), 0.1, 40,
+                                logfile=self.logfile, **kwargs)
+        return self.writer
+
+    def read(self, path):
+        """Get the contents of a log file, gzipped or not."""
+
+        if path.endswith('.gz'):
+            with gzip.open(path, 'rt') as fd:
+                return fd.read()
+        with open(path) as fd:
+            return fd.read()
+
+    def test_backups_shift(self):
+        """Check old files move up one and the oldest is dropped."""
+
+        writer = self.make_writer(backups=3)
+        for line in ('one\n', 'two\n', 'three\n', 'four\n', 'five\n'):
+            writer.logfd.write(line)
+            writer.rotate()
+        writer.logfd.write('six\n')
+        writer.logfd.flush()
+
+        self.assertEqual(sorted(os.listdir(self.dir)),
+                         ['test.log', 'test.log.1', 'test.log.2', 'test.log.3'])
+        self.assertEqual(self.read(self.logfile), 'six\n')
+        self.assertEqual(self.read(writer.backup_name(1)), 'five\n')
+        self.assertEqual(self.read(writer.backup_name(2)), 'four\n')
+        self.assertEqual(self.read(writer.backup_name(3)), 'three\n')
+
+    def test_compress(self):
+        """Check old files are gzipped when compressing."""
+
+        writer = self.make_writer(backups=2, compress=True)
+        for line in ('one\n', 'two\n', 'three\n'):
+            writer.logfd.write(line)
+            writer.rotate()
+
+        self.assertEqual(sorted(os.listdir(self.dir)),
+                         ['test.log', 'test.log.1.gz', 'test.log.2.gz'])
+        self.assertEqual(self.read(writer.backup_name(1)), 'three\n')
+        self.assertEqual(self.read(writer.backup_name(2)), 'two\n')
+
+    def test_no_backups(self):
+        """Check the log file is just emptied if no backups are kept."""
+
+        writer = self.make_writer(backups=0)
+        writer.logfd.write('one\n')
+        writer.rotate()
+
+        self.assertEqual(os.listdir(self.dir), ['test.log'])
+        self.assertEqual(self.read(self.logfile), '')
+        self.assertEqual(writer.written, 0)
+
+    def test_rotate_by_size(self):
+        """Check the writer thread rotates when the file gets too big."""
+
+        writer = self.make_writer(max_bytes=100, backups=2)
+        writer.start()
+        line = 'x' * 39 + '\n'
+        for _ in range(7):
+            writer.lines.put((10, line))
+        writer.lines.put((10, None))
+        writer.lines.join()
+
+        # 3 lines fill a file, 7 lines make two full files and one line
+        self.assertEqual(self.read(writer.backup_name(2)), line * 3)
+        self.assertEqual(self.read(writer.backup_name(1)), line * 3)
+        self.assertEqual(self.read(self.logfile), line)
+
+    def test_set_rotation(self):
+        """Check rotation can be turned on in a running writer."""
+
+        writer = self.make_writer()
+        self.assertFalse(writer.rotate_due())
+        writer.start()
+        writer.set_rotation(max_bytes=100, max_age=None, backups=1,
+                            compress=True)
+        line = 'x' * 39 + '\n'
+        for _ in range(4):
+            writer.lines.put((10, line))
+        writer.lines.put((10, None))
+        writer.lines.join()
+
+        self.assertEqual(self.read(writer.backup_name(1)), line * 3)
+        self.assertEqual(self.read(self.logfile), line)
+
+    def test_reopen_fails(self):
+        """Check lines aren't lost when the new log file can't be opened."""
+
+        writer = self.make_writer(backups=2)
+        writer.logfd.write('one\n')
+        real_open = builtins.open
+
+        # can't make a new file, the old file is appended to
+        def no_create(path, mode='r', *args, **kwargs):
+            if path == self.logfile and mode == 'w':
+                raise OSError('no create')
+            return real_open(path, mode, *args, **kwargs)
+
+        with mock.patch('builtins.open', no_create):
+            writer.rotate()
+        self.assertEqual(writer.logfd.name, self.logfile)
+        self.assertEqual(writer.logfile, self.logfile)
+
+        # can't open the file at all, lines go to stderr and rotation stops
+        def no_open(path, mode='r', *args, **kwargs):
+            if path == self.logfile:
+                raise OSError('no open')
+            return real_open(path, mode, *args, **kwargs)
+
+        with mock.patch('builtins.open', no_open):
+            writer.rotate()
+        self.assertIs(writer.logfd, sys.stderr)
+        self.assertIsNone(writer.logfile)
+        self.assertFalse(writer.rotate_due())
+        writer.logfd = open(os.devnull, 'w')     # closed by the cleanup
+
+################################################################################
+
+if __name__ == '__main__':
+    import getopt
+
+    # print some usage information
+    def usage(msg=None):
+        if msg:
+            print(msg+'\n')
+        print(__doc__)        # module docstring used
+
+    argv = sys.argv[1:]
+
+    try:
+        (opts, args) = getopt.getopt(argv, 'h', ['help'])
+    except getopt.error:
+        usage()
+        sys.exit(1)
+
+    for (opt, param) in opts:
+        if opt in ['-h', '--help']:
+            usage()
+            sys.exit(0)
+
+    unittest.main(argv=sys.argv[:1])
@@ -49,7 +49,8 @@ class TestFrame(wx.Frame):
         self.panel.ClearBackground()
 
         # note that we need a unique Tile source for each widget
-        # sharing directories is OK
+        # tile sources for the same tileset share one tile cache and
+        # one set of server requests
         gmt_tile_src_1 = GMTTiles.Tiles()
         gmt_tile_src_2 = GMTTiles.Tiles()
         osm_tile_src_1 = NetTiles.Tiles()
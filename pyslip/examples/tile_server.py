@@ -0,0 +1,254 @@
+"""
+A local HTTP tile server for testing and benchmarking server tile sources.
+
+Usage: tile_server.py [-h] [-p <port>] [-l <latency>] [-e <rate>]
+                      [-t <rate>] [-b <bytes/sec>]
+
+where -h               prints this help and stops
+      -p <port>        port to listen on (default 8080)
+      -l <latency>     seconds delay before each response (default 0)
+      -e <rate>        fraction of requests answered with a 500 error
+      -t <rate>        fraction of requests answered with 429 (too many)
+      -b <bytes/sec>   bandwidth cap for each response
+
+Tiles are generated on the fly, so no tile files are needed.  Each tile is a
+PNG coloured by its level and position, padded to a realistic size.  Tiles
+are served on the path '/{Z}/{X}/{Y}.png'.
+
+The server can also be used from code, in a background thread:
+
+    with TileServer(latency=0.05, error_rate=0.01) as server:
+        tile_src = MyTiles(servers=[server.url], ...)
+        ...
+        print(server.served)
+"""
+
+
+import sys
+import time
+import zlib
+import random
+import struct
+import threading
+import http.server
+
+
+# default size of a generated tile (bytes), about that of a real map tile
+DefaultTileBytes = 20000
+
+# size of generated tiles (pixels)
+TileSize = 256
+
+
+def make_png(width, height, colour, pad_bytes=0):
+    """Make PNG image data of one colour.
+
+    width, height  size of the image in pixels
+    colour         a tuple (red, green, blue)
+    pad_bytes      size of padding chunk added to the image data
+
+    The padding is an ancillary chunk that image readers ignore.
+    """
+
+    def chunk(chunk_type, data):
+        return (struct.pack('!I', len(data)) + chunk_type + data
+                + struct.pack('!I', zlib.crc32(chunk_type + data) & 0xffffffff))
+
+    row = b'\x00' + bytes(colour) * width
+    pixels = zlib.compress(row * height)
+    header = struct.pack('!IIBBBBB', width, height, 8, 2, 0, 0, 0)
+
+    png = [b'\x89PNG\r\n\x1a\n', chunk(b'IHDR', header)]
+    if pad_bytes > 0:
+        png.append(chunk(b'paDd', b'\x00' * pad_bytes))
+    png.append(chunk(b'IDAT', pixels))
+    png.append(chunk(b'IEND', b''))
+
+    return b''.join(png)
+
+
+class TileRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Answer one tile request, misbehaving as the server is configured."""
+
+    def log_message(self, format, *args):
+        """Don't log every request to stderr."""
+
+        pass
+
+    def do_GET(self):
+        server = self.server.tile_server
+
+        # parse the '/Z/X/Y.png' path
+        try:
+            (z, x, y) = self.path.strip('/').rsplit('.', 1)[0].split('/')
+            key = (int(z), int(x), int(y))
+        except ValueError:
+            self.send_error(404)
+            return
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        # maybe misbehave
+        chance = server.random()
+        if chance < server.throttle_rate:
+            server.record(key, 429)
+            self.send_error(429)
+            return
+        if chance < server.throttle_rate + server.error_rate:
+            server.record(key, 500)
+            self.send_error(500)
+            return
+
+        data = server.tile(key)
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+
+        if server.bandwidth:
+            # send in chunks at no more than the bandwidth cap
+            chunk_size = max(1, min(len(data), server.bandwidth // 10))
+            for start in range(0, len(data), chunk_size):
+                self.wfile.write(data[start:start+chunk_size])
+                time.sleep(chunk_size / server.bandwidth)
+        else:
+            self.wfile.write(data)
+
+        server.record(key, 200)
+
+
+class TileServer(object):
+    """A local tile server running in a background thread."""
+
+    def __init__(self, port=0, latency=0.0, error_rate=0.0, throttle_rate=0.0,
+                 bandwidth=None, tile_bytes=DefaultTileBytes, seed=None):
+        """Start the tile server.
+
+        port           port to listen on, 0 means any free port
+        latency        seconds delay before each response
+        error_rate     fraction of requests answered with a 500 error
+        throttle_rate  fraction of requests answered with 429 (too many)
+        bandwidth      bytes/second cap for each response (None - no cap)
+        tile_bytes     approximate size of each tile in bytes
+        seed           random seed for errors, for repeatable runs
+        """
+
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.bandwidth = bandwidth
+        self.tile_bytes = tile_bytes
+
+        self.lock = threading.Lock()
+        self.rnd = random.Random(seed)
+        self.tiles = {}             # cache of generated tile data
+        self.served = []            # list of (time, key, status) for requests
+
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', port),
+                                                     TileRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.tile_server = self
+        self.port = self.httpd.server_address[1]
+        self.url = 'http://127.0.0.1:%d' % self.port
+
+        self.thread = threading.Thread(target=self.httpd.serve_forever,
+                                       name='TileServer')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def random(self):
+        """Return a random number in [0, 1), thread-safe."""
+
+        with self.lock:
+            return self.rnd.random()
+
+    def tile(self, key):
+        """Return PNG data for the tile 'key' (level, x, y)."""
+
+        with self.lock:
+            data = self.tiles.get(key, None)
+        if data is None:
+            (level, x, y) = key
+            colour = ((level * 40) % 256, (x * 16) % 256, (y * 16) % 256)
+            data = make_png(TileSize, TileSize, colour,
+                            pad_bytes=max(0, self.tile_bytes - 200))
+            with self.lock:
+                self.tiles[key] = data
+        return data
+
+    def record(self, key, status):
+        """Remember a request for tile 'key' and the status returned."""
+
+        with self.lock:
+            self.served.append((time.time(), key, status))
+
+    def reset(self):
+        """Forget all served requests."""
+
+        with self.lock:
+            self.served = []
+
+    def close(self):
+        """Stop the server."""
+
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+################################################################################
+
+if __name__ == '__main__':
+    import getopt
+
+    # print some usage information
+    def usage(msg=None):
+        if msg:
+            print(msg+'\n')
+        print(__doc__)        # module docstring used
+
+    argv = sys.argv[1:]
+
+    try:
+        (opts, args) = getopt.getopt(argv, 'b:e:hl:p:t:',
+                                     ['bandwidth=', 'errors=', 'help',
+                                      'latency=', 'port=', 'throttle='])
+    except getopt.error:
+        usage()
+        sys.exit(1)
+
+    port = 8080
+    latency = 0.0
+    error_rate = 0.0
+    throttle_rate = 0.0
+    bandwidth = None
+
+    for (opt, param) in opts:
+        if opt in ['-b', '--bandwidth']:
+            bandwidth = int(param)
+        elif opt in ['-e', '--errors']:
+            error_rate = float(param)
+        elif opt in ['-h', '--help']:
+            usage()
+            sys.exit(0)
+        elif opt in ['-l', '--latency']:
+            latency = float(param)
+        elif opt in ['-p', '--port']:
+            port = int(param)
+        elif opt in ['-t', '--throttle']:
+            throttle_rate = float(param)
+
+    server = TileServer(port=port, latency=latency, error_rate=error_rate,
+                        throttle_rate=throttle_rate, bandwidth=bandwidth)
+    print('Serving tiles on %s/{Z}/{X}/{Y}.png, ^C to stop' % server.url)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.close()
@@ -69,10 +69,8 @@ class Tiles(tiles.BaseTiles):
                          Tiles.TileWidth, Tiles.TileHeight,
                          tiles_dir=tiles_dir, max_lru=MaxLRU)
 
-# TODO: implement map wrap-around
-#        # we *can* wrap tiles in X direction, but not Y
-#        self.wrap_x = False
-#        self.wrap_y = False
+        # the GMT tiles cover 360 degrees of longitude, so wrap in X
+        self.wrap_x = True
 
         # override the tiles.py extent here, the GMT tileset is different
         self.extent = (-65.0, 295.0, -66.66, 66.66)
@@ -160,16 +158,9 @@ class Tiles(tiles.BaseTiles):
         xgeo = xtile*tdeg_x + min_xgeo
         ygeo = max_ygeo - ytile*tdeg_y
 
-#        if self.wrap_x:
-#            while xgeo < min_xgeo:
-#                xgeo += self.deg_span_x
-#            while xgeo > max_xgeo:
-#                xgeo -= self.deg_span_x
-#        if self.wrap_x:
-#            while ygeo > max_ygeo:
-#                ygeo -= self.deg_span_y
-#            while ygeo < min_ygeo:
-#                ygeo += self.deg_span_y
+        # if wrapping, positions beyond the map edges are on the map
+        if self.wrap_x:
+            xgeo = (xgeo - min_xgeo) % self.deg_span_x + min_xgeo
 
         return (xgeo, ygeo)
 
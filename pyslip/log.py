@@ -12,15 +12,199 @@ Based on the 'borg' recipe from [http://code.activestate.com/recipes/66531/].
 Log levels styled on the Python 'logging' module.
 
 Log output includes the module and line # of the log() call.
+
+Log lines are written to the file by a background thread, so a log() call
+never waits on the disk.  Messages below the log level cost one comparison.
+
+For long-running programs the log file may be rotated when it gets too big
+or too old:
+    log = Log('pyslip.log', append=True, max_bytes=10000000, backups=5)
+The rotation (and optional compression of old logs) is done by the writer
+thread.  The log file is opened by the first Log() call, and importing pySlip
+makes that call, so rotation of a log already open is set with:
+    log.set_rotation(max_bytes=10000000, max_age=24*60*60, backups=5)
 """
 
 import os
 import sys
+import gzip
+import time
+import queue
+import shutil
+import atexit
 import datetime
-import traceback
 import threading
 
 
+################################################################################
+# A thread that writes queued log lines to the log file.
+################################################################################
+
+class LogWriter(threading.Thread):
+    """Write queued log lines to a file, flushing periodically.
+
+    The file is rotated if it gets bigger than 'max_bytes' or older than
+    'max_age' seconds.  The current file is renamed to '<logfile>.1', any
+    '<logfile>.1' becomes '<logfile>.2', and so on, keeping 'backups' old
+    files.  Old files are gzipped if 'compress' is True.
+    """
+
+    def __init__(self, logfd, lines, flush_interval, flush_level,
+                 logfile=None, max_bytes=None, max_age=None, backups=0,
+                 compress=False):
+        """Initialise the writer thread.
+
+        logfd           the open log file
+        lines           the queue of (level, line) tuples to write
+        flush_interval  maximum seconds a written line stays unflushed
+        flush_level     lines at or above this level are flushed at once
+        logfile         path to the log file, needed to rotate
+        max_bytes       rotate when the file is bigger than this (None - never)
+        max_age         rotate when the file is older than this (None - never)
+        backups         number of old log files kept
+        compress        True if old log files are gzipped
+        """
+
+        super().__init__(name='LogWriter')
+        self.logfd = logfd
+        self.lines = lines
+        self.flush_interval = flush_interval
+        self.flush_level = flush_level
+        self.logfile = logfile
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backups = backups
+        self.compress = compress
+        self.daemon = True
+        self.rotate_lock = threading.Lock()   # held while rotating
+
+        # size and start time of current log file
+        try:
+            self.written = logfd.tell()
+        except (OSError, ValueError):
+            self.written = 0
+        self.opened = time.time()
+
+    def set_rotation(self, max_bytes, max_age, backups, compress):
+        """Change when the log file is rotated, from any thread.
+
+        Parameters are as for __init__().
+        """
+
+        with self.rotate_lock:
+            self.max_bytes = max_bytes
+            self.max_age = max_age
+            self.backups = backups
+            self.compress = compress
+
+    def rotate_due(self):
+        """Return True if the log file should be rotated."""
+
+        if self.logfile is None:
+            return False
+        if self.max_bytes and self.written >= self.max_bytes:
+            return True
+        if self.max_age and time.time() - self.opened >= self.max_age:
+            return True
+        return False
+
+    def backup_name(self, number):
+        """Return the path of old log file 'number'."""
+
+        name = '%s.%d' % (self.logfile, number)
+        if self.compress:
+            name += '.gz'
+        return name
+
+    def rotate(self):
+        """Rotate the log files and open a new, empty log file.
+
+        If the new log file can't be opened the old one is appended to.  If
+        that can't be opened either lines go to stderr and rotation stops.
+        """
+
+        with self.rotate_lock:
+            self.rotate_files()
+
+    def rotate_files(self):
+        """Rotate the log files, see rotate()."""
+
+        self.logfd.close()
+
+        try:
+            if self.backups > 0:
+                # shuffle old files up one, the oldest drops off the end
+                for number in range(self.backups - 1, 0, -1):
+                    old_name = self.backup_name(number)
+                    if os.path.exists(old_name):
+                        os.replace(old_name, self.backup_name(number + 1))
+
+                if self.compress:
+                    with open(self.logfile, 'rb') as src:
+                        with gzip.open(self.backup_name(1), 'wb') as dst:
+                            shutil.copyfileobj(src, dst)
+                    os.remove(self.logfile)
+                else:
+                    os.replace(self.logfile, self.backup_name(1))
+            mode = 'w'
+        except OSError:
+            # can't rotate, keep using the file we have
+            mode = 'a'
+
+        self.opened = time.time()
+        try:
+            self.logfd = open(self.logfile, mode)
+        except OSError:
+            try:
+                self.logfd = open(self.logfile, 'a')
+            except OSError:
+                # no log file at all, don't lose any more lines
+                self.logfd = sys.stderr
+                self.logfile = None
+                self.written = 0
+                return
+        self.written = self.logfd.tell()
+
+    def run(self):
+        dirty = False
+        while True:
+            try:
+                (level, line) = self.lines.get(timeout=self.flush_interval)
+            except queue.Empty:
+                # quiet for a while, flush anything written
+                try:
+                    if dirty:
+                        self.logfd.flush()
+                        dirty = False
+                    if self.rotate_due():
+                        self.rotate()
+                except (OSError, ValueError):
+                    pass
+                continue
+
+            try:
+                if line is None:
+                    # a flush request
+                    self.logfd.flush()
+                    dirty = False
+                    continue
+
+                self.logfd.write(line)
+                self.written += len(line)
+                dirty = True
+                if level >= self.flush_level:
+                    self.logfd.flush()
+                    dirty = False
+                if self.rotate_due():
+                    self.rotate()
+                    dirty = False
+            except (OSError, ValueError):
+                # log file closed or unwritable, nowhere to report it
+                pass
+            finally:
+                self.lines.task_done()
+
+
 ################################################################################
 # A simple (?) logger.
 ################################################################################
@@ -47,14 +231,37 @@ class Log(object):
     # default maximum length of filename (enforced)
     DefaultMaxFname = 15
 
+    # maximum number of log lines waiting to be written
+    # if the queue is full lines are dropped and counted, not waited for
+    MaxQueuedLines = 10000
+
+    # maximum seconds before a written line is flushed to the file
+    FlushInterval = 1.0
+
+    # lines at or above this level are flushed to the file at once
+    FlushLevel = ERROR
+
+    # default number of old log files kept when rotating
+    DefaultBackups = 5
 
     def __init__(self, logfile=None, level=DEBUG, append=False,
-                 max_fname=DefaultMaxFname):
+                 max_fname=DefaultMaxFname, max_bytes=None, max_age=None,
+                 backups=DefaultBackups, compress=False):
         """Initialise the logging object.
 
-        logfile the path to the log file
-        level   logging level - don't log below this level
-        append  True if log file is appended to
+        logfile    the path to the log file
+        level      logging level - don't log below this level
+        append     True if log file is appended to
+        max_fname  maximum length of the caller filename in a log line
+        max_bytes  rotate the log file when bigger than this (None - never)
+        max_age    rotate the log file when older than this many seconds
+                   (None - never)
+        backups    number of rotated log files to keep
+        compress   True if rotated log files are gzipped
+
+        Only the first call opens the log file.  A later call giving
+        'max_bytes' or 'max_age' changes the rotation of the open log file,
+        see set_rotation().
         """
 
         # make sure we have same state as all other log objects
@@ -64,6 +271,7 @@ class Log(object):
 
         self.sym_level = 'NOTSET'      # set in call to check_level()
         self.level = self.check_level(level)
+        self.set_threshold()
 
         # don't allow logfile to change after initially set
         if not hasattr(self, 'logfile'):
@@ -71,9 +279,9 @@ class Log(object):
                 logfile = '%s.log' % __name__
             try:
                 if append:
-                    self.logfd = open(logfile, 'a')
+                    logfd = open(logfile, 'a')
                 else:
-                    self.logfd = open(logfile, 'w')
+                    logfd = open(logfile, 'w')
             except IOError:
                 # assume we have readonly filesystem
                 basefile = os.path.basename(logfile)
@@ -84,17 +292,49 @@ class Log(object):
 
             # try to open logfile again
             if append:
-                self.logfd = open(logfile, 'a')
+                logfd = open(logfile, 'a')
             else:
-                self.logfd = open(logfile, 'w')
+                logfd = open(logfile, 'w')
 
             self.logfile = logfile
 
+            # start the thread that does the file writing
+            self.dropped = 0                # lines dropped, queue was full
+            self.fname_cache = {}           # code filename -> short name
+            self.lines = queue.Queue(maxsize=self.MaxQueuedLines)
+            # the writer owns the open file, it changes when rotated
+            self.writer = LogWriter(logfd, self.lines,
+                                    self.FlushInterval, self.FlushLevel,
+                                    logfile=logfile, max_bytes=max_bytes,
+                                    max_age=max_age, backups=backups,
+                                    compress=compress)
+            self.writer.start()
+            atexit.register(self.flush)
+
             self.debug('='*55)
             self.debug('Log started on %s, log level=%s'
                        % (datetime.datetime.now().ctime(),
                           self._level_num_to_name[level]))
             self.debug('-'*55)
+        elif max_bytes or max_age:
+            # the log is already open, perhaps by importing pySlip
+            self.set_rotation(max_bytes, max_age, backups, compress)
+
+    def set_rotation(self, max_bytes=None, max_age=None,
+                     backups=DefaultBackups, compress=False):
+        """Set when the log file is rotated.
+
+        max_bytes  rotate the log file when bigger than this (None - never)
+        max_age    rotate the log file when older than this many seconds
+                   (None - never)
+        backups    number of rotated log files to keep
+        compress   True if rotated log files are gzipped
+
+        Changes the running log writer, the age of the log file is counted
+        from when it was opened.
+        """
+
+        self.writer.set_rotation(max_bytes, max_age, backups, compress)
 
     def check_level(self, level):
         """Check the level value for legality.
@@ -133,9 +373,29 @@ class Log(object):
 
         self.level = level
         self.sym_level = sym
+        self.set_threshold()
 
         self.critical('Logging level set to %02d (%s)' % (level, sym))
 
+    def set_threshold(self):
+        """Set the lowest level that is logged.
+
+        A level of NOTSET (or less) turns logging off.
+        """
+
+        if self.level <= self.NOTSET:
+            self.threshold = self.CRITICAL + 1
+        else:
+            self.threshold = self.level
+
+    def flush(self):
+        """Wait until all queued lines are written and flushed."""
+
+        lines = getattr(self, 'lines', None)
+        if lines is not None and self.writer.is_alive():
+            lines.put((self.CRITICAL, None))
+            lines.join()
+
     def __call__(self, msg=None, level=None):
         """Call on the logging object.
 
@@ -148,7 +408,7 @@ class Log(object):
             level = self.level
 
         # are we going to log?
-        if level < self.level or self.level <= 0:
+        if level < self.threshold:
             return
 
         if msg is None:
@@ -164,52 +424,65 @@ class Log(object):
         # thread information
         thread_name = threading.current_thread().name
 
-        # caller information - look back for first module != <this module name>
-        frames = traceback.extract_stack()
-        frames.reverse()
+        # caller information - look back for first frame not in this module
+        frame = sys._getframe(1)
+        while frame.f_back and frame.f_globals.get('__name__') == __name__:
+            frame = frame.f_back
+        lnum = frame.f_lineno
+        fpath = frame.f_code.co_filename
         try:
-            (_, mod_name) = __name__.rsplit('.', 1)
-        except ValueError:
-            mod_name = __name__
-        for (fpath, lnum, mname, _) in frames:
-            (fname, _) = os.path.basename(fpath).rsplit('.', 1)
-            if fname != mod_name:
-                break
+            fname = self.fname_cache[fpath]
+        except KeyError:
+            fname = os.path.basename(fpath).rsplit('.', 1)[0]
+            fname = fname[:self.max_fname]
+            self.fname_cache[fpath] = fname
 
         # get string for log level
-        loglevel = self._level_num_to_name[level]
+        loglevel = self._level_num_to_name.get(level, str(level))
+
+        line = ('%02d:%02d:%02d.%06d|%8s|%12s|%*s:%-4d|%s\n'
+                % (hr, min, sec, msec, loglevel, thread_name,
+                   self.max_fname, fname, lnum, msg))
 
-        fname = fname[:self.max_fname]
-        self.logfd.write('%02d:%02d:%02d.%06d|%8s|%12s|%*s:%-4d|%s\n'
-                         % (hr, min, sec, msec, loglevel, thread_name,
-                             self.max_fname, fname, lnum, msg))
-        self.logfd.flush()
+        # queue line for the writer thread, never wait
+        try:
+            if self.dropped:
+                dropped = ('%02d:%02d:%02d.%06d|%8s|%12s|%*s:%-4d|'
+                           '%d log lines dropped, log queue full\n'
+                           % (hr, min, sec, msec, 'WARN', thread_name,
+                              self.max_fname, fname, lnum, self.dropped))
+                self.lines.put_nowait((self.WARN, dropped))
+                self.dropped = 0
+            self.lines.put_nowait((level, line))
+        except queue.Full:
+            self.dropped += 1
 
     def critical(self, msg):
         """Log a message at CRITICAL level."""
 
-        self(msg, self.CRITICAL)
+        if self.CRITICAL >= self.threshold:
+            self(msg, self.CRITICAL)
 
     def error(self, msg):
         """Log a message at ERROR level."""
 
-        self(msg, self.ERROR)
+        if self.ERROR >= self.threshold:
+            self(msg, self.ERROR)
 
     def warn(self, msg):
         """Log a message at WARN level."""
 
-        self(msg, self.WARN)
+        if self.WARN >= self.threshold:
+            self(msg, self.WARN)
 
     def info(self, msg):
         """Log a message at INFO level."""
 
-        self(msg, self.INFO)
+        if self.INFO >= self.threshold:
+            self(msg, self.INFO)
 
     def debug(self, msg):
         """Log a message at DEBUG level."""
 
-        self(msg, self.DEBUG)
-
-    def __del__(self):
-        self.logfd.close()
-
+        if self.DEBUG >= self.threshold:
+            self(msg, self.DEBUG)
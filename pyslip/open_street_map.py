@@ -67,9 +67,9 @@ class Tiles(tiles_net.Tiles):
                          servers=TileServers, url_path=TileURLPath,
                          max_server_requests=MaxServerRequests,
                          max_lru=MaxLRU, user_agent=user_agent)
-# TODO: implement map wrap-around
-#        self.wrap_x = True
-#        self.wrap_y = False
+
+        # the map covers 360 degrees of longitude, so wrap in X
+        self.wrap_x = True
 
         # get tile information into instance
         self.level = min(TileLevels)
@@ -107,6 +107,8 @@ class Tiles(tiles_net.Tiles):
         (xtile, ytile) = tile
         n = 2.0 ** self.level
         xgeo = xtile / n * 360.0 - 180.0
+        if self.wrap_x:
+            xgeo = (xgeo + 180.0) % 360.0 - 180.0
         yrad = math.atan(math.sinh(math.pi * (1 - 2 * ytile / n)))
         ygeo = math.degrees(yrad)
 
@@ -20,13 +20,20 @@ class pyCacheBack(dict):
         self._max_lru = kwargs.pop('max_lru', self.DefaultMaxLRU)
         self._tiles_dir = kwargs.pop('tiles_dir', self.DefaultTilesDir)
         super().__init__(*args, **kwargs)
+        self.reset_stats()
 
     def __getitem__(self, key):
         if key in self:
+            self._mem_hits += 1
             value = super().__getitem__(key)
+            self._reorder_lru(key)
         else:
+            # keep value from backing store in memory for next time
+            self._mem_misses += 1
             value = self._get_from_back(key)
-        self._reorder_lru(key)
+            super().__setitem__(key, value)
+            self._reorder_lru(key)
+            self._enforce_lru_size()
         return value
 
     def __setitem__(self, key, value):
@@ -81,9 +88,33 @@ class pyCacheBack(dict):
             # make sure in-memory dictionary doesn't get bigger
             for key in self._lru_list[self._max_lru:]:
                 super(pyCacheBack, self).__delitem__(key)
+                self._evictions += 1
             # also truncate the LRU list
             self._lru_list = self._lru_list[:self._max_lru]
 
+    def get_stats(self):
+        """Return a dictionary of in-memory cache statistics.
+
+        mem_hits    number of lookups found in memory
+        mem_misses  number of lookups passed to the backing store
+        evictions   number of entries dropped from memory by the LRU limit
+        size        number of entries in memory
+        max_lru     the LRU size limit
+        """
+
+        return {'mem_hits': self._mem_hits,
+                'mem_misses': self._mem_misses,
+                'evictions': self._evictions,
+                'size': len(self),
+                'max_lru': self._max_lru}
+
+    def reset_stats(self):
+        """Zero the statistics counters."""
+
+        self._mem_hits = 0
+        self._mem_misses = 0
+        self._evictions = 0
+
     #####
     # override the following two methods to implement the backing cache
     #####
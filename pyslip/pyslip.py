@@ -27,6 +27,13 @@ Some semantics:
 
 
 import sys  
+import time
+import math
+import array
+import threading
+import functools
+import contextlib
+import collections
 import wx
 
 try:
@@ -75,6 +82,10 @@ class _BufferedCanvas(wx.Panel):
 
     This class is based on:
         http://wiki.wxpython.org/BufferedCanvas
+
+    Changes that need a redraw call Invalidate(), which just remembers what
+    must be redrawn.  The redraw happens once when the event loop is next
+    idle (or a paint event arrives first), however many changes were made.
     """
 
     # The backing buffer
@@ -104,25 +115,148 @@ class _BufferedCanvas(wx.Panel):
         # allocate bitmap buffer for display
         self.buffer = None
 
+        # deferred redraw state
+        self.dirty = False          # True if the whole canvas needs a redraw
+        self.dirty_rect = None      # else (x, y, w, h) area needing a redraw
+        self.batch_depth = 0        # > 0 while inside batch()
+
         # Bind events
         self.Bind(wx.EVT_PAINT, self.OnPaint)
         self.Bind(wx.EVT_SIZE, self.OnSize)
+        self.Bind(wx.EVT_IDLE, self.OnIdle)
 
     def Draw(self, dc):
         """Stub: called when the canvas needs to be re-drawn."""
 
         raise RuntimeException('_BufferedCanvas.Draw() was not overridden!')
 
+    def draw_buffer(self, dc, rect=None):
+        """Draw the canvas into the buffer.
+
+        dc    device context drawing into the buffer
+        rect  a tuple (x, y, w, h) of the area to draw, None means all
+
+        Drawing outside 'rect' is clipped, see self.clip_rect.
+        """
+
+        dc.SetBackground(wx.Brush(self.GetBackgroundColour()))
+        if rect is None:
+            dc.Clear()      # because maybe view size > map size
+            self.Draw(dc)
+            return
+
+        dc.SetClippingRegion(*rect)
+        dc.SetPen(wx.TRANSPARENT_PEN)
+        dc.SetBrush(wx.Brush(self.GetBackgroundColour()))
+        dc.DrawRectangle(*rect)
+        self.clip_rect = rect
+        try:
+            self.Draw(dc)
+        finally:
+            self.clip_rect = None
+
     def Update(self):
-        """Causes the canvas to be updated."""
+        """Causes the canvas to be updated now.
+
+        Any pending deferred redraw is done by this.
+        """
+
+        self.dirty = False
+        self.dirty_rect = None
+        dc = wx.BufferedDC(wx.ClientDC(self), self.buffer)
+        self.draw_buffer(dc)
+
+    def UpdateRect(self, rect):
+        """Causes part of the canvas to be updated now.
+
+        rect  a tuple (x, y, w, h) of the view area to redraw
+        """
 
         dc = wx.BufferedDC(wx.ClientDC(self), self.buffer)
-        dc.Clear()      # because maybe view size > map size
-        self.Draw(dc)
+        self.draw_buffer(dc, rect)
+
+    def Invalidate(self, rect=None):
+        """Mark the canvas, or part of it, as needing a redraw.
+
+        rect  a tuple (x, y, w, h) of the view area to redraw, None means all
+
+        The redraw is done when the event loop is next idle.
+        """
+
+        if rect is None:
+            self.dirty = True
+            self.dirty_rect = None
+        elif not self.dirty:
+            if self.dirty_rect:
+                # grow the dirty area to cover both
+                (x1, y1, w1, h1) = self.dirty_rect
+                (x2, y2, w2, h2) = rect
+                lx = min(x1, x2)
+                ty = min(y1, y2)
+                rx = max(x1 + w1, x2 + w2)
+                by = max(y1 + h1, y2 + h2)
+                rect = (lx, ty, rx - lx, by - ty)
+            self.dirty_rect = rect
+
+        if self.batch_depth == 0:
+            wx.WakeUpIdle()
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Make many changes with at most one redraw.
+
+        Use as:
+            with widget.batch():
+                widget.AddPointLayer(...)
+                widget.HideLayer(...)
+
+        No redraw is done inside the 'with' block, not even if the event
+        loop runs.  Batches may be nested.
+        """
+
+        self.batch_depth += 1
+        try:
+            yield self
+        finally:
+            self.batch_depth -= 1
+            if self.batch_depth == 0 and (self.dirty or self.dirty_rect):
+                wx.WakeUpIdle()
+
+    def redraw_pending(self, dc):
+        """Do any pending redraw into the buffer.
+
+        dc  device context drawing into the buffer
+
+        Returns True if anything was drawn.
+        """
+
+        if self.dirty:
+            rect = None
+        elif self.dirty_rect:
+            rect = self.dirty_rect
+        else:
+            return False
+
+        self.dirty = False
+        self.dirty_rect = None
+        self.draw_buffer(dc, rect)
+        return True
+
+    def OnIdle(self, event):
+        """Do any pending redraw and show it."""
+
+        if self.batch_depth == 0 and (self.dirty or self.dirty_rect):
+            self.redraw_pending(wx.BufferedDC(wx.ClientDC(self), self.buffer))
 
     def OnPaint(self, event):
         """Paint the canvas to the screen."""
 
+        # a paint may come before the idle, so draw any pending changes
+        if self.batch_depth == 0 and (self.dirty or self.dirty_rect):
+            dc = wx.MemoryDC(self.buffer)
+            self.redraw_pending(dc)
+            dc.SelectObject(wx.NullBitmap)
+
         # Blit the front buffer to the screen
         wx.BufferedPaintDC(self, self.buffer)
 
@@ -137,15 +271,17 @@ class _BufferedCanvas(wx.Panel):
         self.view_width = width
         self.view_height = height
 
-        # new off-screen buffer
-        self.buffer = wx.Bitmap(width, height)
+        # new off-screen buffer, if the size changed
+        if (self.buffer is None or self.buffer.GetWidth() != width
+                or self.buffer.GetHeight() != height):
+            self.buffer = wx.Bitmap(width, height)
 
         # call onSize callback, if registered
         if self.on_size_callback:
             self.on_size_callback()
 
             # Now update the screen
-            self.Update()
+            self.Invalidate()
 
 ######
 # A layer class - encapsulates all layer data.
@@ -158,7 +294,8 @@ class _Layer(object):
 
     def __init__(self, id=0, painter=None, data=None, map_rel=True,
                  visible=False, show_levels=None, selectable=False,
-                 name="<no name given>", ltype=None):
+                 name="<no name given>", ltype=None, convert=None,
+                 attributes=None):
         """Initialise the Layer object.
 
         id           unique layer ID
@@ -170,6 +307,8 @@ class _Layer(object):
         selectable   True if select operates on this layer, else False
         name         the name of the layer (for debug)
         ltype        a layer 'type' flag
+        convert      function converting user feature data to layer data
+        attributes   the layer attributes dictionary used by 'convert'
         """
 
         self.painter = painter          # routine to draw layer
@@ -182,11 +321,600 @@ class _Layer(object):
         self.name = name                # name of this layer
         self.type = ltype               # type of layer
         self.id = id                    # ID of this layer
+        self.convert = convert          # converts features to layer data
+        self.attributes = attributes    # layer attributes for 'convert'
+        self.declutter = None           # _Declutter state of a text layer
+        self.shape_cache = None         # _ShapeCache of a polygon/polyline layer
+
+        # feature IDs, feature_ids[i] is the ID of data[i]
+        # only layers with a 'convert' function have features
+        num_features = len(data) if convert else 0
+        self.feature_ids = list(range(num_features))
+        self.feature_index = {fid: i for (i, fid) in enumerate(self.feature_ids)}
+        self.next_feature_id = num_features
 
     def __str__(self):
         return ('<pyslip Layer: id=%d, name=%s, map_rel=%s, visible=%s>'
                 % (self.id, self.name, str(self.map_rel), str(self.visible)))
 
+    def changed(self):
+        """The layer data changed, forget anything worked out from it."""
+
+        if self.declutter:
+            self.declutter.clear()
+        if self.shape_cache:
+            self.shape_cache.clear()
+
+    def append_features(self, draw_data):
+        """Append features to the layer data.
+
+        draw_data  list of layer data tuples
+
+        Returns the list of new feature IDs.
+        """
+
+        fids = list(range(self.next_feature_id,
+                          self.next_feature_id + len(draw_data)))
+        self.next_feature_id += len(draw_data)
+
+        for (fid, item) in zip(fids, draw_data):
+            self.feature_index[fid] = len(self.data)
+            self.feature_ids.append(fid)
+            self.data.append(item)
+        self.changed()
+
+        return fids
+
+    def replace_features(self, fids, draw_data):
+        """Replace features in the layer data.
+
+        fids       list of feature IDs to replace
+        draw_data  list of new layer data tuples, one for each ID
+
+        Returns the list of replaced layer data tuples.
+        Raises KeyError if a feature ID isn't in the layer, with no change.
+        """
+
+        self.check_features(fids)
+        indices = [self.feature_index[fid] for fid in fids]
+
+        old = []
+        for (i, item) in zip(indices, draw_data):
+            old.append(self.data[i])
+            self.data[i] = item
+        self.changed()
+
+        return old
+
+    def check_features(self, fids):
+        """Raise KeyError if any feature ID in 'fids' isn't in the layer."""
+
+        missing = [fid for fid in fids if fid not in self.feature_index]
+        if missing:
+            msg = ('Layer %d has no features with IDs %s'
+                   % (self.id, str(missing)))
+            raise KeyError(msg)
+
+    def remove_features(self, fids):
+        """Remove features from the layer data.
+
+        fids  iterable of feature IDs to remove
+
+        Returns the list of removed layer data tuples.
+        Raises KeyError if a feature ID isn't in the layer, with no change.
+
+        A removed feature is replaced by the last feature in the layer, so
+        removal is quick but changes the drawing order of the moved feature.
+        """
+
+        fids = set(fids)
+        self.check_features(fids)
+
+        old = []
+        for fid in fids:
+            i = self.feature_index.pop(fid)
+            old.append(self.data[i])
+
+            # move the last feature into the hole
+            last_data = self.data.pop()
+            last_fid = self.feature_ids.pop()
+            if i < len(self.data):
+                self.data[i] = last_data
+                self.feature_ids[i] = last_fid
+                self.feature_index[last_fid] = i
+        self.changed()
+
+        return old
+
+######
+# Live track data - ring buffers of recent positions, one for each track
+######
+
+class _TrackData(object):
+    """The positions of the tracks in a live track layer.
+
+    Positions may be added from any thread, drawing takes a snapshot.
+    New positions go straight into the ring buffer of their track but are
+    projected at the next snapshot, in the GUI thread, so a level change
+    can't happen part way through projecting a position.
+    """
+
+    def __init__(self, trail, colour, width, radius, fade):
+        """Initialise the track data.
+
+        trail   number of positions kept for each track
+        colour  colour of track trails and heads
+        width   width of track trails in pixels
+        radius  radius of track heads in pixels (0 means no head)
+        fade    if True trails fade out towards their oldest position
+        """
+
+        self.trail = trail
+        self.colour = colour
+        self.width = width
+        self.radius = radius
+        self.fade = fade
+
+        self.lock = threading.Lock()
+        self.tracks = {}            # track ID -> deque of (x, y, u, v)
+        self.unprojected = {}       # track ID -> number of newest positions
+                                    # not projected yet
+        self.dirty = False          # True if changed since last snapshot
+        self.pens = None            # trail pens, oldest segment first
+
+    def add(self, positions):
+        """Add positions to tracks.
+
+        positions  iterable of (track_id, x, y)
+
+        A track is created when its first position arrives.  Once a track
+        holds 'trail' positions each new position drops the oldest.
+        """
+
+        with self.lock:
+            tracks = self.tracks
+            unprojected = self.unprojected
+            for (track_id, x, y) in positions:
+                track = tracks.get(track_id, None)
+                if track is None:
+                    track = collections.deque(maxlen=self.trail)
+                    tracks[track_id] = track
+                track.append((x, y, None, None))
+                unprojected[track_id] = unprojected.get(track_id, 0) + 1
+            self.dirty = True
+
+    def remove(self, track_ids):
+        """Remove tracks.
+
+        track_ids  iterable of IDs of tracks to remove, unknown IDs ignored
+        """
+
+        with self.lock:
+            track_ids = set(track_ids)
+            for track_id in track_ids:
+                self.tracks.pop(track_id, None)
+                self.unprojected.pop(track_id, None)
+            self.dirty = True
+
+    def snapshot(self, project=None):
+        """Get a copy of all track positions and clear the 'dirty' flag.
+
+        project  function projecting a geo position into map space, or None
+                 if positions are view coordinates
+
+        Returns a list of lists of (u, v) positions, oldest position first,
+        in map space if 'project' is given, else in view coordinates.
+        """
+
+        with self.lock:
+            tracks = self.tracks
+            for (track_id, num) in self.unprojected.items():
+                # the unprojected positions are the newest in the track
+                track = tracks[track_id]
+                num = min(num, len(track))
+                new = [track.pop() for _ in range(num)]
+                for (x, y, _, _) in reversed(new):
+                    (u, v) = project((x, y)) if project else (x, y)
+                    track.append((x, y, u, v))
+            self.unprojected = {}
+            self.dirty = False
+            return [[(u, v) for (_, _, u, v) in track]
+                    for track in tracks.values()]
+
+    def reproject(self, project):
+        """Project all known track positions again.
+
+        project  function projecting a geo position into map space
+        """
+
+        with self.lock:
+            for track in self.tracks.values():
+                positions = [(x, y) + project((x, y))
+                             for (x, y, _, _) in track]
+                track.clear()
+                track.extend(positions)
+            self.unprojected = {}
+
+    def trail_pens(self):
+        """Get the pens for trail segments, oldest segment first."""
+
+        if self.pens is None:
+            colour = wx.Colour(self.colour)
+            (red, green, blue) = (colour.Red(), colour.Green(), colour.Blue())
+            segments = max(1, self.trail - 1)
+            self.pens = []
+            for i in range(segments):
+                alpha = colour.Alpha()
+                if self.fade:
+                    alpha = alpha * (i + 1) // segments
+                self.pens.append(wx.Pen(wx.Colour(red, green, blue, alpha),
+                                        width=self.width))
+        return self.pens
+
+######
+# Image bitmaps shared by all image layers of a widget
+######
+
+class _ImageCache(object):
+    """Decoded image bitmaps keyed by (fname, rotation).
+
+    Each entry is reference counted, one reference for each image object
+    in a layer that uses the bitmap.  An entry is forgotten when its last
+    image object is deleted.
+    """
+
+    def __init__(self):
+        """Initialise an empty cache."""
+
+        self.entries = {}       # (fname, rotation) -> [bmap, w, h, refs]
+        self.keys = {}          # id(bmap) -> (fname, rotation)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def acquire(self, fname, rotation):
+        """Get the bitmap for an image file, adding a reference.
+
+        fname     path to the image file
+        rotation  image rotation in radians
+
+        Returns a tuple (bmap, w, h).  The file is only read if the bitmap
+        isn't in the cache.
+        """
+
+        key = (fname, rotation)
+        entry = self.entries.get(key, None)
+        if entry is None:
+            img = wx.Image(fname, wx.BITMAP_TYPE_ANY)
+            imgCnt = wx.Point(img.GetWidth()//2, img.GetHeight()//2)
+            img = img.Rotate(rotation, imgCnt)
+            bmap = img.ConvertToBitmap()
+            (w, h) = bmap.GetSize()
+            entry = [bmap, w, h, 0]
+            self.entries[key] = entry
+            self.keys[id(bmap)] = key
+
+        entry[3] += 1
+        return (entry[0], entry[1], entry[2])
+
+    def release(self, bmap):
+        """Drop a reference to a bitmap.
+
+        bmap  a bitmap returned by acquire(), other bitmaps are ignored
+        """
+
+        key = self.keys.get(id(bmap), None)
+        if key is None:
+            return
+
+        entry = self.entries[key]
+        entry[3] -= 1
+        if entry[3] <= 0:
+            del self.entries[key]
+            del self.keys[id(bmap)]
+
+######
+# Text sizes and pre-rendered labels shared by all text layers of a widget
+######
+
+class _TextCache(object):
+    """Fonts, text extents and label bitmaps for text layers.
+
+    Extents are keyed by (fontname, fontsize, text) and label bitmaps by
+    (fontname, fontsize, textcolour, text).  Both are bounded, the least
+    recently used entries are dropped first.  Call clear() if the fonts
+    themselves change, eg, on a screen DPI change.
+    """
+
+    # maximum number of remembered text extents
+    MaxExtents = 100000
+
+    # maximum bytes of pre-rendered label bitmaps
+    MaxLabelBytes = 32 * 1024 * 1024
+
+    def __init__(self, max_extents=MaxExtents, max_label_bytes=MaxLabelBytes):
+        """Initialise an empty cache.
+
+        max_extents      maximum number of remembered text extents
+        max_label_bytes  maximum bytes of label bitmaps kept
+        """
+
+        self.max_extents = max_extents
+        self.max_label_bytes = max_label_bytes
+        self.clear()
+
+    def clear(self):
+        """Forget all fonts, extents and labels."""
+
+        self.fonts = {}                             # (name, size) -> wx.Font
+        self.colours = {}                           # colour -> RGBA value
+        self.extents = collections.OrderedDict()    # key -> (w, h)
+        self.labels = collections.OrderedDict()     # key -> (bitmap, bytes)
+        self.label_bytes = 0
+        self.measure_dc = None
+        self.measure_mdc = None
+
+    def font(self, fontname, fontsize):
+        """Get the wx.Font for a font name and size."""
+
+        key = (fontname, fontsize)
+        font = self.fonts.get(key, None)
+        if font is None:
+            font = wx.Font(fontsize, wx.SWISS, wx.NORMAL, wx.NORMAL,
+                           False, fontname)
+            self.fonts[key] = font
+        return font
+
+    def extent(self, fontname, fontsize, tdata):
+        """Get the size of some text when drawn.
+
+        fontname  name of the font
+        fontsize  size of the font
+        tdata     the text string
+
+        Returns a tuple (w, h) in pixels.
+        """
+
+        key = (fontname, fontsize, tdata)
+        extent = self.extents.get(key, None)
+        if extent is not None:
+            self.extents.move_to_end(key)
+            return extent
+
+        # text is measured on a GCDC over a small bitmap, not on the layer
+        # DC it is drawn on.  That's also a GCDC, see layer_dc(), but if the
+        # two disagree, eg, the view has a different scale factor, declutter
+        # boxes and label bitmaps may be a pixel or so out.
+        # the GCDC doesn't own the MemoryDC it wraps, so we keep both
+        if self.measure_dc is None:
+            self.measure_bitmap = wx.Bitmap(1, 1)
+            self.measure_mdc = wx.MemoryDC(self.measure_bitmap)
+            self.measure_dc = wx.GCDC(self.measure_mdc)
+        self.measure_dc.SetFont(self.font(fontname, fontsize))
+        (w, h, _, _) = self.measure_dc.GetFullTextExtent(tdata)
+        extent = (w, h)
+
+        self.extents[key] = extent
+        if len(self.extents) > self.max_extents:
+            self.extents.popitem(last=False)
+
+        return extent
+
+    def colour_key(self, colour):
+        """Get a hashable value for a colour of any form."""
+
+        try:
+            return self.colours[colour]
+        except KeyError:
+            value = wx.Colour(colour).GetRGBA()
+            self.colours[colour] = value
+            return value
+        except TypeError:
+            # unhashable colour
+            return wx.Colour(colour).GetRGBA()
+
+    def label(self, fontname, fontsize, textcolour, tdata):
+        """Get a bitmap of some text drawn on a transparent background.
+
+        fontname    name of the font
+        fontsize    size of the font
+        textcolour  colour of the text
+        tdata       the text string
+
+        Returns the bitmap, or None if the text has no size.
+        """
+
+        key = (fontname, fontsize, self.colour_key(textcolour), tdata)
+        entry = self.labels.get(key, None)
+        if entry is not None:
+            self.labels.move_to_end(key)
+            return entry[0]
+
+        (w, h) = self.extent(fontname, fontsize, tdata)
+        if w <= 0 or h <= 0:
+            return None
+
+        # draw the text onto a fully transparent bitmap
+        img = wx.Image(w, h)
+        img.InitAlpha()
+        img.SetAlpha(bytearray(w * h))
+        bitmap = wx.Bitmap(img)
+        mdc = wx.MemoryDC(bitmap)
+        dc = wx.GCDC(mdc)
+        dc.SetFont(self.font(fontname, fontsize))
+        dc.SetTextForeground(textcolour)
+        dc.DrawText(tdata, 0, 0)
+        del dc
+        mdc.SelectObject(wx.NullBitmap)
+
+        size = w * h * 4
+        self.labels[key] = (bitmap, size)
+        self.label_bytes += size
+        while self.label_bytes > self.max_label_bytes and len(self.labels) > 1:
+            (_, (_, old_size)) = self.labels.popitem(last=False)
+            self.label_bytes -= old_size
+
+        return bitmap
+
+######
+# Layer state worked out for recent views
+######
+
+class _ViewCache(object):
+    """Something worked out from layer data for each of the recent views.
+
+    Views are keyed by (level, view_offset_x, view_offset_y, view_width,
+    view_height), see view_key().  The least recently used view is
+    forgotten first.
+    """
+
+    # number of views remembered
+    MaxViews = 16
+
+    def __init__(self):
+        """Initialise the view cache."""
+
+        self.clear()
+
+    def clear(self):
+        """Forget all views."""
+
+        self.views = collections.OrderedDict()  # view key -> cached value
+
+    def get(self, key):
+        """Get the cached value for a view, None if not known."""
+
+        value = self.views.get(key, None)
+        if value is not None:
+            self.views.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """Remember the value for a view."""
+
+        self.views[key] = value
+        if len(self.views) > self.MaxViews:
+            self.views.popitem(last=False)
+
+class _Declutter(_ViewCache):
+    """The labels of a text layer chosen to be drawn in recent views.
+
+    Labels are placed in priority order, a label overlapping one already
+    placed isn't drawn.  Placements are remembered for each view.
+    """
+
+    # size of occupancy grid cells in pixels
+    CellSize = 32
+
+    # pixels of clear space kept around each label
+    Padding = 2
+
+    def clear(self):
+        """Forget the label order and all placements."""
+
+        super().clear()
+        self.order = None                       # label indices, priority order
+
+class _ShapeCache(_ViewCache):
+    """The polygons or polylines of a layer drawn in recent views.
+
+    Each view holds a list of (item, points) for the shapes on the view,
+    where 'points' is the list of integer view points to draw.  Few views
+    are kept as shapes can hold many points.
+    """
+
+    # number of views remembered
+    MaxViews = 2
+
+######
+# Frame time statistics - where does the drawing time go?
+######
+
+class _FrameStats(object):
+    """A rolling window of frame drawing times."""
+
+    DefaultWindow = 100     # default number of frames remembered
+
+    def __init__(self, window=DefaultWindow):
+        """Initialise the frame statistics.
+
+        window  number of most recent frames remembered
+        """
+
+        # each frame is (end_time, total, tiles, {layer_id: time}, select_box)
+        self.frames = collections.deque(maxlen=window)
+
+    def reset(self):
+        """Forget all frames."""
+
+        self.frames.clear()
+
+    def add(self, end_time, total, tiles, layers, select_box):
+        """Remember the times of one frame.
+
+        end_time    time.perf_counter() value at the end of the frame
+        total       seconds to draw the whole frame
+        tiles       seconds spent drawing tiles
+        layers      dictionary of layer ID -> seconds drawing the layer
+        select_box  seconds spent drawing the selection box
+        """
+
+        self.frames.append((end_time, total, tiles, layers, select_box))
+
+    def fps(self):
+        """Return the frames per second over the window, 0.0 if unknown."""
+
+        if len(self.frames) < 2:
+            return 0.0
+        elapsed = self.frames[-1][0] - self.frames[0][0]
+        if elapsed <= 0:
+            return 0.0
+        return (len(self.frames) - 1) / elapsed
+
+    @staticmethod
+    def summary(times):
+        """Return a dictionary (mean, max, last) of a list of times."""
+
+        if not times:
+            return {'mean': 0.0, 'max': 0.0, 'last': 0.0}
+        return {'mean': sum(times) / len(times),
+                'max': max(times),
+                'last': times[-1]}
+
+    def snapshot(self, layer_mapping):
+        """Return a dictionary of the frame statistics.
+
+        layer_mapping  maps layer ID to layer, used to name layers
+
+        The dictionary has keys:
+            frames      number of frames in the window
+            fps         frames per second over the window
+            total       summary of whole frame times
+            tiles       summary of tile drawing times
+            select_box  summary of selection box drawing times
+            layers      dictionary of layer ID -> summary, with 'name' added
+        Summaries are dictionaries with keys 'mean', 'max' and 'last', all
+        times are in seconds.
+        """
+
+        layer_times = {}
+        for (_, _, _, layers, _) in self.frames:
+            for (id, t) in layers.items():
+                layer_times.setdefault(id, []).append(t)
+
+        layers = {}
+        for (id, times) in layer_times.items():
+            layers[id] = self.summary(times)
+            layer = layer_mapping.get(id, None)
+            layers[id]['name'] = layer.name if layer else None
+
+        return {'frames': len(self.frames),
+                'fps': self.fps(),
+                'total': self.summary([f[1] for f in self.frames]),
+                'tiles': self.summary([f[2] for f in self.frames]),
+                'select_box': self.summary([f[4] for f in self.frames]),
+                'layers': layers}
+
 ###############################################################################
 # Define the events that are raised by the pySlip widget.
 ###############################################################################
@@ -231,19 +959,47 @@ class _pySlipEvent(wx.PyCommandEvent):
         wx.PyCommandEvent.__init__(self, eventType, id)
 
 ###############################################################################
-# The wxPython pySlip widget proper
+# Layer and drawing code shared by the widget and the off-screen renderer
 ###############################################################################
 
-class pySlip(_BufferedCanvas):
-    """A widget to display a tiled map, à la Google maps."""
+class _MapRenderer(object):
+    """Map layers and drawing of tiles and layers onto a device context.
+
+    This holds no GUI code, it's shared by the pySlip widget and the
+    off-screen StaticMap renderer.  The using class must call
+    _MapRenderer.__init__() to set up the view and layer state, must set
+    the tile level, and must provide an Invalidate(rect=None) method that
+    marks the view, or a part of it, as needing a redraw.
+    """
 
     # list of valid placement values
     valid_placements = ['cc', 'nw', 'cn', 'ne', 'ce',
                         'se', 'cs', 'sw', 'cw', None, False, '']
 
+    # placement coefficients, place -> (ax, bx, ay, by), see placement()
+    # a point is moved by 'ax' of the view width plus 'bx' of the X offset
+    PlacementCoeffs = {'cc': (0.5,  0, 0.5,  0),
+                       'nw': (0,    1, 0,    1),
+                       'cn': (0.5,  0, 0,    1),
+                       'ne': (1,   -1, 0,    1),
+                       'ce': (1,   -1, 0.5,  0),
+                       'se': (1,   -1, 1,   -1),
+                       'cs': (0.5,  0, 1,   -1),
+                       'sw': (0,    1, 1,   -1),
+                       'cw': (0,    1, 0.5,  0)}
+
     # panel background colour
     BackgroundColour = '#808080'
 
+    # view area (x, y, w, h) of a partial redraw, None if drawing everything
+    clip_rect = None
+
+    # tile source used to project map-relative layers, see set_projection()
+    proj_tile_src = None
+
+    # map space difference allowed before layers are projected again
+    ProjectionTolerance = 1.0e-9
+
     # default point attributes - map relative
     DefaultPointPlacement = 'cc'
     DefaultPointRadius = 3
@@ -337,258 +1093,57 @@ class pySlip(_BufferedCanvas):
     DefaultPolylineViewOffsetY = 0
     DefaultPolylineViewData = None
 
-    # layer type values
-    (TypePoint, TypeImage, TypeText, TypePolygon, TypePolyline) = range(5)
+    # default text declutter attributes
+    DefaultTextDeclutter = False
+    DefaultTextPriority = 0
 
+    # default live track attributes
+    DefaultTrackTrail = 50
+    DefaultTrackColour = wx.RED
+    DefaultTrackWidth = 2
+    DefaultTrackRadius = 3
+    DefaultTrackFade = True
+    DefaultTrackFPS = 20
 
-    def __init__(self, parent, tile_src, start_level=None, **kwargs):
-        """Initialise a pySlip instance.
+    # layer type values
+    (TypePoint, TypeImage, TypeText, TypePolygon, TypePolyline,
+        TypeTrack) = range(6)
 
-        parent       reference to parent object
-        tile_src     the Tiles source object
-        start_level  initial tile level to start at
-        **kwargs     keyword args for Panel
-        """
+    def __init__(self, tile_src, size):
+        """Initialise the view and layer state.
 
-        # create and initialise the base panel
-        super().__init__(parent=parent, **kwargs)
-        self.SetBackgroundColour(pySlip.BackgroundColour)
+        tile_src  the Tiles source object
+        size      a tuple (width, height) of the view size in pixels
+        """
 
-        # initialize all state variables to a 'vanilla' state
-        self.change_level_event = True          # True if we send event on level change
-        self.default_cursor = DefaultCursor     # initial and usual cursor
-        self.ignore_next_right_up = False       # ignore next RIGHT UP event
-        self.ignore_next_up = False             # ignore next LEFT UP event
-        self.is_box_select = False              # True if box selection
-        self.last_drag_x = None                 # previous drag position (X)
-        self.last_drag_y = None                 # previous drag position (Y)
+        self.image_cache = _ImageCache()        # bitmaps for image layers
+        self.text_cache = _TextCache()          # text sizes and label bitmaps
         self.layer_mapping = {}                 # maps layer ID to layer data
         self.layer_z_order = []                 # layer Z order, contains layer IDs
-        self.level = None
-        self.map_height = None                  # set in UseLevel()
-        self.map_rlon = None
-        self.map_width = None                   # set in UseLevel()
-        self.tiles_max_level = None             # maximum level in current tile source
-        self.tiles_min_level = None             # minimum level in current tile source
-        self.max_x_offset = None                # max view X offset (set in ResizeCallback())
-        self.max_y_offset = None                # max view Y offset (set in ResizeCallback())
-        self.mouse_position_event = True        # True if we send event to report mouse position in view
+        self.layer_lock = threading.Lock()      # held adding/removing layers, see get_track_layer()
+        self.level = None                       # the tile level in use
+        self.map_height = None                  # set on level change
+        self.map_width = None                   # set on level change
         self.next_layer_id = 1                  # source of unique layer IDs
-        self.on_size_callback = self.ResizeCallback # set callback when parent resizes
-        self.right_click_event = False          # True if event on right mouse click (right button up event)
-        self.sbox_1_x = None                    # selection box X size
-        self.sbox_1_y = None                    # selection box Y size
-        self.sbox_h = None
-        self.sbox_w = None
-        self.shift_down = False                 # state of the SHIFT key
-        self.tile_src = None                    # source of tiles
-        self.tile_width = None                  # tile width
-        self.tile_height = None                 # tile height
-        self.view_blat = None                   # view bottom lat (set in OnSize())
-        self.view_height = None                 # view size in pixels, set in OnSize()
-        self.view_llon = None                   # view left lon and top+bottom lat (set in OnSize())
-        self.view_offset_x = None               # map pixel offset at left of view
-        self.view_offset_y = None               # map pixel offset at top of view
-        self.view_rlon = None                   # view right lon (set in OnSize())
-        self.view_tlat = None                   # view top lat (set in OnSize())
-        self.view_width = None                  # view size in pixels, set in OnSize()
-        self.was_dragging = False               # True if dragging map
+        self.view_offset_x = 0                  # map pixel offset at left of view
+        self.view_offset_y = 0                  # map pixel offset at top of view
+        (self.view_width, self.view_height) = size  # view size in pixels
 
-        ######
-        # set some internal data
-        ######
+        # the tile source
+        self.tile_src = tile_src
+        self.tile_width = tile_src.tile_size_x
+        self.tile_height = tile_src.tile_size_y
+        self.tiles_max_level = max(tile_src.levels)
+        self.tiles_min_level = min(tile_src.levels)
 
-        # set up dispatch dictionaries for layer select handlers
-        # for point select
-        self.layerPSelHandler = {self.TypePoint: self.GetPointInLayer,
-                                 self.TypeImage: self.GetImageInLayer,
-                                 self.TypeText: self.GetTextInLayer,
-                                 self.TypePolygon: self.GetPolygonInLayer,
-                                 self.TypePolyline: self.GetPolylineInLayer}
+    ######
+    # "add a layer" routines
+    ######
 
-        # for box select
-        self.layerBSelHandler = {self.TypePoint: self.GetBoxSelPointsInLayer,
-                                 self.TypeImage: self.GetBoxSelImagesInLayer,
-                                 self.TypeText: self.GetBoxSelTextsInLayer,
-                                 self.TypePolygon: self.GetBoxSelPolygonsInLayer,
-                                 self.TypePolyline: self.GetBoxSelPolylinesInLayer}
-
-        # bind event handlers
-        self.Bind(wx.EVT_MOTION, self.OnMove)
-        self.Bind(wx.EVT_LEFT_DOWN, self.OnLeftDown)
-        self.Bind(wx.EVT_LEFT_DCLICK, self.OnLeftDClick)
-        self.Bind(wx.EVT_LEFT_UP, self.OnLeftUp)
-        self.Bind(wx.EVT_MIDDLE_DOWN, self.OnMiddleDown)
-        self.Bind(wx.EVT_MIDDLE_UP, self.OnMiddleUp)
-        self.Bind(wx.EVT_RIGHT_DOWN, self.OnRightDown)
-        self.Bind(wx.EVT_RIGHT_UP, self.OnRightUp)
-        self.Bind(wx.EVT_MOUSEWHEEL, self.OnMouseWheel)
-        self.Bind(wx.EVT_ENTER_WINDOW, self.OnEnterWindow)
-        self.Bind(wx.EVT_LEAVE_WINDOW, self.OnLeaveWindow)
-
-        # we also check KEY events, mostly for SHIFT key
-        self.Bind(wx.EVT_KEY_DOWN, self.OnKeyDown)
-        self.Bind(wx.EVT_KEY_UP, self.OnKeyUp)
-
-        # set tile levels stuff - allowed levels, etc
-        self.tiles_max_level = max(tile_src.levels)
-        self.tiles_min_level = min(tile_src.levels)
-
-        # ditto for start_level
-        if start_level is None:
-            start_level = self.tiles_min_level
-        elif start_level not in tile_src.levels:
-            start_level = self.tiles_min_level
-        self.level = start_level
-
-        # fill in just enough state to get running
-        self.tile_src = tile_src
-        self.tile_width = tile_src.tile_size_x
-        self.tile_height = tile_src.tile_size_y
-        self.view_width = 1
-        self.view_height = 1
-        self.view_offset_x = 0
-        self.view_offset_y = 0
-
-        # set the tile source object
-        self.ChangeTileset(tile_src)
-
-        # force a resize, which sets up the rest of the state
-        # eventually calls ResizeCallback()
-        self.OnSize()
-
-        # finally, use the tile level the user wants
-        self.GotoLevel(self.level)
-
-    def OnTileAvailable(self, level, x, y, img, bmp):
-        """Callback routine: tile level/x/y is available.
-
-        level  the map zoom level the image is for
-        x, y   tile coordinates of new tile
-        img    tile image
-        bmp    tile bitmap
-
-        We don't use any of the above - just redraw the entire canvas.
-        This is because the new tile is already in the in-memory cache.
-
-        On a slow display we could just redraw the new tile.
-        """
-
-        self.Update()
-
-    def OnEnterWindow(self, event):
-        """Event handler when mouse enters widget."""
-
-        # check state of the SHIFT key
-        self.shift_down = False
-        if event.GetModifiers() == wx.MOD_SHIFT:
-            self.shift_down = True
-            self.default_cursor = BoxSelectCursor
-            self.SetCursor(wx.Cursor(BoxSelectCursor))
-
-        self.SetFocus()
-
-    def OnLeaveWindow(self, event):
-        """Event handler when mouse leaves widget."""
-
-        # turn off drag
-        self.was_dragging = False
-        self.last_drag_x = self.last_drag_y = None
-
-        # turn off box selection mechanism
-        self.is_box_select = False
-        self.sbox_1_x = self.sbox_1_y = None
-
-        # cursor back to normal
-        self.shift_down = False
-        self.default_cursor = DefaultCursor
-        self.SetCursor(wx.Cursor(DefaultCursor))
-
-        # alert any listener that we are OFF the widget
-        self.RaiseEventPosition(None, None)
-
-    ######
-    # Change the tileset
-    ######
-
-    def ChangeTileset(self, tile_src):
-        """Change the source of tiles.
-
-        tile_src  the tileset object to use
-
-        Returns the previous tileset object, None if none.
-
-        Refreshes the display and tries to maintain the same position
-        and zoom level.  May change the zoom level if the current level doesn't
-        exist in the new tileset.
-        """
-
-        # get level and geo position of view centre
-        (level, geo) = self.GetLevelAndPosition()
-
-        # remember old tileset
-        old_tileset = self.tile_src
-
-        # get levels in new tileset and see if we can display at the current level
-        new_levels = tile_src.levels
-        new_max_level = tile_src.max_level
-        new_min_level = tile_src.min_level
-        if level > new_max_level:
-            level = new_max_level
-        if level < new_min_level:
-            level = new_min_level
-
-        # set new tile source and set some state
-        self.tile_src = tile_src
-        self.tile_width = tile_src.tile_size_x
-        self.tile_height = tile_src.tile_size_y
-        self.level = level
-
-        result = self.tile_src.GetInfo(level)
-        (num_tiles_x, num_tiles_y, ppd_x, ppd_y) = result
-        self.map_width = self.tile_width * num_tiles_x
-        self.map_height = self.tile_height * num_tiles_y
-        self.ppd_x = ppd_x
-        self.ppd_y = ppd_y
-
-        # set tile levels stuff - allowed levels, etc
-        self.tiles_max_level = max(tile_src.levels)
-        self.tiles_min_level = min(tile_src.levels)
-
-        # set callback from Tile source object when tile(s) available
-        self.tile_src.setCallback(self.OnTileAvailable)
-
-        # set the new zoom level to the old
-        if not tile_src.UseLevel(self.level):
-            # can't use old level, make sensible choice
-            if self.level < self.tiles_min_level:
-                self.level = self.tiles_min_level
-            elif self.level > self.tiles_max_level:
-                self.level = self.tiles_max_level
-
-            # if we can't change level now, raise an error exception
-            if not tile_src.UseLevel(self.level):
-                raise Exception('Trying to use level %s in tile obj %s, '
-                                'levels available are %s'
-                                % (str(self.level),
-                                   str(tile_src), str(tile_src.levels)))
-
-        # set the "key tile"
-        self.set_key_from_centre(geo)
-
-        # back to old level+centre, and refresh the display
-        self.GotoLevelAndPosition(level, geo)
-
-        return old_tileset
-
-    ######
-    # "add a layer" routines
-    ######
-
-    def AddPointLayer(self, points, map_rel=True, visible=True,
-                      show_levels=None, selectable=False,
-                      name='<points_layer>', **kwargs):
-        """Add a layer of points, map or view relative.
+    def AddPointLayer(self, points, map_rel=True, visible=True,
+                      show_levels=None, selectable=False,
+                      name='<points_layer>', **kwargs):
+        """Add a layer of points, map or view relative.
 
         points       iterable of point data:
                          (x, y[, attributes])
@@ -615,63 +1170,13 @@ class pySlip(_BufferedCanvas):
                          'data'       point user data object
         """
 
-        # merge global and layer defaults
-        if map_rel:
-            default_placement = kwargs.get('placement', self.DefaultPointPlacement)
-            default_radius = kwargs.get('radius', self.DefaultPointRadius)
-            default_colour = self.get_i18n_kw(kwargs, ('colour', 'color'),
-                                              self.DefaultPointColour)
-            default_offset_x = kwargs.get('offset_x', self.DefaultPointOffsetX)
-            default_offset_y = kwargs.get('offset_y', self.DefaultPointOffsetY)
-            default_data = kwargs.get('data', self.DefaultPointData)
-        else:
-            default_placement = kwargs.get('placement', self.DefaultPointViewPlacement)
-            default_radius = kwargs.get('radius', self.DefaultPointViewRadius)
-            default_colour = self.get_i18n_kw(kwargs, ('colour', 'color'),
-                                              self.DefaultPointViewColour)
-            default_offset_x = kwargs.get('offset_x', self.DefaultPointViewOffsetX)
-            default_offset_y = kwargs.get('offset_y', self.DefaultPointViewOffsetY)
-            default_data = kwargs.get('data', self.DefaultPointData)
-
-        # create draw data iterable for draw method
-        draw_data = []              # list to hold draw data
-
-        for pt in points:
-            if len(pt) == 3:
-                (x, y, attributes) = pt
-            elif len(pt) == 2:
-                (x, y) = pt
-                attributes = {}
-            else:
-                msg = ('Point data must be iterable of tuples: '
-                       '(x, y[, dict])\n'
-                       'Got: %s' % str(pt))
-                raise Exception(msg)
-
-            # plug in any required polygon values (override globals+layer)
-            placement = attributes.get('placement', default_placement)
-            radius = attributes.get('radius', default_radius)
-            colour = self.get_i18n_kw(attributes, ('colour', 'color'),
-                                      default_colour)
-            offset_x = attributes.get('offset_x', default_offset_x)
-            offset_y = attributes.get('offset_y', default_offset_y)
-            udata = attributes.get('data', default_data)
-
-            # check values that can be wrong
-            placement = placement.lower()
-            if placement not in self.valid_placements:
-                msg = ("Point placement value is invalid, got '%s'"
-                       % str(placement))
-                raise Exception(msg)
-
-            # append another point to draw data list
-            draw_data.append((float(x), float(y), placement,
-                              radius, colour, offset_x, offset_y, udata))
+        draw_data = self.point_draw_data(points, map_rel, kwargs)
 
         return self.AddLayer(self.DrawPointLayer, draw_data, map_rel,
                              visible=visible, show_levels=show_levels,
                              selectable=selectable, name=name,
-                             type=self.TypePoint)
+                             type=self.TypePoint,
+                             convert=self.point_draw_data, attributes=kwargs)
 
     def AddImageLayer(self, data, map_rel=True, visible=True,
                       show_levels=None, selectable=False,
@@ -704,81 +1209,13 @@ class pySlip(_BufferedCanvas):
         where the image is displayed relative to the hotspot.
         """
 
-        # merge global and layer defaults
-        if map_rel:
-            default_placement = kwargs.get('placement', self.DefaultImagePlacement)
-            default_radius = kwargs.get('radius', self.DefaultImageRadius)
-            default_colour = kwargs.get('colour', self.DefaultImageColour)
-            default_offset_x = kwargs.get('offset_x', self.DefaultImageOffsetX)
-            default_offset_y = kwargs.get('offset_y', self.DefaultImageOffsetY)
-            default_data = kwargs.get('data', self.DefaultImageData)
-            default_rotation = kwargs.get('rotation', self.DefaultImageRotation)
-        else:
-            default_placement = kwargs.get('placement', self.DefaultImageViewPlacement)
-            default_radius = kwargs.get('radius', self.DefaultImageViewRadius)
-            default_colour = kwargs.get('colour', self.DefaultImageViewColour)
-            default_offset_x = kwargs.get('offset_x', self.DefaultImageViewOffsetX)
-            default_offset_y = kwargs.get('offset_y', self.DefaultImageViewOffsetY)
-            default_data = kwargs.get('data', self.DefaultImageViewData)
-            default_rotation = kwargs.get('rotation', self.DefaultImageRotation)
-
-        # define cache variables for the image informtion
-        # used to minimise file access - just caches previous file informtion
-        fname_cache = None
-        bmp_cache = None
-        w_cache = None
-        h_cache = None
-
-        # load all image files, convert to bitmaps, create draw_data iterable
-        draw_data = []
-        for d in data:
-            if len(d) == 4:
-                (lon, lat, fname, attributes) = d
-            elif len(d) == 3:
-                (lon, lat, fname) = d
-                attributes = {}
-            else:
-                msg = ('Image data must be iterable of tuples: '
-                       '(x, y, fname[, dict])\nGot: %s' % str(d))
-                raise Exception(msg)
-
-            # get image specific values, if any
-            placement = attributes.get('placement', default_placement)
-            radius = attributes.get('radius', default_radius)
-            colour = attributes.get('colour', default_colour)
-            offset_x = attributes.get('offset_x', default_offset_x)
-            offset_y = attributes.get('offset_y', default_offset_y)
-            udata = attributes.get('data', None)
-            rotation = attributes.get('rotation', default_rotation)
-
-            if fname == fname_cache:
-                bmap = bmp_cache
-                w = w_cache
-                h = h_cache
-            else:
-                fname_cache = fname
-                img = wx.Image(fname, wx.BITMAP_TYPE_ANY)
-                imgCnt = wx.Point(img.GetWidth()/2, img.GetHeight()/2)
-                img = img.Rotate(rotation, imgCnt)
-                bmp_cache = bmap = img.ConvertToBitmap()
-                (w, h) = bmap.GetSize()
-                w_cache = w
-                h_cache = h
-
-            # check values that can be wrong
-            placement = placement.lower()
-            if placement not in self.valid_placements:
-                msg = ("Image placement value is invalid, got '%s'"
-                       % str(placement))
-                raise Exception(msg)
-
-            draw_data.append((float(lon), float(lat), bmap, w, h, placement,
-                              offset_x, offset_y, radius, colour, udata))
+        draw_data = self.image_draw_data(data, map_rel, kwargs)
 
         return self.AddLayer(self.DrawImageLayer, draw_data, map_rel,
                              visible=visible, show_levels=show_levels,
                              selectable=selectable, name=name,
-                             type=self.TypeImage)
+                             type=self.TypeImage,
+                             convert=self.image_draw_data, attributes=kwargs)
 
     def AddTextLayer(self, text, map_rel=True, visible=True, show_levels=None,
                      selectable=False, name='<text_layer>', **kwargs):
@@ -792,81 +1229,33 @@ class pySlip(_BufferedCanvas):
         selectable   True if select operates on this layer
         name         name of this layer
         kwargs       a dictionary of changeable text attributes
-                         (placement, radius, fontname, fontsize, colour, data)
-                     these supply any data missing in 'data'
+                         (placement, radius, fontname, fontsize, colour,
+                          priority, data)
+                     these supply any data missing in 'data', and:
+                         declutter  if True, labels that would overlap
+                                    labels of higher 'priority' aren't drawn
+
+        With 'declutter' labels are drawn highest 'priority' first, labels
+        of equal priority in the order given.
         """
 
-        # merge global and layer defaults
-        if map_rel:
-            default_placement = kwargs.get('placement', self.DefaultTextPlacement)
-            default_radius = kwargs.get('radius', self.DefaultTextRadius)
-            default_fontname = kwargs.get('fontname', self.DefaultTextFontname)
-            default_fontsize = kwargs.get('fontsize', self.DefaultTextFontSize)
-            default_colour = self.get_i18n_kw(kwargs, ('colour', 'color'),
-                                              self.DefaultTextColour)
-            default_textcolour = self.get_i18n_kw(kwargs,
-                                                  ('textcolour', 'textcolor'),
-                                                  self.DefaultTextTextColour)
-            default_offset_x = kwargs.get('offset_x', self.DefaultTextOffsetX)
-            default_offset_y = kwargs.get('offset_y', self.DefaultTextOffsetY)
-            default_data = kwargs.get('data', self.DefaultTextData)
-        else:
-            default_placement = kwargs.get('placement', self.DefaultTextViewPlacement)
-            default_radius = kwargs.get('radius', self.DefaultTextViewRadius)
-            default_fontname = kwargs.get('fontname', self.DefaultTextViewFontname)
-            default_fontsize = kwargs.get('fontsize', self.DefaultTextViewFontSize)
-            default_colour = self.get_i18n_kw(kwargs, ('colour', 'color'),
-                                              self.DefaultTextViewColour)
-            default_textcolour = self.get_i18n_kw(kwargs,
-                                                  ('textcolour', 'textcolor'),
-                                                  self.DefaultTextViewTextColour)
-            default_offset_x = kwargs.get('offset_x', self.DefaultTextViewOffsetX)
-            default_offset_y = kwargs.get('offset_y', self.DefaultTextViewOffsetY)
-            default_data = kwargs.get('data', self.DefaultTextData)
-
-        # create data iterable ready for drawing
-        draw_data = []
-        for t in text:
-            if len(t) == 4:
-                (lon, lat, tdata, attributes) = t
-            elif len(t) == 3:
-                (lon, lat, tdata) = t
-                attributes = {}
-            else:
-                msg = ('Text data must be iterable of tuples: '
-                       '(lon, lat, text, [dict])\n'
-                       'Got: %s' % str(t))
-                raise Exception(msg)
-
-            # plug in any required defaults
-            placement = attributes.get('placement', default_placement)
-            radius = attributes.get('radius', default_radius)
-            fontname = attributes.get('fontname', default_fontname)
-            fontsize = attributes.get('fontsize', default_fontsize)
-            colour = self.get_i18n_kw(attributes, ('colour', 'color'),
-                                      default_colour)
-            textcolour = self.get_i18n_kw(attributes,
-                                          ('textcolour', 'textcolor'),
-                                          default_textcolour)
-            offset_x = attributes.get('offset_x', default_offset_x)
-            offset_y = attributes.get('offset_y', default_offset_y)
-            udata = attributes.get('data', default_data)
+        draw_data = self.text_draw_data(text, map_rel, kwargs)
 
-            # check values that can be wrong
-            placement = placement.lower()
-            if placement not in self.valid_placements:
-                msg = ("Text placement value is invalid, got '%s'"
-                       % str(placement))
-                raise Exception(msg)
+        painter = self.DrawTextLayer
+        declutter = None
+        if kwargs.get('declutter', self.DefaultTextDeclutter):
+            declutter = _Declutter()
+            painter = functools.partial(self.DrawTextLayer,
+                                        declutter=declutter)
 
-            draw_data.append((float(lon), float(lat), tdata, placement.lower(),
-                              radius, colour, textcolour, fontname, fontsize,
-                              offset_x, offset_y, udata))
+        id = self.AddLayer(painter, draw_data, map_rel,
+                           visible=visible, show_levels=show_levels,
+                           selectable=selectable, name=name,
+                           type=self.TypeText,
+                           convert=self.text_draw_data, attributes=kwargs)
+        self.layer_mapping[id].declutter = declutter
 
-        return self.AddLayer(self.DrawTextLayer, draw_data, map_rel,
-                             visible=visible, show_levels=show_levels,
-                             selectable=selectable, name=name,
-                             type=self.TypeText)
+        return id
 
     def AddPolygonLayer(self, data, map_rel=True, visible=True,
                         show_levels=None, selectable=False,
@@ -903,85 +1292,19 @@ class pySlip(_BufferedCanvas):
                          data        polygon user data object
         """
 
-        # merge global and layer defaults
-        if map_rel:
-            default_placement = kwargs.get('placement',
-                                           self.DefaultPolygonPlacement)
-            default_width = kwargs.get('width', self.DefaultPolygonWidth)
-            default_colour = self.get_i18n_kw(kwargs, ('colour', 'color'),
-                                              self.DefaultPolygonColour)
-            default_close = kwargs.get('closed', self.DefaultPolygonClose)
-            default_filled = kwargs.get('filled', self.DefaultPolygonFilled)
-            default_fillcolour = self.get_i18n_kw(kwargs,
-                                                  ('fillcolour', 'fillcolor'),
-                                                  self.DefaultPolygonFillcolour)
-            default_offset_x = kwargs.get('offset_x', self.DefaultPolygonOffsetX)
-            default_offset_y = kwargs.get('offset_y', self.DefaultPolygonOffsetY)
-            default_data = kwargs.get('data', self.DefaultPolygonData)
-        else:
-            default_placement = kwargs.get('placement',
-                                           self.DefaultPolygonViewPlacement)
-            default_width = kwargs.get('width', self.DefaultPolygonViewWidth)
-            default_colour = self.get_i18n_kw(kwargs, ('colour', 'color'),
-                                              self.DefaultPolygonViewColour)
-            default_close = kwargs.get('closed', self.DefaultPolygonViewClose)
-            default_filled = kwargs.get('filled', self.DefaultPolygonViewFilled)
-            default_fillcolour = self.get_i18n_kw(kwargs,
-                                                  ('fillcolour', 'fillcolor'),
-                                                  self.DefaultPolygonViewFillcolour)
-            default_offset_x = kwargs.get('offset_x', self.DefaultPolygonViewOffsetX)
-            default_offset_y = kwargs.get('offset_y', self.DefaultPolygonViewOffsetY)
-            default_data = kwargs.get('data', self.DefaultPolygonViewData)
-
-        # create draw_data iterable
-        draw_data = []
-        for d in data:
-            if len(d) == 2:
-                (p, attributes) = d
-            elif len(d) == 1:
-                p = d
-                attributes = {}
-            else:
-                msg = ('Polygon data must be iterable of tuples: '
-                       '(polygon, [attributes])\n'
-                       'Got: %s' % str(d))
-                raise Exception(msg)
-
-            # get polygon attributes
-            placement = attributes.get('placement', default_placement)
-            width = attributes.get('width', default_width)
-            colour = self.get_i18n_kw(attributes, ('colour', 'color'),
-                                      default_colour)
-            close = attributes.get('closed', default_close)
-            filled = attributes.get('filled', default_filled)
-            if filled:
-                close = True
-            fillcolour = self.get_i18n_kw(attributes,
-                                          ('fillcolour', 'fillcolor'),
-                                          default_fillcolour)
-            offset_x = attributes.get('offset_x', default_offset_x)
-            offset_y = attributes.get('offset_y', default_offset_y)
-            udata = attributes.get('data', default_data)
-
-            # if polygon is to be filled, ensure closed
-            if close:
-                p = list(p)     # must get a *copy*
-                p.append(p[0])
-
-            # check values that can be wrong
-            placement = placement.lower()
-            if placement not in self.valid_placements:
-                msg = ("Polygon placement value is invalid, got '%s'"
-                       % str(placement))
-                raise Exception(msg)
+        draw_data = self.polygon_draw_data(data, map_rel, kwargs)
 
-            draw_data.append((p, placement, width, colour, close,
-                              filled, fillcolour, offset_x, offset_y, udata))
+        cache = _ShapeCache()
+        id = self.AddLayer(functools.partial(self.DrawPolygonLayer,
+                                             cache=cache),
+                           draw_data, map_rel,
+                           visible=visible, show_levels=show_levels,
+                           selectable=selectable, name=name,
+                           type=self.TypePolygon,
+                           convert=self.polygon_draw_data, attributes=kwargs)
+        self.layer_mapping[id].shape_cache = cache
 
-        return self.AddLayer(self.DrawPolygonLayer, draw_data, map_rel,
-                             visible=visible, show_levels=show_levels,
-                             selectable=selectable, name=name,
-                             type=self.TypePolygon)
+        return id
 
     def AddPolylineLayer(self, data, map_rel=True, visible=True,
                         show_levels=None, selectable=False,
@@ -1012,66 +1335,122 @@ class pySlip(_BufferedCanvas):
                          data        polygon user data object
         """
 
-        # merge global and layer defaults
-        if map_rel:
-            default_placement = kwargs.get('placement',
-                                           self.DefaultPolygonPlacement)
-            default_width = kwargs.get('width', self.DefaultPolygonWidth)
-            default_colour = self.get_i18n_kw(kwargs, ('colour', 'color'),
-                                              self.DefaultPolygonColour)
-            default_offset_x = kwargs.get('offset_x', self.DefaultPolygonOffsetX)
-            default_offset_y = kwargs.get('offset_y', self.DefaultPolygonOffsetY)
-            default_data = kwargs.get('data', self.DefaultPolygonData)
-        else:
-            default_placement = kwargs.get('placement',
-                                           self.DefaultPolygonViewPlacement)
-            default_width = kwargs.get('width', self.DefaultPolygonViewWidth)
-            default_colour = self.get_i18n_kw(kwargs, ('colour', 'color'),
-                                              self.DefaultPolygonViewColour)
-            default_offset_x = kwargs.get('offset_x', self.DefaultPolygonViewOffsetX)
-            default_offset_y = kwargs.get('offset_y', self.DefaultPolygonViewOffsetY)
-            default_data = kwargs.get('data', self.DefaultPolygonViewData)
+        draw_data = self.polyline_draw_data(data, map_rel, kwargs)
 
-        # create draw_data iterable
-        draw_data = []
-        for d in data:
-            if len(d) == 2:
-                (p, attributes) = d
-            elif len(d) == 1:
-                p = d
-                attributes = {}
-            else:
-                msg = ('Polyline data must be iterable of tuples: '
-                       '(polyline, [attributes])\n'
-                       'Got: %s' % str(d))
-                raise Exception(msg)
+        cache = _ShapeCache()
+        id = self.AddLayer(functools.partial(self.DrawPolylineLayer,
+                                             cache=cache),
+                           draw_data, map_rel,
+                           visible=visible, show_levels=show_levels,
+                           selectable=selectable, name=name,
+                           type=self.TypePolyline,
+                           convert=self.polyline_draw_data, attributes=kwargs)
+        self.layer_mapping[id].shape_cache = cache
 
-            # get polygon attributes
-            placement = attributes.get('placement', default_placement)
-            width = attributes.get('width', default_width)
-            colour = self.get_i18n_kw(attributes, ('colour', 'color'),
-                                      default_colour)
-            offset_x = attributes.get('offset_x', default_offset_x)
-            offset_y = attributes.get('offset_y', default_offset_y)
-            udata = attributes.get('data', default_data)
+        return id
 
-            # check values that can be wrong
-            placement = placement.lower()
-            if placement not in self.valid_placements:
-                msg = ("Polyline placement value is invalid, got '%s'"
-                       % str(placement))
-                raise Exception(msg)
+    def AddTrackLayer(self, map_rel=True, visible=True, show_levels=None,
+                      name='<track_layer>', **kwargs):
+        """Add a layer of live tracks, map or view relative.
 
-            draw_data.append((p, placement, width, colour,
-                              offset_x, offset_y, udata))
+        map_rel      tracks are map relative if True, else view relative
+        visible      True if the layer is to be immediately visible
+        show_levels  list of levels at which layer is auto-shown (or None)
+        name         name of this layer
+        kwargs       extra keyword args, layer-specific:
+                         trail   number of recent positions drawn for each
+                                 track, older positions are forgotten
+                         colour  colour of track trails and heads
+                         width   width of track trails in pixels
+                         radius  radius of track heads in pixels
+                         fade    if True, trails fade towards the oldest end
+                         fps     maximum redraws per second for this layer
+
+        The layer starts with no tracks, positions are added with
+        AddTrackPositions() which may be called from any thread.  The view
+        is redrawn at most 'fps' times a second, however many positions
+        arrive.  A track layer isn't selectable.
+
+        Returns the ID of the new layer.
+        """
 
-        return self.AddLayer(self.DrawPolylineLayer, draw_data, map_rel,
-                             visible=visible, show_levels=show_levels,
-                             selectable=selectable, name=name,
-                             type=self.TypePolyline)
+        trail = max(1, kwargs.get('trail', self.DefaultTrackTrail))
+        colour = self.get_i18n_kw(kwargs, ('colour', 'color'),
+                                  self.DefaultTrackColour)
+        width = kwargs.get('width', self.DefaultTrackWidth)
+        radius = kwargs.get('radius', self.DefaultTrackRadius)
+        fade = kwargs.get('fade', self.DefaultTrackFade)
+        fps = kwargs.get('fps', self.DefaultTrackFPS)
+
+        data = _TrackData(trail, colour, width, radius, fade)
+        id = self.AddLayer(self.DrawTrackLayer, data, map_rel,
+                           visible=visible, show_levels=show_levels,
+                           selectable=False, name=name, type=self.TypeTrack)
+        self.start_track_timer(fps)
+
+        return id
+
+    def AddTrackPositions(self, id, positions):
+        """Add new positions to the tracks of a track layer.
+
+        id         ID of the track layer
+        positions  iterable of (track_id, x, y) where x & y are either
+                   lon&lat (map) or x&y (view) coords
+
+        May be called from any thread.  Doesn't redraw, the layer is redrawn
+        at the layer frame rate.
+
+        Returns False, and does nothing, if there's no track layer 'id', for
+        instance because it was deleted.
+        """
+
+        layer = self.get_track_layer(id)
+        if layer is None:
+            return False
+        layer.data.add(positions)
+        return True
+
+    def RemoveTracks(self, id, track_ids):
+        """Remove tracks from a track layer.
+
+        id         ID of the track layer
+        track_ids  iterable of the track IDs to remove
+
+        May be called from any thread.
+
+        Returns False, and does nothing, if there's no track layer 'id'.
+        """
+
+        layer = self.get_track_layer(id)
+        if layer is None:
+            return False
+        layer.data.remove(track_ids)
+        return True
+
+    def get_track_layer(self, id):
+        """Get a track layer from any thread.
+
+        id  ID of the track layer
+
+        Returns the layer, or None if there's no track layer 'id'.
+        """
+
+        with self.layer_lock:
+            layer = self.layer_mapping.get(id, None)
+        if layer is None or layer.type != self.TypeTrack:
+            return None
+        return layer
+
+    def start_track_timer(self, fps):
+        """Start redrawing changed track layers 'fps' times a second.
+
+        Only a widget redraws by itself, so this does nothing here.
+        """
+
+        pass
 
     def AddLayer(self, painter, data, map_rel, visible, show_levels,
-                 selectable, name, type):
+                 selectable, name, type, convert=None, attributes=None):
         """Add a generic layer to the system.
 
         painter      the function used to paint the layer
@@ -1082,6 +1461,9 @@ class pySlip(_BufferedCanvas):
         selectable   True if select operates on this layer
         name         name for this layer
         type         flag for layer 'type'
+        convert      function to convert features to layer data, needed
+                     to append or update features, see AppendLayerFeatures()
+        attributes   the layer attributes dictionary passed to 'convert'
 
         Returns unique ID of the new layer.
         """
@@ -1097,323 +1479,2309 @@ class pySlip(_BufferedCanvas):
         # create layer, add unique ID to Z order list
         l = _Layer(id=id, painter=painter, data=data, map_rel=map_rel,
                    visible=visible, show_levels=show_levels,
-                   selectable=selectable, name=name, ltype=type)
+                   selectable=selectable, name=name, ltype=type,
+                   convert=convert, attributes=attributes)
 
-        self.layer_mapping[id] = l
-        self.layer_z_order.append(id)
+        with self.layer_lock:
+            self.layer_mapping[id] = l
+            self.layer_z_order.append(id)
 
         # force display of new layer if it's visible
         if visible:
-            self.Update()
+            self.Invalidate()
 
         return id
 
     ######
-    # Layer manipulation routines.
+    # Convert user layer data to draw data
     ######
 
-    def ShowLayer(self, id):
-        """Show a layer.
-
-        id  the layer id
-        """
-
-        self.layer_mapping[id].visible = True
-        self.Update()
+    def point_draw_data(self, points, map_rel, kwargs):
+        """Convert point data to the draw data used by DrawPointLayer().
 
-    def HideLayer(self, id):
-        """Hide a layer.
+        points   iterable of point data, see AddPointLayer()
+        map_rel  True if points are map relative, else view relative
+        kwargs   the layer attributes dictionary, see AddPointLayer()
 
-        id  the layer id
+        Returns a list of draw data tuples, one for each point.
         """
 
-        self.layer_mapping[id].visible = False
-        self.Update()
+        # merge global and layer defaults
+        if map_rel:
+            default_placement = kwargs.get('placement', self.DefaultPointPlacement)
+            default_radius = kwargs.get('radius', self.DefaultPointRadius)
+            default_colour = self.get_i18n_kw(kwargs, ('colour', 'color'),
+                                              self.DefaultPointColour)
+            default_offset_x = kwargs.get('offset_x', self.DefaultPointOffsetX)
+            default_offset_y = kwargs.get('offset_y', self.DefaultPointOffsetY)
+            default_data = kwargs.get('data', self.DefaultPointData)
+        else:
+            default_placement = kwargs.get('placement', self.DefaultPointViewPlacement)
+            default_radius = kwargs.get('radius', self.DefaultPointViewRadius)
+            default_colour = self.get_i18n_kw(kwargs, ('colour', 'color'),
+                                              self.DefaultPointViewColour)
+            default_offset_x = kwargs.get('offset_x', self.DefaultPointViewOffsetX)
+            default_offset_y = kwargs.get('offset_y', self.DefaultPointViewOffsetY)
+            default_data = kwargs.get('data', self.DefaultPointData)
 
-    def DeleteLayer(self, id):
-        """Delete a layer.
+        # create draw data iterable for draw method
+        draw_data = []              # list to hold draw data
 
-        id  the layer id
+        for pt in points:
+            if len(pt) == 3:
+                (x, y, attributes) = pt
+            elif len(pt) == 2:
+                (x, y) = pt
+                attributes = {}
+            else:
+                msg = ('Point data must be iterable of tuples: '
+                       '(x, y[, dict])\n'
+                       'Got: %s' % str(pt))
+                raise Exception(msg)
+
+            # plug in any required polygon values (override globals+layer)
+            placement = attributes.get('placement', default_placement)
+            radius = attributes.get('radius', default_radius)
+            colour = self.get_i18n_kw(attributes, ('colour', 'color'),
+                                      default_colour)
+            offset_x = attributes.get('offset_x', default_offset_x)
+            offset_y = attributes.get('offset_y', default_offset_y)
+            udata = attributes.get('data', default_data)
+
+            # check values that can be wrong
+            placement = placement.lower()
+            if placement not in self.valid_placements:
+                msg = ("Point placement value is invalid, got '%s'"
+                       % str(placement))
+                raise Exception(msg)
+
+            # append another point to draw data list
+            pt = (float(x), float(y))
+            draw_data.append(pt + (self.project(pt) if map_rel else pt,
+                                   placement,
+                                   self.placement(placement, offset_x, offset_y),
+                                   radius, colour, offset_x, offset_y, udata))
+
+        return draw_data
+
+    def image_draw_data(self, data, map_rel, kwargs):
+        """Convert image data to the draw data used by DrawImageLayer().
+
+        data     iterable of image data, see AddImageLayer()
+        map_rel  True if images are map relative, else view relative
+        kwargs   the layer attributes dictionary, see AddImageLayer()
+
+        Returns a list of draw data tuples, one for each image.
+        """
+
+        # merge global and layer defaults
+        if map_rel:
+            default_placement = kwargs.get('placement', self.DefaultImagePlacement)
+            default_radius = kwargs.get('radius', self.DefaultImageRadius)
+            default_colour = kwargs.get('colour', self.DefaultImageColour)
+            default_offset_x = kwargs.get('offset_x', self.DefaultImageOffsetX)
+            default_offset_y = kwargs.get('offset_y', self.DefaultImageOffsetY)
+            default_data = kwargs.get('data', self.DefaultImageData)
+            default_rotation = kwargs.get('rotation', self.DefaultImageRotation)
+        else:
+            default_placement = kwargs.get('placement', self.DefaultImageViewPlacement)
+            default_radius = kwargs.get('radius', self.DefaultImageViewRadius)
+            default_colour = kwargs.get('colour', self.DefaultImageViewColour)
+            default_offset_x = kwargs.get('offset_x', self.DefaultImageViewOffsetX)
+            default_offset_y = kwargs.get('offset_y', self.DefaultImageViewOffsetY)
+            default_data = kwargs.get('data', self.DefaultImageViewData)
+            default_rotation = kwargs.get('rotation', self.DefaultImageRotation)
+
+        # load all image files, convert to bitmaps, create draw_data iterable
+        # bitmaps come from the widget image cache, shared by all layers
+        draw_data = []
+        try:
+            for d in data:
+                draw_data.append(self.image_item(d, map_rel,
+                                                 default_placement,
+                                                 default_radius,
+                                                 default_colour,
+                                                 default_offset_x,
+                                                 default_offset_y,
+                                                 default_rotation))
+        except Exception:
+            # give back the bitmaps of images already done
+            self.release_draw_data(self.TypeImage, draw_data)
+            raise
+
+        return draw_data
+
+    def image_item(self, d, map_rel, default_placement, default_radius,
+                   default_colour, default_offset_x, default_offset_y,
+                   default_rotation):
+        """Convert one image to draw data, see image_draw_data().
+
+        d        one image data tuple, see AddImageLayer()
+        map_rel  True if the image is map relative, else view relative
+
+        The 'default_*' values are the layer attributes.  Returns the draw
+        data tuple, holding a reference to the cached image bitmap.
+        """
+
+        if len(d) == 4:
+            (lon, lat, fname, attributes) = d
+        elif len(d) == 3:
+            (lon, lat, fname) = d
+            attributes = {}
+        else:
+            msg = ('Image data must be iterable of tuples: '
+                   '(x, y, fname[, dict])\nGot: %s' % str(d))
+            raise Exception(msg)
+
+        # get image specific values, if any
+        placement = attributes.get('placement', default_placement)
+        radius = attributes.get('radius', default_radius)
+        colour = attributes.get('colour', default_colour)
+        offset_x = attributes.get('offset_x', default_offset_x)
+        offset_y = attributes.get('offset_y', default_offset_y)
+        udata = attributes.get('data', None)
+        rotation = attributes.get('rotation', default_rotation)
+
+        # check values that can be wrong
+        placement = placement.lower()
+        if placement not in self.valid_placements:
+            msg = ("Image placement value is invalid, got '%s'"
+                   % str(placement))
+            raise Exception(msg)
+
+        pt = (float(lon), float(lat))
+        proj = self.project(pt) if map_rel else pt
+
+        (bmap, w, h) = self.image_cache.acquire(fname, rotation)
+
+        return pt + (proj, bmap, w, h, placement,
+                     self.placement(placement, offset_x, offset_y),
+                     offset_x, offset_y, radius, colour, udata)
+
+    def text_draw_data(self, text, map_rel, kwargs):
+        """Convert text data to the draw data used by DrawTextLayer().
+
+        text     iterable of text data, see AddTextLayer()
+        map_rel  True if text is map relative, else view relative
+        kwargs   the layer attributes dictionary, see AddTextLayer()
+
+        Returns a list of draw data tuples, one for each text.
+        """
+
+        # merge global and layer defaults
+        if map_rel:
+            default_placement = kwargs.get('placement', self.DefaultTextPlacement)
+            default_radius = kwargs.get('radius', self.DefaultTextRadius)
+            default_fontname = kwargs.get('fontname', self.DefaultTextFontname)
+            default_fontsize = kwargs.get('fontsize', self.DefaultTextFontSize)
+            default_colour = self.get_i18n_kw(kwargs, ('colour', 'color'),
+                                              self.DefaultTextColour)
+            default_textcolour = self.get_i18n_kw(kwargs,
+                                                  ('textcolour', 'textcolor'),
+                                                  self.DefaultTextTextColour)
+            default_offset_x = kwargs.get('offset_x', self.DefaultTextOffsetX)
+            default_offset_y = kwargs.get('offset_y', self.DefaultTextOffsetY)
+            default_data = kwargs.get('data', self.DefaultTextData)
+        else:
+            default_placement = kwargs.get('placement', self.DefaultTextViewPlacement)
+            default_radius = kwargs.get('radius', self.DefaultTextViewRadius)
+            default_fontname = kwargs.get('fontname', self.DefaultTextViewFontname)
+            default_fontsize = kwargs.get('fontsize', self.DefaultTextViewFontSize)
+            default_colour = self.get_i18n_kw(kwargs, ('colour', 'color'),
+                                              self.DefaultTextViewColour)
+            default_textcolour = self.get_i18n_kw(kwargs,
+                                                  ('textcolour', 'textcolor'),
+                                                  self.DefaultTextViewTextColour)
+            default_offset_x = kwargs.get('offset_x', self.DefaultTextViewOffsetX)
+            default_offset_y = kwargs.get('offset_y', self.DefaultTextViewOffsetY)
+            default_data = kwargs.get('data', self.DefaultTextData)
+        default_priority = kwargs.get('priority', self.DefaultTextPriority)
+
+        # create data iterable ready for drawing
+        draw_data = []
+        for t in text:
+            if len(t) == 4:
+                (lon, lat, tdata, attributes) = t
+            elif len(t) == 3:
+                (lon, lat, tdata) = t
+                attributes = {}
+            else:
+                msg = ('Text data must be iterable of tuples: '
+                       '(lon, lat, text, [dict])\n'
+                       'Got: %s' % str(t))
+                raise Exception(msg)
+
+            # plug in any required defaults
+            placement = attributes.get('placement', default_placement)
+            radius = attributes.get('radius', default_radius)
+            fontname = attributes.get('fontname', default_fontname)
+            fontsize = attributes.get('fontsize', default_fontsize)
+            colour = self.get_i18n_kw(attributes, ('colour', 'color'),
+                                      default_colour)
+            textcolour = self.get_i18n_kw(attributes,
+                                          ('textcolour', 'textcolor'),
+                                          default_textcolour)
+            offset_x = attributes.get('offset_x', default_offset_x)
+            offset_y = attributes.get('offset_y', default_offset_y)
+            priority = attributes.get('priority', default_priority)
+            udata = attributes.get('data', default_data)
+
+            # check values that can be wrong
+            placement = placement.lower()
+            if placement not in self.valid_placements:
+                msg = ("Text placement value is invalid, got '%s'"
+                       % str(placement))
+                raise Exception(msg)
+
+            pt = (float(lon), float(lat))
+            draw_data.append(pt + (self.project(pt) if map_rel else pt,
+                                   tdata, placement,
+                                   self.placement(placement, offset_x, offset_y),
+                                   radius, colour, textcolour, fontname,
+                                   fontsize, offset_x, offset_y, priority,
+                                   udata))
+
+        return draw_data
+
+    def polygon_draw_data(self, data, map_rel, kwargs):
+        """Convert polygon data to the draw data used by DrawPolygonLayer().
+
+        data     iterable of polygon data, see AddPolygonLayer()
+        map_rel  True if polygons are map relative, else view relative
+        kwargs   the layer attributes dictionary, see AddPolygonLayer()
+
+        Returns a list of draw data tuples, one for each polygon.
+        """
+
+        # merge global and layer defaults
+        if map_rel:
+            default_placement = kwargs.get('placement',
+                                           self.DefaultPolygonPlacement)
+            default_width = kwargs.get('width', self.DefaultPolygonWidth)
+            default_colour = self.get_i18n_kw(kwargs, ('colour', 'color'),
+                                              self.DefaultPolygonColour)
+            default_close = kwargs.get('closed', self.DefaultPolygonClose)
+            default_filled = kwargs.get('filled', self.DefaultPolygonFilled)
+            default_fillcolour = self.get_i18n_kw(kwargs,
+                                                  ('fillcolour', 'fillcolor'),
+                                                  self.DefaultPolygonFillcolour)
+            default_offset_x = kwargs.get('offset_x', self.DefaultPolygonOffsetX)
+            default_offset_y = kwargs.get('offset_y', self.DefaultPolygonOffsetY)
+            default_data = kwargs.get('data', self.DefaultPolygonData)
+        else:
+            default_placement = kwargs.get('placement',
+                                           self.DefaultPolygonViewPlacement)
+            default_width = kwargs.get('width', self.DefaultPolygonViewWidth)
+            default_colour = self.get_i18n_kw(kwargs, ('colour', 'color'),
+                                              self.DefaultPolygonViewColour)
+            default_close = kwargs.get('closed', self.DefaultPolygonViewClose)
+            default_filled = kwargs.get('filled', self.DefaultPolygonViewFilled)
+            default_fillcolour = self.get_i18n_kw(kwargs,
+                                                  ('fillcolour', 'fillcolor'),
+                                                  self.DefaultPolygonViewFillcolour)
+            default_offset_x = kwargs.get('offset_x', self.DefaultPolygonViewOffsetX)
+            default_offset_y = kwargs.get('offset_y', self.DefaultPolygonViewOffsetY)
+            default_data = kwargs.get('data', self.DefaultPolygonViewData)
+
+        # create draw_data iterable
+        draw_data = []
+        for d in data:
+            if len(d) == 2:
+                (p, attributes) = d
+            elif len(d) == 1:
+                p = d
+                attributes = {}
+            else:
+                msg = ('Polygon data must be iterable of tuples: '
+                       '(polygon, [attributes])\n'
+                       'Got: %s' % str(d))
+                raise Exception(msg)
+
+            # get polygon attributes
+            placement = attributes.get('placement', default_placement)
+            width = attributes.get('width', default_width)
+            colour = self.get_i18n_kw(attributes, ('colour', 'color'),
+                                      default_colour)
+            close = attributes.get('closed', default_close)
+            filled = attributes.get('filled', default_filled)
+            if filled:
+                close = True
+            fillcolour = self.get_i18n_kw(attributes,
+                                          ('fillcolour', 'fillcolor'),
+                                          default_fillcolour)
+            offset_x = attributes.get('offset_x', default_offset_x)
+            offset_y = attributes.get('offset_y', default_offset_y)
+            udata = attributes.get('data', default_data)
+
+            # check values that can be wrong
+            placement = placement.lower()
+            if placement not in self.valid_placements:
+                msg = ("Polygon placement value is invalid, got '%s'"
+                       % str(placement))
+                raise Exception(msg)
+
+            # if polygon is to be filled, ensure closed
+            points = self.pack_points(p)
+            if close and points:
+                points.extend(points[:2])
+
+            (coords, extent) = self.pack_shape(points, map_rel)
+            draw_data.append((points, coords, extent, placement,
+                              self.placement(placement, offset_x, offset_y),
+                              width, colour, close, filled, fillcolour,
+                              offset_x, offset_y, udata))
+
+        return draw_data
+
+    def polyline_draw_data(self, data, map_rel, kwargs):
+        """Convert polyline data to the draw data used by DrawPolylineLayer().
+
+        data     iterable of polyline data, see AddPolylineLayer()
+        map_rel  True if polylines are map relative, else view relative
+        kwargs   the layer attributes dictionary, see AddPolylineLayer()
+
+        Returns a list of draw data tuples, one for each polyline.
+        """
+
+        # merge global and layer defaults
+        if map_rel:
+            default_placement = kwargs.get('placement',
+                                           self.DefaultPolygonPlacement)
+            default_width = kwargs.get('width', self.DefaultPolygonWidth)
+            default_colour = self.get_i18n_kw(kwargs, ('colour', 'color'),
+                                              self.DefaultPolygonColour)
+            default_offset_x = kwargs.get('offset_x', self.DefaultPolygonOffsetX)
+            default_offset_y = kwargs.get('offset_y', self.DefaultPolygonOffsetY)
+            default_data = kwargs.get('data', self.DefaultPolygonData)
+        else:
+            default_placement = kwargs.get('placement',
+                                           self.DefaultPolygonViewPlacement)
+            default_width = kwargs.get('width', self.DefaultPolygonViewWidth)
+            default_colour = self.get_i18n_kw(kwargs, ('colour', 'color'),
+                                              self.DefaultPolygonViewColour)
+            default_offset_x = kwargs.get('offset_x', self.DefaultPolygonViewOffsetX)
+            default_offset_y = kwargs.get('offset_y', self.DefaultPolygonViewOffsetY)
+            default_data = kwargs.get('data', self.DefaultPolygonViewData)
+
+        # create draw_data iterable
+        draw_data = []
+        for d in data:
+            if len(d) == 2:
+                (p, attributes) = d
+            elif len(d) == 1:
+                p = d
+                attributes = {}
+            else:
+                msg = ('Polyline data must be iterable of tuples: '
+                       '(polyline, [attributes])\n'
+                       'Got: %s' % str(d))
+                raise Exception(msg)
+
+            # get polygon attributes
+            placement = attributes.get('placement', default_placement)
+            width = attributes.get('width', default_width)
+            colour = self.get_i18n_kw(attributes, ('colour', 'color'),
+                                      default_colour)
+            offset_x = attributes.get('offset_x', default_offset_x)
+            offset_y = attributes.get('offset_y', default_offset_y)
+            udata = attributes.get('data', default_data)
+
+            # check values that can be wrong
+            placement = placement.lower()
+            if placement not in self.valid_placements:
+                msg = ("Polyline placement value is invalid, got '%s'"
+                       % str(placement))
+                raise Exception(msg)
+
+            points = self.pack_points(p)
+            (coords, extent) = self.pack_shape(points, map_rel)
+            draw_data.append((points, coords, extent, placement,
+                              self.placement(placement, offset_x, offset_y),
+                              width, colour, offset_x, offset_y, udata))
+
+        return draw_data
+
+    ######
+    # Layer manipulation routines.
+    ######
+
+    def ShowLayer(self, id):
+        """Show a layer.
+
+        id  the layer id
+        """
+
+        self.layer_mapping[id].visible = True
+        self.Invalidate()
+
+    def HideLayer(self, id):
+        """Hide a layer.
+
+        id  the layer id
+        """
+
+        self.layer_mapping[id].visible = False
+        self.Invalidate()
+
+    def DeleteLayer(self, id):
+        """Delete a layer.
+
+        id  the layer id
+        """
+
+        # just in case we got None
+        if id:
+            # forget the layer, see if it might have been visible
+            with self.layer_lock:
+                layer = self.layer_mapping.pop(id)
+                self.layer_z_order.remove(id)
+            visible = layer.visible
+            self.release_layer(layer)
+
+            # if layer was visible, refresh display
+            if visible:
+                self.Invalidate()
+
+    def ClearLayers(self):
+        """Delete all layers."""
+
+        with self.layer_lock:
+            layers = list(self.layer_mapping.values())
+            self.layer_mapping = {}
+            self.layer_z_order = []
+
+        visible = False
+        for layer in layers:
+            visible = visible or layer.visible
+            self.release_layer(layer)
+
+        if visible:
+            self.Invalidate()
+
+    def release_layer(self, layer):
+        """Release the data held by a deleted layer.
+
+        layer  the layer being deleted
+
+        The layer object may still be referenced by user code, eg, from a
+        select event, so drop its data now rather than wait for that.
+        """
+
+        if layer.data is not None:
+            self.release_draw_data(layer.type, layer.data)
+        layer.data = None
+        layer.attributes = None
+        layer.convert = None
+        layer.painter = None
+        layer.feature_ids = []
+        layer.feature_index = {}
+        layer.declutter = None
+        layer.shape_cache = None
+
+    def release_draw_data(self, ltype, draw_data):
+        """Release what is held by draw data no longer in a layer.
+
+        ltype      the layer type
+        draw_data  list of the draw data tuples being dropped
+
+        Image objects give back their reference to the cached bitmap.
+        """
+
+        if ltype == self.TypeImage:
+            for item in draw_data:
+                self.image_cache.release(item[3])
+
+    def GetLayerMemory(self, id):
+        """Get an estimate of the memory used by a layer.
+
+        id  ID of the layer
+
+        Returns the estimated size in bytes of the layer data, including
+        the coordinates, attributes and bitmaps it refers to.  A bitmap
+        shared with other layers is counted in each layer.
+        """
+
+        layer = self.layer_mapping[id]
+        seen = set()
+        return (self.object_memory(layer.data, seen)
+                + self.object_memory(layer.feature_ids, seen)
+                + self.object_memory(layer.feature_index, seen))
+
+    def GetLayersMemory(self):
+        """Get an estimate of the memory used by each layer.
+
+        Returns a dictionary mapping layer ID to estimated size in bytes,
+        see GetLayerMemory().
+        """
+
+        return {id: self.GetLayerMemory(id) for id in self.layer_z_order}
+
+    @staticmethod
+    def object_memory(obj, seen):
+        """Estimate the memory used by an object and what it holds.
+
+        obj   the object to size
+        seen  set of id() of objects already counted, updated here
+
+        Looks inside lists, tuples, dictionaries and track data.  A bitmap is
+        sized by its pixel data.
+        """
+
+        if id(obj) in seen:
+            return 0
+        seen.add(id(obj))
+
+        size = sys.getsizeof(obj)
+        if isinstance(obj, wx.Bitmap):
+            size += obj.GetWidth() * obj.GetHeight() * max(obj.GetDepth(), 24) // 8
+        elif isinstance(obj, (list, tuple, set, collections.deque)):
+            for item in obj:
+                size += _MapRenderer.object_memory(item, seen)
+        elif isinstance(obj, dict):
+            for (key, value) in obj.items():
+                size += _MapRenderer.object_memory(key, seen)
+                size += _MapRenderer.object_memory(value, seen)
+        elif isinstance(obj, _TrackData):
+            size += _MapRenderer.object_memory(obj.tracks, seen)
+
+        return size
+
+    def SetLayerShowLevels(self, id, show_levels=None):
+        """Update the show_levels list for a layer.
+
+        id           ID of the layer we are going to update
+        show_levels  new layer show list
+
+        If 'show_levels' is None reset the displayable levels to
+        all levels in the current tileset.
+        """
+
+        # if we actually got an 'id' change the .show_levels value
+        if id:
+            layer = self.layer_mapping[id]
+
+            # if not given a 'show_levels' show all levels available
+            if not show_levels:
+                show_levels = range(self.tiles_min_level,
+                                    self.tiles_max_level+1)[:]
+
+            layer.show_levels = show_levels
+
+            # always update the display, there may be a change
+            self.Invalidate()
+
+    def SetLayerSelectable(self, id, selectable=False):
+        """Update the .selectable attribute for a layer.
+
+        id          ID of the layer we are going to update
+        selectable  new .selectable attribute value (True or False)
+        """
+
+        # just in case id is None
+        if id:
+            layer = self.layer_mapping[id]
+            layer.selectable = selectable
+
+    ######
+    # Play with layers Z order
+    ######
+
+    def PushLayerToBack(self, id):
+        """Make layer specified be drawn at back of Z order.
+
+        id  ID of the layer to push to the back
+        """
+
+        self.layer_z_order.remove(id)
+        self.layer_z_order.insert(0, id)
+        self.Invalidate()
+
+    def PopLayerToFront(self, id):
+        """Make layer specified be drawn at front of Z order.
+
+        id  ID of the layer to pop to the front
+        """
+
+        self.layer_z_order.remove(id)
+        self.layer_z_order.append(id)
+        self.Invalidate()
+
+    def PlaceLayerBelowLayer(self, id, top_id):
+        """Place a layer so it will be drawn behind another layer.
+
+        id      ID of layer to place underneath 'top_id'
+        top_id  ID of layer to be drawn *above* 'id'
+        """
+
+        self.layer_z_order.remove(id)
+        i = self.layer_z_order.index(top_id)
+        self.layer_z_order.insert(i, id)
+        self.Invalidate()
+
+    ######
+    # Change individual features in a layer
+    #
+    # Each feature in a layer has a feature ID that doesn't change while the
+    # feature exists.  Features given to Add*Layer() have IDs 0, 1, 2, ...
+    # in the order given, later features get IDs from AppendLayerFeatures().
+    ######
+
+    def AppendLayerFeatures(self, id, data):
+        """Append features to a layer.
+
+        id    ID of the layer to change
+        data  iterable of features, as given to the Add*Layer() that
+              created the layer
+
+        Returns a list of the feature IDs of the new features.
+        """
+
+        layer = self.feature_layer(id)
+        draw_data = layer.convert(data, layer.map_rel, layer.attributes)
+        fids = layer.append_features(draw_data)
+        self.refresh_features(layer, draw_data)
+
+        return fids
+
+    def UpdateLayerFeatures(self, id, features):
+        """Replace features in a layer.
+
+        id        ID of the layer to change
+        features  dictionary mapping feature ID to the new feature, as given
+                  to the Add*Layer() that created the layer
+
+        Raises KeyError if a feature ID isn't in the layer.
+        """
+
+        layer = self.feature_layer(id)
+        fids = list(features)
+        draw_data = layer.convert([features[fid] for fid in fids],
+                                  layer.map_rel, layer.attributes)
+        old = layer.replace_features(fids, draw_data)
+        self.refresh_features(layer, old + draw_data)
+        self.release_draw_data(layer.type, old)
+
+    def RemoveLayerFeatures(self, id, feature_ids):
+        """Remove features from a layer.
+
+        id           ID of the layer to change
+        feature_ids  iterable of IDs of the features to remove
+
+        Raises KeyError if a feature ID isn't in the layer.
+        """
+
+        layer = self.layer_mapping[id]
+        old = layer.remove_features(feature_ids)
+        self.refresh_features(layer, old)
+        self.release_draw_data(layer.type, old)
+
+    def feature_layer(self, id):
+        """Get a layer whose features can be appended or updated.
+
+        id  ID of the layer
+
+        Raises an exception if the layer wasn't made by an Add*Layer() method.
+        """
+
+        layer = self.layer_mapping[id]
+        if layer.convert is None:
+            msg = ("Layer %d has no feature conversion, features can't "
+                   "be added or updated" % id)
+            raise Exception(msg)
+
+        return layer
+
+    def GetLayerFeatureIDs(self, id):
+        """Get the IDs of all features in a layer.
+
+        id  ID of the layer
+
+        Returns a list of feature IDs in drawing order.
+        """
+
+        return list(self.layer_mapping[id].feature_ids)
+
+    def refresh_features(self, layer, draw_data):
+        """Redraw the part of the view showing some features of a layer.
+
+        layer      the layer holding the features
+        draw_data  list of layer data tuples, old and new
+
+        Nothing is redrawn if the layer isn't showing.
+        """
+
+        if not (layer.visible and self.level in layer.show_levels):
+            return
+
+        extents = self.feature_extents(layer, draw_data)
+        if not extents:
+            return
+
+        # redraw the union of the extents, clipped to the view
+        lx = max(0, int(min(ex[0] for ex in extents)))
+        rx = min(self.view_width, int(max(ex[1] for ex in extents)) + 1)
+        ty = max(0, int(min(ex[2] for ex in extents)))
+        by = min(self.view_height, int(max(ex[3] for ex in extents)) + 1)
+        if lx < rx and ty < by:
+            self.Invalidate((lx, ty, rx - lx, by - ty))
+
+    def feature_extents(self, layer, draw_data):
+        """Get the view extents of features of a layer.
+
+        layer      the layer holding the features
+        draw_data  list of layer data tuples
+
+        Returns a list of (lx, rx, ty, by) extents, including the point
+        radius or line width, of the features drawn in the view.  Features
+        drawn again across the seam of a wrapped map have two extents.
+        """
+
+        extents = self.view_extents(layer, draw_data)
+        if (layer.map_rel and self.wraps_x()
+                and self.view_offset_x + self.view_width > self.map_width):
+            with self.seam_view():
+                extents.extend(self.view_extents(layer, draw_data))
+
+        return extents
+
+    def view_extents(self, layer, draw_data):
+        """Get view extents of features, see feature_extents()."""
+
+        def padded(extent, pad):
+            (lx, rx, ty, by) = extent
+            return (lx - pad, rx + pad, ty - pad, by + pad)
+
+        def point_extent(point, radius):
+            (px, py) = point
+            return (px - radius - 1, px + radius + 1,
+                    py - radius - 1, py + radius + 1)
+
+        map_rel = layer.map_rel
+        extents = []
+
+        if layer.type == self.TypePoint:
+            pex = self.pex_point if map_rel else self.pex_point_view
+            for (_, _, proj, _, pl, radius, _, _, _, _) in draw_data:
+                (_, ex) = pex(pl, proj, radius)
+                if ex:
+                    extents.append(padded(ex, 1))
+        elif layer.type in (self.TypeImage, self.TypeText):
+            pex = self.pex_extent if map_rel else self.pex_extent_view
+            for item in draw_data:
+                if layer.type == self.TypeImage:
+                    (_, _, proj, _, w, h, _, pl, _, _, radius, _, _) = item
+                else:
+                    (_, _, proj, tdata, _, pl, radius, _, _, fontname,
+                         fontsize, _, _, _, _) = item
+                    (w, h) = self.text_size(tdata, fontname, fontsize)
+                (pt, ex) = pex(pl, proj, w, h)
+                if ex:
+                    extents.append(padded(ex, 1))
+                if pt and radius:
+                    extents.append(point_extent(pt, radius))
+        else:
+            for item in draw_data:
+                (_, _, extent, _, pl, width) = item[:6]
+                ex = self.shape_extent(extent,
+                                       *self.shape_transform(pl, map_rel))
+                if ex:
+                    extents.append(padded(ex, width + 1))
+
+        return extents
+
+    @contextlib.contextmanager
+    def seam_view(self):
+        """Temporarily move the view one map width left.
+
+        Used with a wrapped map to get at the objects seen across the seam
+        at the right edge of the map.
+        """
+
+        (map_llon, map_rlon, _, _) = self.tile_src.extent
+        span = map_rlon - map_llon
+        state = (self.view_offset_x, self.view_llon, self.view_rlon)
+
+        self.view_offset_x -= self.map_width
+        self.view_llon -= span
+        self.view_rlon -= span
+        try:
+            yield
+        finally:
+            (self.view_offset_x, self.view_llon, self.view_rlon) = state
+
+    def text_size(self, tdata, fontname, fontsize):
+        """Get the size of some text when drawn.
+
+        tdata     the text string
+        fontname  name of the font
+        fontsize  size of the font
+
+        Returns a tuple (w, h) in pixels.
+        """
+
+        return self.text_cache.extent(fontname, fontsize, tdata)
+
+    ######
+    # Layer drawing routines
+    ######
+
+    def DrawPointLayer(self, dc, data, map_rel):
+        """Draw a points layer.
+
+        dc       the device context to draw on
+        data     an iterable of point tuples:
+                     (x, y, proj, place, pl, radius, colour,
+                      x_off, y_off, udata)
+                 where proj is the point in map space if map-relative, see
+                 project(), and pl is the placement transform, see placement()
+        map_rel  points relative to map if True, else relative to view
+        """
+
+        # allow transparent colours
+        dc = self.layer_dc(dc)
+
+        # get correct pex function
+        pex = self.pex_point_view
+        if map_rel:
+            pex = self.pex_point
+
+        # draw points on map/view
+        cache_colour = None     # speed up drawing mostly not changing colours
+
+        for (x, y, proj, place, pl, radius,
+                 colour, x_off, y_off, udata) in data:
+            (pt, ex) = pex(pl, proj, radius)
+            if ex and radius:  # don't draw if not on screen or zero radius
+                if cache_colour != colour:
+                    dc.SetPen(wx.Pen(colour))
+                    cache_colour = colour
+                    dc.SetBrush(wx.Brush(colour))
+                (x, _, y, _) = ex
+                dc.DrawCircle(x+radius, y+radius, radius)
+
+    def DrawImageLayer(self, dc, images, map_rel):
+        """Draw an image Layer on the view.
+
+        dc       the device context to draw on
+        images   a sequence of image tuple sequences
+                   (x,y,proj,bmap,w,h,placement,pl,offset_x,offset_y,
+                    radius,colour,idata)
+                 where proj is the point in map space if map-relative, see
+                 project(), and pl is the placement transform, see placement()
+        map_rel  points relative to map if True, else relative to view
+        """
+
+        # allow transparent colours
+        dc = self.layer_dc(dc)
+
+        # get correct pex function
+        pex = self.pex_extent_view
+        if map_rel:
+            pex = self.pex_extent
+
+        # draw the images
+        cache_colour = None     # speed up drawing mostly unchanging colours
+
+        for (lon, lat, proj, bmap, w, h, place, pl,
+                 x_off, y_off, radius, colour, idata) in images:
+            (pt, ex) = pex(pl, proj, w, h)
+            if ex:
+                (ix, _, iy, _) = ex
+                dc.DrawBitmap(bmap, ix, iy, False)
+
+            if pt and radius:
+                if cache_colour != colour:
+                    dc.SetPen(wx.Pen(colour))
+                    dc.SetBrush(wx.Brush(colour))
+                    cache_colour = colour
+                (px, py) = pt
+                dc.DrawCircle(px, py, radius)
+
+    def DrawTextLayer(self, dc, text, map_rel, declutter=None):
+        """Draw a text Layer on the view.
+
+        dc         the device context to draw on
+        text       a sequence of tuples:
+                       (lon, lat, proj, tdata, placement, pl, radius, colour,
+                        textcolour, fontname, fontsize, offset_x, offset_y,
+                        priority, udata)
+                   where proj is the point in map space if map-relative,
+                   see project(), and pl is the placement transform, see
+                   placement()
+        map_rel    points relative to map if True, else relative to view
+        declutter  the layer _Declutter object if labels are decluttered
+        """
+
+        # we need the size of the DC
+        dc = self.layer_dc(dc)		# allow transparent colours
+
+        # get correct pex function for mode (map/view)
+        pex = self.pex_extent_view
+        if map_rel:
+            pex = self.pex_extent
+
+        if declutter is None:
+            labels = self.place_labels(text, pex)
+        else:
+            labels = self.declutter_labels(text, pex, declutter)
+
+        # draw text on map/view
+        # text sizes and pre-rendered labels come from the widget text cache
+        text_cache = self.text_cache
+        cache_colour = None     # speed up mostly unchanging data
+
+        for (item, pt, ex) in labels:
+            (_, _, _, tdata, _, _, radius, colour, textcolour,
+                 fontname, fontsize, _, _, _, _) = item
+
+            if ex:
+                label = text_cache.label(fontname, fontsize, textcolour, tdata)
+                if label:
+                    (lx, _, ty, _) = ex
+                    dc.DrawBitmap(label, int(lx), int(ty), True)
+
+            if pt and radius:
+                (x, y) = pt
+                if cache_colour != colour:
+                    dc.SetPen(wx.Pen(colour))
+                    dc.SetBrush(wx.Brush(colour))
+                    cache_colour = colour
+                dc.DrawCircle(x, y, radius)
+
+    def place_labels(self, text, pex):
+        """Place all text labels in the view.
+
+        text  the text layer data
+        pex   the layer pex function, taking a placement transform
+
+        Yields (item, point, extent) for each label, where point and extent
+        are in view coords, either may be None if off-view.
+        """
+
+        text_cache = self.text_cache
+        for item in text:
+            (_, _, proj, tdata, _, pl, _, _, _, fontname, fontsize,
+                 _, _, _, _) = item
+            (w, h) = text_cache.extent(fontname, fontsize, tdata)
+            (pt, ex) = pex(pl, proj, w, h)
+            yield (item, pt, ex)
+
+    def view_key(self):
+        """Get the key of the current view in a _ViewCache."""
+
+        return (self.level, self.view_offset_x, self.view_offset_y,
+                self.view_width, self.view_height)
+
+    def declutter_labels(self, text, pex, declutter):
+        """Place text labels in the view so they don't overlap.
+
+        text       the text layer data
+        pex        the layer pex function, taking a placement transform
+        declutter  the layer _Declutter object
+
+        Returns a list of (item, point, extent) for the labels to draw, see
+        place_labels().  Labels are placed in priority order into a grid
+        of cells, each cell holding the extents of the labels touching it.
+        A label is dropped if it overlaps a label already placed.
+        """
+
+        key = self.view_key()
+        placed = declutter.get(key)
+        if placed is not None:
+            return placed
+
+        # highest priority first, stable so equal priorities keep data order
+        if declutter.order is None:
+            declutter.order = sorted(range(len(text)),
+                                     key=lambda i: -text[i][13])
+
+        cell = declutter.CellSize
+        pad = declutter.Padding
+        grid = {}               # (col, row) -> list of placed extents
+        placed = []
+        text_cache = self.text_cache
+
+        for i in declutter.order:
+            item = text[i]
+            (_, _, proj, tdata, _, pl, _, _, _, fontname, fontsize,
+                 _, _, _, _) = item
+            (w, h) = text_cache.extent(fontname, fontsize, tdata)
+            (pt, ex) = pex(pl, proj, w, h)
+            if not ex:
+                continue
+
+            (lx, rx, ty, by) = ex
+            lx -= pad
+            rx += pad
+            ty -= pad
+            by += pad
+            cells = [(col, row)
+                     for col in range(int(lx) // cell, int(rx) // cell + 1)
+                     for row in range(int(ty) // cell, int(by) // cell + 1)]
+
+            collides = False
+            for c in cells:
+                for (olx, orx, oty, oby) in grid.get(c, ()):
+                    if lx < orx and olx < rx and ty < oby and oty < by:
+                        collides = True
+                        break
+                if collides:
+                    break
+            if collides:
+                continue
+
+            for c in cells:
+                grid.setdefault(c, []).append((lx, rx, ty, by))
+            placed.append((item, pt, ex))
+
+        declutter.put(key, placed)
+        return placed
+
+    def ClearTextCache(self):
+        """Forget all cached text sizes and label bitmaps.
+
+        Call this if fonts change in a way pySlip can't see.
+        """
+
+        self.text_cache.clear()
+        for layer in self.layer_mapping.values():
+            if layer.declutter:
+                layer.declutter.clear()
+        self.Invalidate()
+
+    def DrawPolygonLayer(self, dc, data, map_rel, cache=None):
+        """Draw a polygon layer.
+
+        dc       the device context to draw on
+        data     an iterable of polygon tuples:
+                     (p, coords, extent, placement, pl, width, colour,
+                      closed, filled, fillcolour, offset_x, offset_y, udata)
+                 where p is the packed points as given, see pack_points(),
+                 coords and extent the packed points as drawn, in map space
+                 if map-relative, see pack_shape(), and pl is the placement
+                 transform, see placement()
+        map_rel  points relative to map if True, else relative to view
+        cache    the layer _ShapeCache, if any
+        """
+
+        # allow transparent colours
+        dc = self.layer_dc(dc)
+
+        # draw polygons
+        cache_colour_width = None     # speed up mostly unchanging data
+        cache_fillcolour = None
+
+        for ((p, coords, extent, place, pl, width, colour, closed,
+                  filled, fillcolour, x_off, y_off, udata),
+                 poly) in self.view_shapes(data, map_rel, cache):
+            if cache_colour_width != (colour, width):
+                dc.SetPen(wx.Pen(colour, width=width))
+                cache_colour_width = (colour, width)
+
+            if filled:
+                if cache_fillcolour != fillcolour:
+                    dc.SetBrush(wx.Brush(fillcolour))
+                    cache_fillcolour = fillcolour
+            else:
+                dc.SetBrush(wx.TRANSPARENT_BRUSH)
+                cache_fillcolour = None
+
+            if closed:
+                dc.DrawPolygon(poly)
+            else:
+                dc.DrawLines(poly)
+
+    def DrawPolylineLayer(self, dc, data, map_rel, cache=None):
+        """Draw a polyline layer.
+
+        dc       the device context to draw on
+        data     an iterable of polyline tuples:
+                     (p, coords, extent, placement, pl, width, colour,
+                      offset_x, offset_y, udata)
+                 where p is the packed points as given, see pack_points(),
+                 coords and extent the packed points as drawn, in map space
+                 if map-relative, see pack_shape(), and pl is the placement
+                 transform, see placement()
+        map_rel  points relative to map if True, else relative to view
+        cache    the layer _ShapeCache, if any
+        """
+
+        # allow transparent colours
+        dc = self.layer_dc(dc)
+
+        # draw polyline(s)
+        cache_colour_width = None       # speed up mostly unchanging data
+
+        for ((p, coords, extent, place, pl, width, colour,
+                  x_off, y_off, udata),
+                 poly) in self.view_shapes(data, map_rel, cache):
+            if cache_colour_width != (colour, width):
+                dc.SetPen(wx.Pen(colour, width=width))
+                cache_colour_width = (colour, width)
+            dc.SetBrush(wx.TRANSPARENT_BRUSH)
+            dc.DrawLines(poly)
+
+    def view_shapes(self, data, map_rel, cache=None):
+        """Get the polygons or polylines of a layer on the view.
+
+        data     the layer data, see DrawPolygonLayer()
+        map_rel  True if the layer is map-relative
+        cache    the layer _ShapeCache, if any
+
+        Returns a list of (item, points) where 'item' is the layer data tuple
+        of a shape whose extent is on the view and 'points' the list of its
+        integer view points.  The list is kept in the cache for the view.
+        """
+
+        if cache is not None:
+            key = self.view_key()
+            shapes = cache.get(key)
+            if shapes is not None:
+                return shapes
+
+        shapes = []
+        for item in data:
+            (_, coords, extent, _, pl) = item[:5]
+            transform = self.shape_transform(pl, map_rel)
+            if self.shape_extent(extent, *transform):
+                shapes.append((item, self.shape_points(coords, *transform)))
+
+        if cache is not None:
+            cache.put(key, shapes)
+        return shapes
+
+    def DrawTrackLayer(self, dc, data, map_rel):
+        """Draw a live track layer.
+
+        dc       the device context to draw on
+        data     the layer _TrackData object
+        map_rel  points relative to map if True, else relative to view
+        """
+
+        dc = self.layer_dc(dc)
+
+        pens = data.trail_pens()
+        radius = data.radius
+        if radius:
+            dc.SetBrush(wx.Brush(data.colour))
+
+        # positions are in map space if map-relative, see project()
+        project = None
+        (sx, sy, dx, dy) = (1, 1, 0, 0)
+        if map_rel:
+            project = self.project
+            (sx, sy, dx, dy) = (self.proj_scale_x, self.proj_scale_y,
+                                -self.view_offset_x, -self.view_offset_y)
+
+        # skip tracks whose extent, padded for the head or line, is off-view
+        pad = max(radius, data.width)
+        (view_width, view_height) = (self.view_width, self.view_height)
+
+        for track in data.snapshot(project):
+            track = [(int(u*sx + dx), int(v*sy + dy)) for (u, v) in track]
+            xs = [x for (x, _) in track]
+            ys = [y for (_, y) in track]
+            if (max(xs) < -pad or min(xs) > view_width + pad
+                    or max(ys) < -pad or min(ys) > view_height + pad):
+                continue
+
+            # draw the trail, oldest segment with the first pen
+            if len(track) > 1:
+                if data.fade:
+                    first = len(pens) - (len(track) - 1)
+                    for (i, (x1, y1)) in enumerate(track[:-1]):
+                        (x2, y2) = track[i+1]
+                        dc.SetPen(pens[first+i])
+                        dc.DrawLine(x1, y1, x2, y2)
+                else:
+                    dc.SetPen(pens[-1])
+                    dc.DrawLines(track)
+
+            # then the head
+            if radius:
+                (x, y) = track[-1]
+                dc.SetPen(pens[-1])
+                dc.DrawCircle(x, y, radius)
+
+    def layer_dc(self, dc):
+        """Get a device context for drawing a layer.
+
+        dc  the device context to draw on
+
+        Returns a wx.GCDC, to allow transparent colours, clipped to any
+        partial redraw area.
+        """
+
+        gcdc = wx.GCDC(dc)
+        if self.clip_rect:
+            gcdc.SetClippingRegion(*self.clip_rect)
+        return gcdc
+
+    ######
+    # Draw the view - tiles then layers
+    ######
+
+    def view_tiles(self):
+        """Get the map tiles visible in the view and where to draw them.
+
+        The idea is to create 4 things that define the tiles to be drawn and
+        where to draw them:
+            x_pix_start  view pixel coord of left side of top-left tile
+            y_pix_start  view pixel coord of top side of top-left tole
+            row_list     list (top -> bottom) of tile rows
+            col_list     list (left -> right) of tile columns
+
+        Note that (x_pix_start, y_pix_start) will typically be OUTSIDE the view
+        if the view is smaller than the map.
+
+        Returns a tuple (x_pix_start, y_pix_start, col_list, row_list).
+        """
+
+        # figure out how to draw tiles
+        if self.view_offset_x < 0:
+            # View > Map in X - centre in X direction
+            col_list = range(self.tile_src.num_tiles_x)
+            x_pix_start = -self.view_offset_x
+        else:
+            # Map > View - determine layout in X direction
+            start_x_tile = int(self.view_offset_x / self.tile_width)
+            stop_x_tile = int((self.view_offset_x + self.view_width
+                               + self.tile_width - 1) / self.tile_width)
+            if not self.wraps_x():
+                # no tiles past the right edge of an unwrapped map
+                stop_x_tile = min(self.tile_src.num_tiles_x-1, stop_x_tile)
+            stop_x_tile += 1
+            col_list = range(start_x_tile, stop_x_tile)
+            x_pix_start = start_x_tile * self.tile_height - self.view_offset_x
+
+        if self.view_offset_y < 0:
+            # View > Map in Y - centre in Y direction
+            row_list = range(self.tile_src.num_tiles_y)
+            y_pix_start = -self.view_offset_y
+        else:
+            # Map > View - determine layout in Y direction
+            start_y_tile = int(self.view_offset_y / self.tile_height)
+            stop_y_tile = int((self.view_offset_y + self.view_height
+                               + self.tile_height - 1) / self.tile_height)
+            stop_y_tile = min(self.tile_src.num_tiles_y-1, stop_y_tile) + 1
+            row_list = range(start_y_tile, stop_y_tile)
+            y_pix_start = start_y_tile * self.tile_height - self.view_offset_y
+
+        return (x_pix_start, y_pix_start, col_list, row_list)
+
+    def draw_tiles(self, dc):
+        """Draw the map tiles visible in the view.
+
+        dc  device context to draw on
+        """
+
+        (x_pix_start, y_pix_start, col_list, row_list) = self.view_tiles()
+
+        # start pasting tiles onto the view
+        # use x_pix and y_pix to place tiles
+        x_pix = x_pix_start
+        for x in col_list:
+            y_pix = y_pix_start
+            for y in row_list:
+                tile = self.tile_src.GetTile(x, y)
+                dc.DrawBitmap(tile, x_pix, y_pix, False)
+                y_pix += self.tile_height
+            x_pix += self.tile_width
+
+    def draw_layers(self, dc, layer_times=None):
+        """Draw all visible layers in Z order.
+
+        dc           device context to draw on
+        layer_times  if not None, a dictionary to fill with layer ID -> seconds
+                     spent drawing the layer
+
+        If the view spans the right edge of a wrapped map we draw map-relative
+        layers twice, the second time with the view moved one map width left.
+        The usual off-view culling then draws just the objects near the seam.
+        """
+
+        seam = self.view_crosses_seam()
+
+        for id in self.layer_z_order:
+            l = self.layer_mapping[id]
+            if l.visible and self.level in l.show_levels:
+                start = time.perf_counter()
+                l.painter(dc, l.data, map_rel=l.map_rel)
+                if seam and l.map_rel:
+                    self.draw_across_seam(dc, l)
+                if layer_times is not None:
+                    layer_times[id] = time.perf_counter() - start
+
+    def draw_across_seam(self, dc, layer):
+        """Draw a map-relative layer as seen in the wrapped copy of the map.
+
+        dc     device context to draw on
+        layer  the layer to draw
+        """
+
+        with self.seam_view():
+            layer.painter(dc, layer.data, map_rel=True)
+
+######
+# Convert between geo and view coordinates
+######
+
+    def Geo2View(self, geo):
+        """Convert a geo coord to view.
+
+        geo  tuple (xgeo, ygeo)
+
+        Return a tuple (xview, yview) in view coordinates.
+        Assume point is in view.
+        """
+
+        (tx, ty) = self.tile_src.Geo2Tile(geo)
+        return ((tx * self.tile_src.tile_size_x) - self.view_offset_x,
+                (ty * self.tile_src.tile_size_y) - self.view_offset_y)
+
+    def Geo2ViewMasked(self, geo):
+        """Convert a geo (lon+lat) position to view pixel coords.
+
+        geo  tuple (xgeo, ygeo)
+
+        Return a tuple (xview, yview) of point if on-view,or None
+        if point is off-view.
+        """
+
+        (xgeo, ygeo) = geo
+
+        if (self.view_llon <= xgeo <= self.view_rlon and
+                self.view_blat <= ygeo <= self.view_tlat):
+            return self.Geo2View(geo)
+
+        return None
+
+    def View2Geo(self, view):
+        """Convert a view coords position to a geo coords position.
+
+        view  tuple of view coords (xview, yview)
+
+        Returns a tuple of geo coords (xgeo, ygeo);
+        """
+
+        (xview, yview) = view
+        xtile = float(self.view_offset_x + xview) / self.tile_width
+        ytile = float(self.view_offset_y + yview) / self.tile_height
+
+        return self.tile_src.Tile2Geo((xtile, ytile))
+
+    def centre_view(self, geo):
+        """Set the view offsets to centre the view on a geo position.
+
+        geo  a tuple (xgeo,ygeo) to centre view on
+
+        Sets self.view_offset_x and self.view_offset_y and then calls
+        RecalcViewLimits().  Doesn't redraw.
+        """
+
+        # get fractional tile coords of required centre of view
+        (xtile, ytile) = self.tile_src.Geo2Tile(geo)
+
+        # now calculate view offsets, top, left, bottom and right
+        half_width = self.view_width / 2
+        centre_pixels_from_map_left = int(xtile * self.tile_width)
+        self.view_offset_x = centre_pixels_from_map_left - half_width
+        self.wrap_view_offset()
+
+        half_height = self.view_height / 2
+        centre_pixels_from_map_top = int(ytile * self.tile_height)
+        self.view_offset_y = centre_pixels_from_map_top - half_height
+
+        # set the left/right/top/bottom lon/lat extents
+        self.RecalcViewLimits()
+
+    def RecalcViewLimits(self):
+        """Recalculate the view geo extent values.
+
+        Assumes only:
+            self.view_offset_x
+            self.view_offset_y
+            self.tile_src.tile_size_x
+            self.tile_src.tile_size_y
+        values have been set.  All are map pixel values.
+        """
+
+        # get geo coords of top-left of view
+        tltile_x = float(self.view_offset_x) / self.tile_src.tile_size_x
+        tltile_y = float(self.view_offset_y) / self.tile_src.tile_size_y
+        (self.view_llon, self.view_tlat) = self.tile_src.Tile2Geo((tltile_x,
+                                                                   tltile_y))
+
+        # then get geo coords of bottom-right of view
+        tltile_x = (float(self.view_offset_x + self.view_width)
+                        / self.tile_src.tile_size_x)
+        tltile_y = (float(self.view_offset_y + self.view_height)
+                        / self.tile_src.tile_size_y)
+        (self.view_rlon, self.view_blat) = self.tile_src.Tile2Geo((tltile_x,
+                                                                tltile_y))
+
+        # a wrapped tile source may put the view right edge back on the map
+        if self.view_rlon < self.view_llon:
+            (map_llon, map_rlon, _, _) = self.tile_src.extent
+            self.view_rlon += map_rlon - map_llon
+
+    def wraps_x(self):
+        """Return True if the view wraps around the map in the X direction.
+
+        We only wrap if the tile source allows it and the map is wider than
+        the view, otherwise the map is centred in the view as usual.
+        """
+
+        return (getattr(self.tile_src, 'wrap_x', False)
+                    and self.map_width > self.view_width)
+
+    def view_crosses_seam(self):
+        """Return True if the view spans the right edge of a wrapped map."""
+
+        return (self.wraps_x()
+                    and self.view_offset_x + self.view_width > self.map_width)
+
+    def wrap_view_offset(self):
+        """Keep the X view offset in [0, map_width) if the view wraps."""
+
+        if self.wraps_x():
+            self.view_offset_x %= self.map_width
+
+######
+# Projection of map-relative layer geometry.
+#
+# Map-relative geometry is projected once, when added, into map space where
+# the whole map is the unit square.  Getting view coordinates is then just
+# a multiply and a subtract, with no work in the tile source.
+######
+
+    def set_projection(self):
+        """Set the map space scale for the current level and tile source.
+
+        Called after every level change.  If the tile source has changed,
+        or its tile coordinates don't scale linearly between levels, the
+        geometry of all map-relative layers is projected again.
+        """
+
+        tile_src = self.tile_src
+        (llon, rlon, blat, tlat) = tile_src.extent
+        (cx, cy) = tile_src.Geo2Tile((rlon, blat))
+
+        # check a known point is where it was at the last level
+        reproject = tile_src is not self.proj_tile_src
+        check = ((llon + rlon) / 2, (blat + tlat) / 2)
+        (tx, ty) = tile_src.Geo2Tile(check)
+        check_proj = (tx / cx, ty / cy)
+        if not reproject:
+            (u, v) = self.proj_check
+            reproject = (abs(u - check_proj[0]) > self.ProjectionTolerance
+                         or abs(v - check_proj[1]) > self.ProjectionTolerance)
+
+        self.proj_tile_src = tile_src
+        self.proj_check = check_proj
+        self.proj_corner = (cx, cy)
+        self.proj_scale_x = cx * tile_src.tile_size_x
+        self.proj_scale_y = cy * tile_src.tile_size_y
+
+        if reproject:
+            for layer in self.layer_mapping.values():
+                if layer.map_rel and layer.data:
+                    self.project_layer(layer)
+
+    def project(self, geo):
+        """Project a geo position into map space.
+
+        geo  tuple (xgeo, ygeo)
+
+        Returns a tuple (u, v) where (0, 0) is the top left corner of the
+        map and (1, 1) the bottom right.
+        """
+
+        (tx, ty) = self.tile_src.Geo2Tile(geo)
+        (cx, cy) = self.proj_corner
+        return (tx / cx, ty / cy)
+
+    @staticmethod
+    def pack_points(points):
+        """Pack the points of a polygon or polyline into a flat buffer.
+
+        points  iterable of (x, y) point tuples
+
+        Returns an array of x0, y0, x1, y1, ...
+        """
+
+        packed = array.array('d')
+        for (x, y) in points:
+            packed.append(x)
+            packed.append(y)
+        return packed
+
+    @staticmethod
+    def unpack_points(packed):
+        """Get the list of (x, y) point tuples from a buffer of packed points.
+
+        packed  array of x0, y0, x1, y1, ... see pack_points()
+        """
+
+        values = iter(packed)
+        return list(zip(values, values))
+
+    def pack_shape(self, points, map_rel):
+        """Get the points of a polygon or polyline as drawn.
+
+        points   the packed shape points, see pack_points()
+        map_rel  True if the points are geo coordinates, which are projected
+                 into map space, else they are view coordinates
+
+        Returns a tuple (coords, extent) where 'coords' is an array of
+        x0, y0, x1, y1, ... and 'extent' is (left, right, top, bottom) of
+        the points, or None if there are no points.  View coordinates need
+        no change so 'coords' is then 'points' itself, not a copy.
+        """
+
+        coords = points
+        if map_rel:
+            coords = array.array('d')
+            project = self.project
+            values = iter(points)
+            for geo in zip(values, values):
+                coords.extend(project(geo))
+
+        if not coords:
+            return (coords, None)
+
+        xs = coords[0::2]
+        ys = coords[1::2]
+        return (coords, (min(xs), max(xs), min(ys), max(ys)))
+
+    def project_layer(self, layer):
+        """Project the geometry of a map-relative layer again.
+
+        layer  the layer, changed in place so feature positions are kept
+        """
+
+        data = layer.data
+        if layer.type in (self.TypePoint, self.TypeImage, self.TypeText):
+            for (i, item) in enumerate(data):
+                data[i] = item[:2] + (self.project(item[:2]),) + item[3:]
+        elif layer.type in (self.TypePolygon, self.TypePolyline):
+            for (i, item) in enumerate(data):
+                data[i] = (item[:1] + self.pack_shape(item[0], True)
+                           + item[3:])
+        elif layer.type == self.TypeTrack:
+            data.reproject(self.project)
+        layer.changed()
+
+######
+# PEX - Point & EXtension.
+#
+# These functions encapsulate the code that finds the extent of an object.
+# They all return a tuple (point, extent) where 'point' is the placement
+# point of an object (or list of points for a polygon) and an 'extent'
+# tuple (lx, rx, ty, by) [left, right, top, bottom].
+######
+
+    def PexPoint(self, place, geo, x_off, y_off, radius):
+        """Given a point object (geo coords) get point/extent in view coords.
+
+        place         placement string
+        geo           point position tuple (xgeo, ygeo)
+        x_off, y_off  X and Y offsets
+
+        Return a tuple of point and extent origins (point, extent) where 'point'
+        is (px, py) and extent is (elx, erx, ety, eby) (both in view coords).
+        Return None for either or both if off-view.
+
+        The 'extent' here is the extent of the point+radius.
+        """
+
+        return self.pex_point(self.placement(place, x_off, y_off),
+                              self.project(geo), radius)
+
+    def pex_point(self, pl, proj, radius):
+        """PexPoint() with a placement transform and a point in map space.
+
+        pl      the placement transform, see placement()
+        proj    point position tuple (u, v) in map space, see project()
+        radius  radius of the point
+        """
+
+        # get point view coords
+        (u, v) = proj
+        (_, _, ox, oy) = pl
+        px = u*self.proj_scale_x - self.view_offset_x + ox
+        py = v*self.proj_scale_y - self.view_offset_y + oy
+        point = (px, py)
+
+        # extent = (left, right, top, bottom) in view coords
+        elx = px - radius
+        erx = px + radius
+        ety = py - radius
+        eby = py + radius
+        extent = (elx, erx, ety, eby)
+
+        # decide if point and extent are off-view
+        if px < 0 or px > self.view_width or py < 0 or py > self.view_height:
+            point = None
+
+        if erx < 0 or elx > self.view_width or eby < 0 or ety > self.view_height:
+            # no extent if ALL of extent is off-view
+            extent = None
+
+        return (point, extent)
+
+    def PexPointView(self, place, view, x_off, y_off, radius):
+        """Given a point object (view coords) get point/extent in view coords.
+
+        place         placement string
+        view          point position tuple (xview, yview)
+        x_off, y_off  X and Y offsets
+
+        Return a tuple of point and extent origins (point, extent) where 'point'
+        is (px, py) and extent is (elx, erx, ety, eby) (both in view coords).
+        Return None for either or both if off-view.
+
+        The 'extent' here is the extent of the point+radius.
+        """
+
+        return self.pex_point_view(self.placement(place, x_off, y_off),
+                                   view, radius)
+
+    def pex_point_view(self, pl, view, radius):
+        """PexPointView() with a placement transform, see placement()."""
+
+        # get point view coords and perturb point to placement
+        (xview, yview) = view
+        (ax, ay, ox, oy) = pl
+        px = xview + ax*self.view_width + ox
+        py = yview + ay*self.view_height + oy
+        point = (px, py)
+
+        # extent = (left, right, top, bottom) in view coords
+        elx = px - radius
+        erx = px + radius
+        ety = py - radius
+        eby = py + radius
+        extent = (elx, erx, ety, eby)
+
+        # decide if point and extent are off-view
+        if (px < 0 or px > self.view_width
+                or py < 0 or py > self.view_height):
+            view = None
+
+        if erx < 0 or elx > self.view_width or eby < 0 or ety > self.view_height:
+            # no extent if ALL of extent is off-view
+            extent = None
+
+        return (point, extent)
+
+    def PexExtent(self, place, geo, x_off, y_off, w, h):
+        """Given an extent object convert point/extent coords to view coords.
+
+        place         placement string
+        geo           point position tuple (xgeo, ygeo)
+        x_off, y_off  X and Y offsets
+        w, h          width and height of extent in pixels
+
+        Return a tuple of point and extent origins (point, extent) where 'point'
+        is (px, py) and extent is (elx, erx, ety, eby) (both in view coords).
+        Return None if point is off-view.
+
+        An extent object can be either an image object or a text object.
         """
 
-        # just in case we got None
-        if id:
-            # see if what we are about to remove might be visible
-            layer = self.layer_mapping[id]
-            visible = layer.visible
+        return self.pex_extent(self.placement(place, x_off, y_off),
+                               self.project(geo), w, h)
 
-            del layer
-            self.layer_z_order.remove(id)
+    def pex_extent(self, pl, proj, w, h):
+        """PexExtent() with a placement transform and a point in map space.
 
-            # if layer was visible, refresh display
-            if visible:
-                self.Update()
+        pl    the placement transform, see placement()
+        proj  point position tuple (u, v) in map space, see project()
+        w, h  width and height of extent in pixels
+        """
 
-    def SetLayerShowLevels(self, id, show_levels=None):
-        """Update the show_levels list for a layer.
+        # get point view coords
+        (u, v) = proj
+        px = u*self.proj_scale_x - self.view_offset_x
+        py = v*self.proj_scale_y - self.view_offset_y
+        point = (px, py)
 
-        id           ID of the layer we are going to update
-        show_levels  new layer show list
+        # extent = (left, right, top, bottom) in view coords
+        (ax, ay, ox, oy) = pl
+        elx = px - ax*w + ox
+        ety = py - ay*h + oy
+        erx = elx + w
+        eby = ety + h
+        extent = (elx, erx, ety, eby)
 
-        If 'show_levels' is None reset the displayable levels to
-        all levels in the current tileset.
+        # decide if point and extent are off-view
+        if px < 0 or px > self.view_width or py < 0 or py > self.view_height:
+            point = None
+
+        if erx < 0 or elx > self.view_width or eby < 0 or ety > self.view_height:
+            # no extent if ALL of extent is off-view
+            extent = None
+
+        return (point, extent)
+
+    def PexExtentView(self, place, view, x_off, y_off, w, h):
+        """Given a view object convert point/extent coords to view coords.
+
+        place         placement string
+        view          point position tuple (xview, yview)
+        x_off, y_off  X and Y offsets
+        w, h          width and height of extent in pixels
+
+        Return a tuple of point and extent origins (point, extent) where 'point'
+        is (px, py) and extent is (elx, erx, ety, eby) (both in view coords).
+        Either point or extent is None if object off-view.
+
+        Takes size of extent object into consideration.
+        """
+
+        return self.pex_extent_view(self.placement(place, x_off, y_off),
+                                    view, w, h)
+
+    def pex_extent_view(self, pl, view, w, h):
+        """PexExtentView() with a placement transform, see placement()."""
+
+        # get point view coords and perturb point to placement origin
+        # (the point isn't moved by the offsets)
+        (xview, yview) = view
+        (ax, ay, ox, oy) = pl
+        dx = ax*self.view_width
+        dy = ay*self.view_height
+        point = (xview + dx, yview + dy)
+
+        # get point view coords (X and Y)
+        (px, py) = view
+
+        # extent = (left, right, top, bottom) in view coords
+        elx = xview + dx - ax*w + ox
+        ety = yview + dy - ay*h + oy
+        erx = elx + w
+        eby = ety + h
+        extent = (elx, erx, ety, eby)
+
+        # decide if point and extent are off-view
+        if px < 0 or px > self.view_width or py < 0 or py > self.view_height:
+            view = None
+
+        if erx < 0 or elx > self.view_width or eby < 0 or ety > self.view_height:
+            # no extent if ALL of extent is off-view
+            extent = None
+
+        return (point, extent)
+
+    def PexPolygon(self, place, poly, x_off, y_off):
+        """Given a polygon/line obj (geo coords) get point/extent in view coords.
+
+        place         placement string
+        poly          list of point position tuples (xgeo, ygeo)
+        x_off, y_off  X and Y offsets
+
+        Return a tuple of point and extent origins (point, extent) where 'point'
+        is a list of (px, py) and extent is (elx, erx, ety, eby) (both in view
+        coords).  Return None for either or both if off-view.
+        """
+
+        (coords, extent) = self.pack_shape(self.pack_points(poly), True)
+        return self.pex_polygon(self.placement(place, x_off, y_off),
+                                coords, extent)
+
+    def pex_polygon(self, pl, coords, extent):
+        """PexPolygon() with a placement transform and a packed shape.
+
+        pl      the placement transform, see placement()
+        coords  the shape points packed in map space, see pack_shape()
+        extent  the shape extent in map space
+        """
+
+        return self.pex_shape(coords, extent, *self.shape_transform(pl, True))
+
+    def PexPolygonView(self, place, poly, x_off, y_off):
+        """Given a polygon/line obj (view coords) get point/extent in view coords.
+
+        place         placement string
+        poly          list of point position tuples (xview, yview)
+        x_off, y_off  X and Y offsets
+
+        Return a tuple of point and extent origins (point, extent) where 'point'
+        is a list of (px, py) and extent is (elx, erx, ety, eby) (both in view
+        coords).  Return None for either or both if off-view.
+        """
+
+        (coords, extent) = self.pack_shape(self.pack_points(poly), False)
+        return self.pex_polygon_view(self.placement(place, x_off, y_off),
+                                     coords, extent)
+
+    def pex_polygon_view(self, pl, coords, extent):
+        """PexPolygonView() with a placement transform and a packed shape.
+
+        pl      the placement transform, see placement()
+        coords  the shape points packed in view coords, see pack_shape()
+        extent  the shape extent in view coords
+        """
+
+        return self.pex_shape(coords, extent, *self.shape_transform(pl, False))
+
+    def shape_transform(self, pl, map_rel):
+        """Get the transform of a packed shape into view coordinates.
+
+        pl       the shape placement transform, see placement()
+        map_rel  True if the shape is in map space, else in view coordinates
+
+        Returns a tuple (sx, sy, dx, dy).  A shape point (x, y) is at
+        (x*sx + dx, y*sy + dy) in the view.
+        """
+
+        (ax, ay, ox, oy) = pl
+        if map_rel:
+            return (self.proj_scale_x, self.proj_scale_y,
+                    ox - self.view_offset_x, oy - self.view_offset_y)
+        return (1, 1, ax*self.view_width + ox, ay*self.view_height + oy)
+
+    def pex_shape(self, coords, extent, sx, sy, dx, dy):
+        """Get point/extent of a packed shape in view coords.
+
+        coords          the packed shape points, see pack_shape()
+        extent          the shape extent
+        sx, sy, dx, dy  the shape transform, see shape_transform()
+
+        Returns (point, extent) as for PexPolygon().
+        """
+
+        view_extent = self.shape_extent(extent, sx, sy, dx, dy)
+        if view_extent is None:
+            return (None, None)
+
+        values = iter(coords)
+        view = [(x*sx + dx, y*sy + dy) for (x, y) in zip(values, values)]
+        return (view, view_extent)
+
+    def shape_extent(self, extent, sx, sy, dx, dy):
+        """Get the view extent of a packed shape.
+
+        extent          the shape extent, see pack_shape()
+        sx, sy, dx, dy  the shape transform, see shape_transform()
+
+        Returns the extent (left, right, top, bottom) in view coords, or
+        None if the extent is off-view.
+        """
+
+        if extent is None:
+            return None
+
+        (lx, rx, ty, by) = extent
+        elx = lx*sx + dx
+        erx = rx*sx + dx
+        ety = ty*sy + dy
+        eby = by*sy + dy
+
+        if (erx < 0 or elx >= self.view_width
+                or eby < 0 or ety >= self.view_height):
+            return None
+
+        return (elx, erx, ety, eby)
+
+    @staticmethod
+    def shape_points(coords, sx, sy, dx, dy):
+        """Get the points of a packed shape to draw.
+
+        coords          the packed shape points, see pack_shape()
+        sx, sy, dx, dy  the shape transform, see shape_transform()
+
+        Returns a list of (x, y) integer view points.
+        """
+
+        values = iter(coords)
+        return [(int(x*sx + dx), int(y*sy + dy))
+                for (x, y) in zip(values, values)]
+
+######
+# Various utility routines
+######
+
+    def ViewExtent(self, place, view, w, h, x_off, y_off, dcw=0, dch=0):
+        """Get view extent of area.
+
+        place         placement string ('cc', 'se', etc)
+        view          tuple (xview,yview) of view coordinates of object point
+        w, h          area width and height (pixels)
+        x_off, y_off  x and y offset (pixels)
+
+        Return the view extent of the area: (left, right, top, bottom)
+        where:
+            left    pixel coords of left side of area
+            right   pixel coords of right side of area
+            top     pixel coords of top of area
+            bottom  pixel coords of bottom of area
+
+        Return a tuple (left, right, top, bottom) of the view coordinates of
+        the extent rectangle.
+        """
+
+        # top left corner
+        (x, y) = view
+        (left, top) = self.extent_placement(place, x, y, x_off, y_off,
+                                            w, h, dcw, dch)
+
+        # bottom right corner
+        right = left + w
+        bottom = top + h
+
+        return (left, right, top, bottom)
+
+    def get_i18n_kw(self, kwargs, kws, default):
+        """Get alternate international keyword value.
+
+        kwargs   dictionary to look for keyword value
+        kws      iterable of keyword spelling strings
+        default  default value if no keyword found
+
+        Returns the keyword value.
+        """
+
+        result = None
+        for kw_str in kws[:-1]:
+            result = kwargs.get(kw_str, None)
+            if result:
+                break
+        else:
+            result = kwargs.get(kws[-1], default)
+
+        return result
+
+######
+# Placement routines instead of original 'exec' code.
+# A placement is compiled once into a numeric transform, see placement().
+######
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def placement(place, x_off, y_off):
+        """Compile a placement into a numeric transform.
+
+        place         placement key string
+        x_off, y_off  offset from point
+
+        Returns a tuple (ax, ay, ox, oy).  With (dcw, dch) the size of the
+        view draw context, (0, 0) if map-relative, a point (x, y) is placed at
+            (x + ax*dcw + ox, y + ay*dch + oy)
+        and the top left corner of a (w, h) extent at
+            (x + ax*(dcw-w) + ox, y + ay*(dch-h) + oy)
+
+        The draw data of every object holds its transform, so the draw and
+        select code only does arithmetic.  Equal transforms are shared.
+        """
+
+        (ax, bx, ay, by) = _MapRenderer.PlacementCoeffs.get(place,
+                                                            (0, 0, 0, 0))
+        return (ax, ay, bx*x_off, by*y_off)
+
+    @staticmethod
+    def point_placement(place, x, y, x_off, y_off, dcw=0, dch=0):
+        """Perform map- or view-relative placement for a single point.
+
+        place         placement key string
+        x, y          point relative to placement origin
+        x_off, y_off  offset from point
+        dcw, dch      width, height of the view draw context (0 if map-rel)
+
+        Returns a tuple (x, y) in view coordinates.
+        """
+
+        (ax, ay, ox, oy) = _MapRenderer.placement(place, x_off, y_off)
+        return (x + ax*dcw + ox, y + ay*dch + oy)
+
+    @staticmethod
+    def extent_placement(place, x, y, x_off, y_off, w, h, dcw=0, dch=0):
+        """Perform map- and view-relative placement for an extent object.
+
+        place         placement key string
+        x, y          point relative to placement origin
+        x_off, y_off  offset from point
+        w, h          width, height of the image
+        dcw, dcw      width/height of the view draw context
+
+        Returns a tuple (x, y).
+        """
+
+        (ax, ay, ox, oy) = _MapRenderer.placement(place, x_off, y_off)
+        return (x + ax*(dcw-w) + ox, y + ay*(dch-h) + oy)
+
+###############################################################################
+# The wxPython pySlip widget proper
+###############################################################################
+
+class pySlip(_BufferedCanvas, _MapRenderer):
+    """A widget to display a tiled map, à la Google maps."""
+
+    def __init__(self, parent, tile_src, start_level=None, **kwargs):
+        """Initialise a pySlip instance.
+
+        parent       reference to parent object
+        tile_src     the Tiles source object
+        start_level  initial tile level to start at
+        **kwargs     keyword args for Panel
         """
 
-        # if we actually got an 'id' change the .show_levels value
-        if id:
-            layer = self.layer_mapping[id]
+        # create and initialise the base panel
+        super().__init__(parent=parent, **kwargs)
+        self.SetBackgroundColour(pySlip.BackgroundColour)
+
+        # initialize all state variables to a 'vanilla' state
+        self.change_level_event = True          # True if we send event on level change
+        self.default_cursor = DefaultCursor     # initial and usual cursor
+        self.frame_overlay = False              # True if frame times shown on view
+        self.frame_stats = _FrameStats()        # recent frame drawing times
+        self.ignore_next_right_up = False       # ignore next RIGHT UP event
+        self.ignore_next_up = False             # ignore next LEFT UP event
+        self.is_box_select = False              # True if box selection
+        self.last_drag_x = None                 # previous drag position (X)
+        self.last_drag_y = None                 # previous drag position (Y)
+        self.map_rlon = None
+        self.max_x_offset = None                # max view X offset (set in ResizeCallback())
+        self.max_y_offset = None                # max view Y offset (set in ResizeCallback())
+        self.mouse_position_event = True        # True if we send event to report mouse position in view
+        self.on_size_callback = self.ResizeCallback # set callback when parent resizes
+        self.right_click_event = False          # True if event on right mouse click (right button up event)
+        self.sbox_1_x = None                    # selection box X size
+        self.sbox_1_y = None                    # selection box Y size
+        self.sbox_h = None
+        self.sbox_w = None
+        self.shift_down = False                 # state of the SHIFT key
+        self.track_interval = None              # track redraw timer interval (ms)
+        self.track_timer = None                 # redraws changed track layers
+        self.view_blat = None                   # view bottom lat (set in OnSize())
+        self.view_llon = None                   # view left lon and top+bottom lat (set in OnSize())
+        self.view_rlon = None                   # view right lon (set in OnSize())
+        self.view_tlat = None                   # view top lat (set in OnSize())
+        self.was_dragging = False               # True if dragging map
 
-            # if not given a 'show_levels' show all levels available
-            if not show_levels:
-                show_levels = range(self.tiles_min_level,
-                                    self.tiles_max_level+1)[:]
+        # view and layer state shared with StaticMap, real view size set in OnSize()
+        _MapRenderer.__init__(self, tile_src, (1, 1))
 
-            layer.show_levels = show_levels
+        ######
+        # set some internal data
+        ######
 
-            # always update the display, there may be a change
-            self.Update()
+        # set up dispatch dictionaries for layer select handlers
+        # for point select
+        self.layerPSelHandler = {self.TypePoint: self.GetPointInLayer,
+                                 self.TypeImage: self.GetImageInLayer,
+                                 self.TypeText: self.GetTextInLayer,
+                                 self.TypePolygon: self.GetPolygonInLayer,
+                                 self.TypePolyline: self.GetPolylineInLayer}
 
-    def SetLayerSelectable(self, id, selectable=False):
-        """Update the .selectable attribute for a layer.
+        # for box select
+        self.layerBSelHandler = {self.TypePoint: self.GetBoxSelPointsInLayer,
+                                 self.TypeImage: self.GetBoxSelImagesInLayer,
+                                 self.TypeText: self.GetBoxSelTextsInLayer,
+                                 self.TypePolygon: self.GetBoxSelPolygonsInLayer,
+                                 self.TypePolyline: self.GetBoxSelPolylinesInLayer}
 
-        id          ID of the layer we are going to update
-        selectable  new .selectable attribute value (True or False)
-        """
+        # bind event handlers
+        self.Bind(wx.EVT_MOTION, self.OnMove)
+        self.Bind(wx.EVT_LEFT_DOWN, self.OnLeftDown)
+        self.Bind(wx.EVT_LEFT_DCLICK, self.OnLeftDClick)
+        self.Bind(wx.EVT_LEFT_UP, self.OnLeftUp)
+        self.Bind(wx.EVT_MIDDLE_DOWN, self.OnMiddleDown)
+        self.Bind(wx.EVT_MIDDLE_UP, self.OnMiddleUp)
+        self.Bind(wx.EVT_RIGHT_DOWN, self.OnRightDown)
+        self.Bind(wx.EVT_RIGHT_UP, self.OnRightUp)
+        self.Bind(wx.EVT_MOUSEWHEEL, self.OnMouseWheel)
+        self.Bind(wx.EVT_ENTER_WINDOW, self.OnEnterWindow)
+        self.Bind(wx.EVT_LEAVE_WINDOW, self.OnLeaveWindow)
 
-        # just in case id is None
-        if id:
-            layer = self.layer_mapping[id]
-            layer.selectable = selectable
+        # we also check KEY events, mostly for SHIFT key
+        self.Bind(wx.EVT_KEY_DOWN, self.OnKeyDown)
+        self.Bind(wx.EVT_KEY_UP, self.OnKeyUp)
 
-    ######
-    # Play with layers Z order
-    ######
+        # font sizes change with the screen DPI (newer wxPython only)
+        if hasattr(wx, 'EVT_DPI_CHANGED'):
+            self.Bind(wx.EVT_DPI_CHANGED, self.OnDPIChanged)
 
-    def PushLayerToBack(self, id):
-        """Make layer specified be drawn at back of Z order.
+        # check the start_level
+        if start_level is None:
+            start_level = self.tiles_min_level
+        elif start_level not in tile_src.levels:
+            start_level = self.tiles_min_level
+        self.level = start_level
 
-        id  ID of the layer to push to the back
-        """
+        # set the tile source object
+        self.ChangeTileset(tile_src)
 
-        self.layer_z_order.remove(id)
-        self.layer_z_order.insert(0, id)
-        self.Update()
+        # force a resize, which sets up the rest of the state
+        # eventually calls ResizeCallback()
+        self.OnSize()
 
-    def PopLayerToFront(self, id):
-        """Make layer specified be drawn at front of Z order.
+        # finally, use the tile level the user wants
+        self.GotoLevel(self.level)
 
-        id  ID of the layer to pop to the front
-        """
+    def OnTileAvailable(self, level, x, y, img, bmp):
+        """Callback routine: tile level/x/y is available.
 
-        self.layer_z_order.remove(id)
-        self.layer_z_order.append(id)
-        self.Update()
+        level  the map zoom level the image is for
+        x, y   tile coordinates of new tile
+        img    tile image
+        bmp    tile bitmap
 
-    def PlaceLayerBelowLayer(self, id, top_id):
-        """Place a layer so it will be drawn behind another layer.
+        We don't use any of the above - just redraw the entire canvas.
+        This is because the new tile is already in the in-memory cache.
 
-        id      ID of layer to place underneath 'top_id'
-        top_id  ID of layer to be drawn *above* 'id'
+        On a slow display we could just redraw the new tile.
         """
 
-        self.layer_z_order.remove(id)
-        i = self.layer_z_order.index(top_id)
-        self.layer_z_order.insert(i, id)
-        self.Update()
+        self.Invalidate()
 
-    ######
-    # Layer drawing routines
-    ######
+    def start_track_timer(self, fps):
+        """Start redrawing changed track layers 'fps' times a second.
 
-    def DrawPointLayer(self, dc, data, map_rel):
-        """Draw a points layer.
+        fps  the frame rate wanted
 
-        dc       the device context to draw on
-        data     an iterable of point tuples:
-                     (x, y, place, radius, colour, x_off, y_off, udata)
-        map_rel  points relative to map if True, else relative to view
+        One timer serves all track layers, it runs at the highest rate asked
+        for.
         """
 
-        # allow transparent colours
-        dc = wx.GCDC(dc)
-
-        # get correct pex function
-        pex = self.PexPointView
-        if map_rel:
-            pex = self.PexPoint
-
-        # draw points on map/view
-        cache_colour = None     # speed up drawing mostly not changing colours
+        interval = max(1, int(1000 / fps))
+        if self.track_timer is None:
+            self.track_timer = wx.Timer(self)
+            self.Bind(wx.EVT_TIMER, self.OnTrackTimer, self.track_timer)
 
-        for (x, y, place, radius, colour, x_off, y_off, udata) in data:
-            (pt, ex) = pex(place, (x,y), x_off, y_off, radius)
-            if ex and radius:  # don't draw if not on screen or zero radius
-                if cache_colour != colour:
-                    dc.SetPen(wx.Pen(colour))
-                    cache_colour = colour
-                    dc.SetBrush(wx.Brush(colour))
-                (x, _, y, _) = ex
-                dc.DrawCircle(x+radius, y+radius, radius)
+        if (not self.track_timer.IsRunning()
+                or interval < self.track_interval):
+            self.track_interval = interval
+            self.track_timer.Start(interval)
 
-    def DrawImageLayer(self, dc, images, map_rel):
-        """Draw an image Layer on the view.
+    def OnTrackTimer(self, event):
+        """Redraw the view if a showing track layer has changed.
 
-        dc       the device context to draw on
-        images   a sequence of image tuple sequences
-                   (x,y,bmap,w,h,placement,offset_x,offset_y,idata)
-        map_rel  points relative to map if True, else relative to view
+        Stops the timer when there are no track layers left.
         """
 
-        # allow transparent colours
-        dc = wx.GCDC(dc)
-
-        # get correct pex function
-        pex = self.PexExtentView
-        if map_rel:
-            pex = self.PexExtent
+        tracks = [self.layer_mapping[id] for id in self.layer_z_order
+                      if self.layer_mapping[id].type == self.TypeTrack]
+        if not tracks:
+            self.track_timer.Stop()
+            return
 
-        # draw the images
-        cache_colour = None     # speed up drawing mostly unchanging colours
+        for l in tracks:
+            if l.data.dirty and l.visible and self.level in l.show_levels:
+                self.Invalidate()
+                break
 
-        for (lon, lat, bmap, w, h, place,
-                 x_off, y_off, radius, colour, idata) in images:
-            (pt, ex) = pex(place, (lon, lat), x_off, y_off, w, h)
-            if ex:
-                (ix, _, iy, _) = ex
-                dc.DrawBitmap(bmap, ix, iy, False)
+    def OnDPIChanged(self, event):
+        """Screen DPI changed, text sizes and labels must be redone."""
 
-            if pt and radius:
-                if cache_colour != colour:
-                    dc.SetPen(wx.Pen(colour))
-                    dc.SetBrush(wx.Brush(colour))
-                    cache_colour = colour
-                (px, py) = pt
-                dc.DrawCircle(px, py, radius)
+        self.ClearTextCache()
+        event.Skip()
 
-    def DrawTextLayer(self, dc, text, map_rel):
-        """Draw a text Layer on the view.
+    def OnEnterWindow(self, event):
+        """Event handler when mouse enters widget."""
 
-        dc       the device context to draw on
-        text     a sequence of tuples:
-                     (lon, lat, tdata, placement, radius, colour, fontname,
-                      fontsize, offset_x, offset_y, tdata)
-        map_rel  points relative to map if True, else relative to view
-        """
+        # check state of the SHIFT key
+        self.shift_down = False
+        if event.GetModifiers() == wx.MOD_SHIFT:
+            self.shift_down = True
+            self.default_cursor = BoxSelectCursor
+            self.SetCursor(wx.Cursor(BoxSelectCursor))
 
-        # we need the size of the DC
-        dc = wx.GCDC(dc)		# allow transparent colours
+        self.SetFocus()
 
-        # get correct pex function for mode (map/view)
-        pex = self.PexExtentView
-        if map_rel:
-            pex = self.PexExtent
+    def OnLeaveWindow(self, event):
+        """Event handler when mouse leaves widget."""
 
-        # draw text on map/view
-        cache_textcolour = None # speed up mostly unchanging data
-        cache_font = None
-        cache_colour = None
+        # turn off drag
+        self.was_dragging = False
+        self.last_drag_x = self.last_drag_y = None
 
-        for (lon, lat, tdata, place, radius, colour,
-                textcolour, fontname, fontsize, x_off, y_off, data) in text:
+        # turn off box selection mechanism
+        self.is_box_select = False
+        self.sbox_1_x = self.sbox_1_y = None
 
-            # set font characteristics so we calculate text width/height
-            if cache_textcolour != textcolour:
-                dc.SetTextForeground(textcolour)
-                cache_textcolour = textcolour
+        # cursor back to normal
+        self.shift_down = False
+        self.default_cursor = DefaultCursor
+        self.SetCursor(wx.Cursor(DefaultCursor))
 
-            if cache_font != (fontname, fontsize):
-                font = wx.Font(fontsize, wx.SWISS, wx.NORMAL, wx.NORMAL,
-                               False, fontname)
-                dc.SetFont(font)
-                cache_font = (fontname, fontsize)
+        # alert any listener that we are OFF the widget
+        self.RaiseEventPosition(None, None)
 
-            (w, h, _, _) = dc.GetFullTextExtent(tdata)
+    ######
+    # Change the tileset
+    ######
 
-            # get point + extent information (each can be None if off-view)
-            (pt, ex) = pex(place, (lon, lat), x_off, y_off, w, h)
-            if ex:
-                (lx, _, ty, _) = ex
-                dc.DrawText(tdata, lx, ty)
+    def ChangeTileset(self, tile_src):
+        """Change the source of tiles.
 
-            if pt and radius:
-                (x, y) = pt
-                if cache_colour != colour:
-                    dc.SetPen(wx.Pen(colour))
-                    dc.SetBrush(wx.Brush(colour))
-                dc.DrawCircle(x, y, radius)
+        tile_src  the tileset object to use
 
-    def DrawPolygonLayer(self, dc, data, map_rel):
-        """Draw a polygon layer.
+        Returns the previous tileset object, None if none.
 
-        dc       the device context to draw on
-        data     an iterable of polygon tuples:
-                     (p, placement, width, colour, closed,
-                      filled, fillcolour, offset_x, offset_y, udata)
-                 where p is an iterable of points: (x, y)
-        map_rel  points relative to map if True, else relative to view
+        Refreshes the display and tries to maintain the same position
+        and zoom level.  May change the zoom level if the current level doesn't
+        exist in the new tileset.
         """
 
-        # allow transparent colours
-        dc = wx.GCDC(dc)
+        # get level and geo position of view centre
+        (level, geo) = self.GetLevelAndPosition()
 
-        # get the correct pex function for mode (map/view)
-        pex = self.PexPolygonView
-        if map_rel:
-            pex = self.PexPolygon
+        # remember old tileset
+        old_tileset = self.tile_src
 
-        # draw polygons
-        cache_colour_width = None     # speed up mostly unchanging data
-        cache_fillcolour = None
+        # get levels in new tileset and see if we can display at the current level
+        new_levels = tile_src.levels
+        new_max_level = tile_src.max_level
+        new_min_level = tile_src.min_level
+        if level > new_max_level:
+            level = new_max_level
+        if level < new_min_level:
+            level = new_min_level
 
-        for (p, place, width, colour, closed,
-                 filled, fillcolour, x_off, y_off, udata) in data:
-            (poly, extent) = pex(place, p, x_off, y_off)
-            if poly:
-                if cache_colour_width != (colour, width):
-                    dc.SetPen(wx.Pen(colour, width=width))
-                    cache_colour = (colour, width)
-
-                if filled:
-                    if cache_fillcolour != fillcolour:
-                        dc.SetBrush(wx.Brush(fillcolour))
-                        cache_fillcolour = fillcolour
-                else:
-                    dc.SetBrush(wx.TRANSPARENT_BRUSH)
+        # set new tile source and set some state
+        self.tile_src = tile_src
+        self.tile_width = tile_src.tile_size_x
+        self.tile_height = tile_src.tile_size_y
+        self.level = level
 
-                if closed:
-                    dc.DrawPolygon(poly)
-                else:
-                    dc.DrawLines(poly)
+        result = self.tile_src.GetInfo(level)
+        (num_tiles_x, num_tiles_y, ppd_x, ppd_y) = result
+        self.map_width = self.tile_width * num_tiles_x
+        self.map_height = self.tile_height * num_tiles_y
+        self.ppd_x = ppd_x
+        self.ppd_y = ppd_y
 
-    def DrawPolylineLayer(self, dc, data, map_rel):
-        """Draw a polyline layer.
+        # set tile levels stuff - allowed levels, etc
+        self.tiles_max_level = max(tile_src.levels)
+        self.tiles_min_level = min(tile_src.levels)
 
-        dc       the device context to draw on
-        data     an iterable of polyline tuples:
-                     (p, placement, width, colour, offset_x, offset_y, udata)
-                 where p is an iterable of points: (x, y)
-        map_rel  points relative to map if True, else relative to view
-        """
+        # set callback from Tile source object when tile(s) available
+        self.tile_src.setCallback(self.OnTileAvailable)
+
+        # set the new zoom level to the old
+        if not tile_src.UseLevel(self.level):
+            # can't use old level, make sensible choice
+            if self.level < self.tiles_min_level:
+                self.level = self.tiles_min_level
+            elif self.level > self.tiles_max_level:
+                self.level = self.tiles_max_level
 
-        # allow transparent colours
-        dc = wx.GCDC(dc)
+            # if we can't change level now, raise an error exception
+            if not tile_src.UseLevel(self.level):
+                raise Exception('Trying to use level %s in tile obj %s, '
+                                'levels available are %s'
+                                % (str(self.level),
+                                   str(tile_src), str(tile_src.levels)))
 
-        # get the correct pex function for mode (map/view)
-        pex = self.PexPolygonView
-        if map_rel:
-            pex = self.PexPolygon
+        # set the "key tile"
+        self.set_key_from_centre(geo)
 
-        # draw polyline(s)
-        cache_colour_width = None       # speed up mostly unchanging data
+        # back to old level+centre, and refresh the display
+        self.GotoLevelAndPosition(level, geo)
 
-        for (p, place, width, colour, x_off, y_off, udata) in data:
-            (poly, extent) = pex(place, p, x_off, y_off)
-            if poly:
-                if cache_colour_width != (colour, width):
-                    dc.SetPen(wx.Pen(colour, width=width))
-                    cache_colour_width = (colour, width)
-                dc.SetBrush(wx.TRANSPARENT_BRUSH)
-                dc.DrawLines(poly)
+        return old_tileset
 
 ######
 # Positioning methods
@@ -1435,6 +3803,7 @@ class pySlip(_BufferedCanvas):
         self.map_height = self.tile_src.num_tiles_y * self.tile_src.tile_size_y
         (self.map_llon, self.map_rlon,
          self.map_blat, self.map_tlat) = self.tile_src.extent
+        self.set_projection()
 
         # to set some state variables
         self.OnSize()
@@ -1453,21 +3822,9 @@ class pySlip(_BufferedCanvas):
         RecalcViewLimits(), redraws widget.
         """
 
-        # get fractional tile coords of required centre of view
-        (xtile, ytile) = self.tile_src.Geo2Tile(geo)
-
-        # now calculate view offsets, top, left, bottom and right
-        half_width = self.view_width / 2
-        centre_pixels_from_map_left = int(xtile * self.tile_width)
-        self.view_offset_x = centre_pixels_from_map_left - half_width
-
-        half_height = self.view_height / 2
-        centre_pixels_from_map_top = int(ytile * self.tile_height)
-        self.view_offset_y = centre_pixels_from_map_top - half_height
-
-        # set the left/right/top/bottom lon/lat extents and redraw view
-        self.RecalcViewLimits()
-        self.Update()
+        # set view offsets and lon/lat extents, then redraw view
+        self.centre_view(geo)
+        self.Invalidate()
 
     def GotoLevelAndPosition(self, level, geo):
         """Goto a map level and set view to centre on a position.
@@ -1513,287 +3870,20 @@ class pySlip(_BufferedCanvas):
 # Get level and view data
 ######
 
-    def GetLevelAndPosition(self, place='cc'):
-        """Get the level and geo position of a point within the view.
-
-        place  a placement string specifying the point in the view
-               for which we require the geo position
-
-        Returns a tuple (level, geo) where 'geo' is (geo_x, geo_y).
-        """
-
-        view_coords = self.point_placement(place, 0, 0, 0, 0,
-                                           self.view_width, self.view_height)
-        geo = self.View2Geo(view_coords)
-
-        return (self.level, geo)
-
-######
-# Convert between geo and view coordinates
-######
-
-    def Geo2View(self, geo):
-        """Convert a geo coord to view.
-
-        geo  tuple (xgeo, ygeo)
-
-        Return a tuple (xview, yview) in view coordinates.
-        Assume point is in view.
-        """
-
-        (tx, ty) = self.tile_src.Geo2Tile(geo)
-        return ((tx * self.tile_src.tile_size_x) - self.view_offset_x,
-                (ty * self.tile_src.tile_size_y) - self.view_offset_y)
-
-
-    def Geo2ViewMasked(self, geo):
-        """Convert a geo (lon+lat) position to view pixel coords.
-
-        geo  tuple (xgeo, ygeo)
-
-        Return a tuple (xview, yview) of point if on-view,or None
-        if point is off-view.
-        """
-
-        (xgeo, ygeo) = geo
-
-        if (self.view_llon <= xgeo <= self.view_rlon and
-                self.view_blat <= ygeo <= self.view_tlat):
-            return self.Geo2View(geo)
-
-        return None
-
-######
-# PEX - Point & EXtension.
-#
-# These functions encapsulate the code that finds the extent of an object.
-# They all return a tuple (point, extent) where 'point' is the placement
-# point of an object (or list of points for a polygon) and an 'extent'
-# tuple (lx, rx, ty, by) [left, right, top, bottom].
-######
-
-    def PexPoint(self, place, geo, x_off, y_off, radius):
-        """Given a point object (geo coords) get point/extent in view coords.
-
-        place         placement string
-        geo           point position tuple (xgeo, ygeo)
-        x_off, y_off  X and Y offsets
-
-        Return a tuple of point and extent origins (point, extent) where 'point'
-        is (px, py) and extent is (elx, erx, ety, eby) (both in view coords).
-        Return None for either or both if off-view.
-
-        The 'extent' here is the extent of the point+radius.
-        """
-
-        # get point view coords
-        (xview, yview) = self.Geo2View(geo)
-        point = self.point_placement(place, xview, yview, x_off, y_off)
-        (px, py) = point
-
-        # extent = (left, right, top, bottom) in view coords
-        elx = px - radius
-        erx = px + radius
-        ety = py - radius
-        eby = py + radius
-        extent = (elx, erx, ety, eby)
-
-        # decide if point and extent are off-view
-        if px < 0 or px > self.view_width or py < 0 or py > self.view_height:
-            point = None
-
-        if erx < 0 or elx > self.view_width or eby < 0 or ety > self.view_height:
-            # no extent if ALL of extent is off-view
-            extent = None
-
-        return (point, extent)
-
-    def PexPointView(self, place, view, x_off, y_off, radius):
-        """Given a point object (view coords) get point/extent in view coords.
-
-        place         placement string
-        view          point position tuple (xview, yview)
-        x_off, y_off  X and Y offsets
-
-        Return a tuple of point and extent origins (point, extent) where 'point'
-        is (px, py) and extent is (elx, erx, ety, eby) (both in view coords).
-        Return None for either or both if off-view.
-
-        The 'extent' here is the extent of the point+radius.
-        """
-
-        # get point view coords and perturb point to placement
-        (xview, yview) = view
-        point = self.point_placement(place, xview, yview, x_off, y_off,
-                                     self.view_width, self.view_height)
-        (px, py) = point
-
-        # extent = (left, right, top, bottom) in view coords
-        elx = px - radius
-        erx = px + radius
-        ety = py - radius
-        eby = py + radius
-        extent = (elx, erx, ety, eby)
-
-        # decide if point and extent are off-view
-        if (px < 0 or px > self.view_width
-                or py < 0 or py > self.view_height):
-            view = None
-
-        if erx < 0 or elx > self.view_width or eby < 0 or ety > self.view_height:
-            # no extent if ALL of extent is off-view
-            extent = None
-
-        return (point, extent)
-
-    def PexExtent(self, place, geo, x_off, y_off, w, h):
-        """Given an extent object convert point/extent coords to view coords.
-
-        place         placement string
-        geo           point position tuple (xgeo, ygeo)
-        x_off, y_off  X and Y offsets
-        w, h          width and height of extent in pixels
-
-        Return a tuple of point and extent origins (point, extent) where 'point'
-        is (px, py) and extent is (elx, erx, ety, eby) (both in view coords).
-        Return None if point is off-view.
-
-        An extent object can be either an image object or a text object.
-        """
-
-        # get point view coords
-        point = self.Geo2View(geo)
-        (px, py) = point
-
-        # extent = (left, right, top, bottom) in view coords
-        extent = self.ViewExtent(place, point, w, h, x_off, y_off)
-        (elx, erx, ety, eby) = extent
-
-        # decide if point and extent are off-view
-        if px < 0 or px > self.view_width or py < 0 or py > self.view_height:
-            point = None
-
-        if erx < 0 or elx > self.view_width or eby < 0 or ety > self.view_height:
-            # no extent if ALL of extent is off-view
-            extent = None
-
-        return (point, extent)
-
-    def PexExtentView(self, place, view, x_off, y_off, w, h):
-        """Given a view object convert point/extent coords to view coords.
-
-        place         placement string
-        view          point position tuple (xview, yview)
-        x_off, y_off  X and Y offsets
-        w, h          width and height of extent in pixels
-
-        Return a tuple of point and extent origins (point, extent) where 'point'
-        is (px, py) and extent is (elx, erx, ety, eby) (both in view coords).
-        Either point or extent is None if object off-view.
-
-        Takes size of extent object into consideration.
-        """
-
-        # get point view coords and perturb point to placement origin
-        (xview, yview) = view
-        point = self.point_placement(place, xview, yview, 0, 0,
-                                     self.view_width, self.view_height)
-
-        # get point view coords (X and Y)
-        (px, py) = view
-
-        # extent = (left, right, top, bottom) in view coords
-        extent = self.ViewExtent(place, view, w, h, x_off, y_off,
-                                 self.view_width, self.view_height)
-        (elx, erx, ety, eby) = extent
-
-        # decide if point and extent are off-view
-        if px < 0 or px > self.view_width or py < 0 or py > self.view_height:
-            view = None
-
-        if erx < 0 or elx > self.view_width or eby < 0 or ety > self.view_height:
-            # no extent if ALL of extent is off-view
-            extent = None
-
-        return (point, extent)
-
-    def PexPolygon(self, place, poly, x_off, y_off):
-        """Given a polygon/line obj (geo coords) get point/extent in view coords.
-
-        place         placement string
-        poly          list of point position tuples (xgeo, ygeo)
-        x_off, y_off  X and Y offsets
-
-        Return a tuple of point and extent origins (point, extent) where 'point'
-        is a list of (px, py) and extent is (elx, erx, ety, eby) (both in view
-        coords).  Return None for either or both if off-view.
-        """
-
-        # get polygon/line points in perturbed view coordinates
-        view = []
-        for geo in poly:
-            (xview, yview) = self.Geo2View(geo)
-            point = self.point_placement(place, xview, yview, x_off, y_off)
-            view.append(point)
-
-        # get extent - max/min x and y
-        # extent = (left, right, top, bottom) in view coords
-        elx = min(view, key=lambda x: x[0])[0]
-        erx = max(view, key=lambda x: x[0])[0]
-        ety = min(view, key=lambda x: x[1])[1]
-        eby = max(view, key=lambda x: x[1])[1]
-        extent = (elx, erx, ety, eby)
-
-        # decide if polygon or extent are off-view
-        res_pt = None
-        res_ex = None
-        for (px, py) in view:
-            if ((px >= 0 and px < self.view_width)
-                    and (py >= 0 and py < self.view_height)):
-                res_pt = view
-                res_ex = extent
-                break
-
-        return (res_pt, res_ex)
-
-    def PexPolygonView(self, place, poly, x_off, y_off):
-        """Given a polygon/line obj (view coords) get point/extent in view coords.
-
-        place         placement string
-        poly          list of point position tuples (xview, yview)
-        x_off, y_off  X and Y offsets
-
-        Return a tuple of point and extent origins (point, extent) where 'point'
-        is a list of (px, py) and extent is (elx, erx, ety, eby) (both in view
-        coords).  Return None for either or both if off-view.
-        """
+    def GetLevelAndPosition(self, place='cc'):
+        """Get the level and geo position of a point within the view.
 
-        # get polygon/line points in view coordinates
-        view = []
-        for (xview, yview) in poly:
-            point = self.point_placement(place, xview, yview, x_off, y_off,
-                                         self.view_width, self.view_height)
-            view.append(point)
+        place  a placement string specifying the point in the view
+               for which we require the geo position
 
-        # get extent - max/min x and y
-        # extent = (left, right, top, bottom) in view coords
-        elx = min(view, key=lambda x: x[0])[0]
-        erx = max(view, key=lambda x: x[0])[0]
-        ety = min(view, key=lambda x: x[1])[1]
-        eby = max(view, key=lambda x: x[1])[1]
-        extent = (elx, erx, ety, eby)
+        Returns a tuple (level, geo) where 'geo' is (geo_x, geo_y).
+        """
 
-        # decide if polygon/line or extent are off-view
-        res_pt = None
-        res_ex = None
-        for (px, py) in view:
-            if ((px >= 0 and px < self.view_width)
-                    and (py >= 0 and py < self.view_height)):
-                res_pt = view
-                res_ex = extent
-                break
+        view_coords = self.point_placement(place, 0, 0, 0, 0,
+                                           self.view_width, self.view_height)
+        geo = self.View2Geo(view_coords)
 
-        return (res_pt, res_ex)
+        return (self.level, geo)
 
 ######
 # GUI stuff
@@ -1836,8 +3926,10 @@ class pySlip(_BufferedCanvas):
                 self.view_offset_x += dx
                 self.view_offset_y += dy
 
-                # limit drag at edges of map
-                if self.map_width > self.view_width:
+                # limit drag at edges of map, unless the map wraps
+                if self.wraps_x():
+                    self.wrap_view_offset()
+                elif self.map_width > self.view_width:
                     # if map > view, don't allow edge to show background
                     if self.view_offset_x < 0:
                         self.view_offset_x = 0
@@ -1866,7 +3958,7 @@ class pySlip(_BufferedCanvas):
                 self.RecalcViewLimits()
 
             # redraw client area
-            self.Update()
+            self.Invalidate()
 
     def OnKeyDown(self, event):
         """Handle pressing a key down.
@@ -1951,7 +4043,8 @@ class pySlip(_BufferedCanvas):
                     if l.selectable and l.visible:
                         if l.map_rel:
                             # map-relative, get all points selected (if any)
-                            sel = self.layerBSelHandler[l.type](l, ll_g, tr_g)
+                            sel = self.select_map_rel(self.layerBSelHandler,
+                                                      l, ll_g, tr_g)
                         else:
                             # view-relative
                             sel = self.layerBSelHandler[l.type](l,
@@ -1976,7 +4069,8 @@ class pySlip(_BufferedCanvas):
                     # if layer visible and selectable
                     if l.selectable and l.visible:
                         if l.map_rel:
-                            sel = self.layerPSelHandler[l.type](l, clickpt_g)
+                            sel = self.select_map_rel(self.layerPSelHandler,
+                                                      l, clickpt_g)
                         else:
                             sel = self.layerPSelHandler[l.type](l, clickpt_v)
                         self.RaiseEventSelect(mposn=clickpt_g, vposn=clickpt_v,
@@ -1994,7 +4088,7 @@ class pySlip(_BufferedCanvas):
 
         # force PAINT event if required
         if delayed_paint:
-            self.Update()
+            self.Invalidate()
 
     def OnLeftDClick(self, event):
         """Left mouse button double-click.
@@ -2046,7 +4140,8 @@ class pySlip(_BufferedCanvas):
             # if layer visible and selectable
             if l.selectable and l.visible:
                 if l.map_rel:
-                    sel = self.layerPSelHandler[l.type](l, clickpt_g)
+                    sel = self.select_map_rel(self.layerPSelHandler,
+                                              l, clickpt_g)
                 else:
                     sel = self.layerPSelHandler[l.type](l, clickpt_v)
                 self.RaiseEventSelect(mposn=clickpt_g, vposn=clickpt_v,
@@ -2056,7 +4151,7 @@ class pySlip(_BufferedCanvas):
 
         # force PAINT event if required
         if delayed_paint:
-            self.Update()
+            self.Invalidate()
 
     def OnRightDown(self, event):
         """Right mouse button down. Do nothing in this version."""
@@ -2082,7 +4177,8 @@ class pySlip(_BufferedCanvas):
             # if layer visible and selectable
             if l.selectable and l.visible:
                 if l.map_rel:
-                    sel = self.layerPSelHandler[l.type](l, clickpt_g)
+                    sel = self.select_map_rel(self.layerPSelHandler,
+                                              l, clickpt_g)
                 else:
                     sel = self.layerPSelHandler[l.type](l, clickpt_v)
                 self.RaiseEventSelect(mposn=clickpt_g, vposn=clickpt_v,
@@ -2092,7 +4188,7 @@ class pySlip(_BufferedCanvas):
 
         # force PAINT event if required
         if delayed_paint:
-            self.Update()
+            self.Invalidate()
 
     def OnLeftDClick(self, event):
         """Left mouse button double-click.
@@ -2132,60 +4228,16 @@ class pySlip(_BufferedCanvas):
 
         dc  device context to draw on
 
-        The idea is to create 4 things that define the tiles to be drawn and
-        where to draw them:
-            x_pix_start  view pixel coord of left side of top-left tile
-            y_pix_start  view pixel coord of top side of top-left tole
-            row_list     list (top -> bottom) of tile rows
-            col_list     list (left -> right) of tile columns
-
-        Note that (x_pix_start, y_pix_start) will typically be OUTSIDE the view
-        if the view is smaller than the map.
+        Each phase of drawing is timed, see GetFrameStats().
         """
 
-        # figure out how to draw tiles
-        if self.view_offset_x < 0:
-            # View > Map in X - centre in X direction
-            col_list = range(self.tile_src.num_tiles_x)
-            x_pix_start = -self.view_offset_x
-        else:
-            # Map > View - determine layout in X direction
-            start_x_tile = int(self.view_offset_x / self.tile_width)
-            stop_x_tile = int((self.view_offset_x + self.view_width
-                               + self.tile_width - 1) / self.tile_width)
-            stop_x_tile = min(self.tile_src.num_tiles_x-1, stop_x_tile) + 1
-            col_list = range(start_x_tile, stop_x_tile)
-            x_pix_start = start_x_tile * self.tile_height - self.view_offset_x
-
-        if self.view_offset_y < 0:
-            # View > Map in Y - centre in Y direction
-            row_list = range(self.tile_src.num_tiles_y)
-            y_pix_start = -self.view_offset_y
-        else:
-            # Map > View - determine layout in Y direction
-            start_y_tile = int(self.view_offset_y / self.tile_height)
-            stop_y_tile = int((self.view_offset_y + self.view_height
-                               + self.tile_height - 1) / self.tile_height)
-            stop_y_tile = min(self.tile_src.num_tiles_y-1, stop_y_tile) + 1
-            row_list = range(start_y_tile, stop_y_tile)
-            y_pix_start = start_y_tile * self.tile_height - self.view_offset_y
-
-        # start pasting tiles onto the view
-        # use x_pix and y_pix to place tiles
-        x_pix = x_pix_start
-        for x in col_list:
-            y_pix = y_pix_start
-            for y in row_list:
-                tile = self.tile_src.GetTile(x, y)
-                dc.DrawBitmap(tile, x_pix, y_pix, False)
-                y_pix += self.tile_height
-            x_pix += self.tile_width
-
-        # draw layers
-        for id in self.layer_z_order:
-            l = self.layer_mapping[id]
-            if l.visible and self.level in l.show_levels:
-                l.painter(dc, l.data, map_rel=l.map_rel)
+        # draw tiles and layers
+        start = time.perf_counter()
+        self.draw_tiles(dc)
+        tiles_done = time.perf_counter()
+        layer_times = {}
+        self.draw_layers(dc, layer_times)
+        layers_done = time.perf_counter()
 
         # draw selection rectangle, if any
         if self.sbox_1_x:
@@ -2198,23 +4250,67 @@ class pySlip(_BufferedCanvas):
             dc.DrawRectangle(self.sbox_1_x, self.sbox_1_y,
                              self.sbox_w, self.sbox_h)
 
-######
-# Miscellaneous
-######
+        end = time.perf_counter()
+        self.frame_stats.add(end, end - start, tiles_done - start,
+                             layer_times, end - layers_done)
 
-    def View2Geo(self, view):
-        """Convert a view coords position to a geo coords position.
+        if self.frame_overlay:
+            self.draw_frame_overlay(dc)
 
-        view  tuple of view coords (xview, yview)
+    def draw_frame_overlay(self, dc):
+        """Draw frame rate and the last frame's times in the view top-left.
 
-        Returns a tuple of geo coords (xgeo, ygeo);
+        dc  device context to draw on
         """
 
-        (xview, yview) = view
-        xtile = float(self.view_offset_x + xview) / self.tile_width
-        ytile = float(self.view_offset_y + yview) / self.tile_height
+        (_, total, tiles, layers, _) = self.frame_stats.frames[-1]
+        text = ('%.1f fps  frame %.1fms  tiles %.1fms  layers %.1fms'
+                % (self.frame_stats.fps(), total*1000, tiles*1000,
+                   sum(layers.values())*1000))
 
-        return self.tile_src.Tile2Geo((xtile, ytile))
+        dc.SetFont(wx.Font(8, wx.FONTFAMILY_SWISS, wx.FONTSTYLE_NORMAL,
+                           wx.FONTWEIGHT_NORMAL))
+        (w, h) = dc.GetTextExtent(text)
+        dc.SetPen(wx.TRANSPARENT_PEN)
+        dc.SetBrush(wx.Brush(wx.Colour(255, 255, 255)))
+        dc.DrawRectangle(0, 0, w + 4, h + 2)
+        dc.SetTextForeground(wx.Colour(0, 0, 0))
+        dc.DrawText(text, 2, 1)
+
+    def GetFrameStats(self, reset=False):
+        """Get statistics of recent frame drawing times.
+
+        reset  if True, forget recent frames after taking the snapshot
+
+        Returns a dictionary, see _FrameStats.snapshot() for the keys.  Use
+        the 'layers' entry to find which layers are slow to draw.
+        """
+
+        stats = self.frame_stats.snapshot(self.layer_mapping)
+        if reset:
+            self.frame_stats.reset()
+        return stats
+
+    def SetFrameStatsWindow(self, window):
+        """Set the number of recent frames used for frame statistics.
+
+        window  number of frames remembered
+        """
+
+        self.frame_stats = _FrameStats(window)
+
+    def ShowFrameOverlay(self, show=True):
+        """Show or hide the frame rate overlay in the view top-left corner.
+
+        show  True if the overlay is to be shown
+        """
+
+        self.frame_overlay = show
+        self.Invalidate()
+
+######
+# Miscellaneous
+######
 
     def ResizeCallback(self, event=None):
         """Handle a window resize.
@@ -2233,8 +4329,11 @@ class pySlip(_BufferedCanvas):
         self.max_x_offset = self.map_width - self.view_width
         self.max_y_offset = self.map_height - self.view_height
 
+        # if map wraps in X axis there are no map edges
+        if self.wraps_x():
+            self.wrap_view_offset()
         # if map > view in X axis
-        if self.map_width > self.view_width:
+        elif self.map_width > self.view_width:
             # do nothing unless background is showing
             # if map left edge right of view edge
             if self.view_offset_x < 0:
@@ -2264,34 +4363,42 @@ class pySlip(_BufferedCanvas):
         # set the left/right/top/bottom lon/lat extents
         self.RecalcViewLimits()
 
-    def RecalcViewLimits(self):
-        """Recalculate the view geo extent values.
+######
+# Select helpers - get objects that were selected
+######
 
-        Assumes only:
-            self.view_offset_x
-            self.view_offset_y
-            self.tile_src.tile_size_x
-            self.tile_src.tile_size_y
-        values have been set.  All are map pixel values.
+    def select_map_rel(self, handlers, layer, *points):
+        """Run a map-relative select handler, including across the seam.
+
+        handlers  either self.layerPSelHandler or self.layerBSelHandler
+        layer     the layer to select in
+        points    the click point or the box corners, in geo coords
+
+        If the view spans the right edge of a wrapped map the objects near
+        the seam are also drawn one map width to the right, so we run the
+        handler again in the seam view with the points moved one map width
+        left.  A point selection takes the first hit, a box selection
+        merges both results.
         """
 
-        # get geo coords of top-left of view
-        tltile_x = float(self.view_offset_x) / self.tile_src.tile_size_x
-        tltile_y = float(self.view_offset_y) / self.tile_src.tile_size_y
-        (self.view_llon, self.view_tlat) = self.tile_src.Tile2Geo((tltile_x,
-                                                                   tltile_y))
+        handler = handlers[layer.type]
+        sel = handler(layer, *points)
+        if not self.view_crosses_seam():
+            return sel
 
-        # then get geo coords of bottom-right of view
-        tltile_x = (float(self.view_offset_x + self.view_width)
-                        / self.tile_src.tile_size_x)
-        tltile_y = (float(self.view_offset_y + self.view_height)
-                        / self.tile_src.tile_size_y)
-        (self.view_rlon, self.view_blat) = self.tile_src.Tile2Geo((tltile_x,
-                                                                tltile_y))
+        (map_llon, map_rlon, _, _) = self.tile_src.extent
+        span = map_rlon - map_llon
+        with self.seam_view():
+            seam_sel = handler(layer, *[(x - span, y) for (x, y) in points])
 
-######
-# Select helpers - get objects that were selected
-######
+        if sel is None:
+            return seam_sel
+        if seam_sel is None or len(points) == 1:
+            return sel
+
+        (selection, data, relsel) = sel
+        (seam_selection, seam_data, _) = seam_sel
+        return (selection + seam_selection, data + seam_data, relsel)
 
     def GetPointInLayer(self, layer, pt):
         """Determine if clicked location selects a point in layer data.
@@ -2317,16 +4424,17 @@ class pySlip(_BufferedCanvas):
         dist = 9999999.0        # more than possible
 
         # get correct pex function and click point in correct coords
-        pex = self.PexPointView
+        pex = self.pex_point_view
         clickpt = pt
         if layer.map_rel:
-            pex = self.PexPoint
+            pex = self.pex_point
             clickpt = self.Geo2View(pt)
 
         # get selected point on map/view
         (xclick, yclick) = clickpt
-        for (x, y, place, radius, colour, x_off, y_off, udata) in layer.data:
-            (vp, _) = pex(place, (x,y), x_off, y_off, radius)
+        for (x, y, proj, place, pl, radius, colour,
+                 x_off, y_off, udata) in layer.data:
+            (vp, _) = pex(pl, proj, radius)
             if vp:
                 (vx, vy) = vp
                 d = (vx - xclick)*(vx - xclick) + (vy - yclick)*(vy - yclick)
@@ -2362,17 +4470,18 @@ class pySlip(_BufferedCanvas):
         data = []
 
         # get correct pex function and box limits in view coords
-        pex = self.PexPointView
+        pex = self.pex_point_view
         (blx, bby) = ll
         (brx, bty) = ur
         if layer.map_rel:
-            pex = self.PexPoint
+            pex = self.pex_point
             (blx, bby) = self.Geo2View(ll)
             (brx, bty) = self.Geo2View(ur)
 
         # get points selection
-        for (x, y, place, radius, colour, x_off, y_off, udata) in layer.data:
-            (vp, _) = pex(place, (x,y), x_off, y_off, radius)
+        for (x, y, proj, place, pl, radius, colour,
+                 x_off, y_off, udata) in layer.data:
+            (vp, _) = pex(pl, proj, radius)
             if vp:
                 (vpx, vpy) = vp
                 if blx <= vpx <= brx and bby >= vpy >= bty:
@@ -2408,16 +4517,16 @@ class pySlip(_BufferedCanvas):
 
         # get correct pex function and click point into view coords
         clickpt = point
-        pex = self.PexExtentView
+        pex = self.pex_extent_view
         if layer.map_rel:
             clickpt = self.Geo2View(point)
-            pex = self.PexExtent
+            pex = self.pex_extent
         (xclick, yclick) = clickpt
 
         # select image
-        for (x, y, bmp, w, h, place,
+        for (x, y, proj, bmp, w, h, place, pl,
                 x_off, y_off, radius, colour, udata) in layer.data:
-            (_, e) = pex(place, (x,y), x_off, y_off, w, h)
+            (_, e) = pex(pl, proj, w, h)
             if e:
                 (lx, rx, ty, by) = e
                 if lx <= xclick <= rx and ty <= yclick <= by:
@@ -2447,9 +4556,9 @@ class pySlip(_BufferedCanvas):
         """
 
         # get correct pex function and box limits in view coords
-        pex = self.PexExtentView
+        pex = self.pex_extent_view
         if layer.map_rel:
-            pex = self.PexExtent
+            pex = self.pex_extent
             ll = self.Geo2View(ll)
             ur = self.Geo2View(ur)
         (vboxlx, vboxby) = ll
@@ -2458,9 +4567,9 @@ class pySlip(_BufferedCanvas):
         # select images in map/view
         selection = []
         data = []
-        for (x, y, bmp, w, h, place,
+        for (x, y, proj, bmp, w, h, place, pl,
                 x_off, y_off, radius, colour, udata) in layer.data:
-            (_, e) = pex(place, (x,y), x_off, y_off, w, h)
+            (_, e) = pex(pl, proj, w, h)
             if e:
                 (li, ri, ti, bi) = e    # image extents (view coords)
                 if (vboxlx <= li and ri <= vboxrx
@@ -2494,17 +4603,17 @@ class pySlip(_BufferedCanvas):
         dist = 9999999.0
 
         # get correct pex function and mouse click in view coords
-        pex = self.PexPointView
+        pex = self.pex_point_view
         clickpt = point
         if layer.map_rel:
-            pex = self.PexPoint
+            pex = self.pex_point
             clickpt = self.Geo2View(point)
         (xclick, yclick) = clickpt
 
-        # select text in map/view layer
-        for (x, y, text, place, radius, colour,
-                 tcolour, fname, fsize, x_off, y_off, data) in layer.data:
-            (vp, ex) = pex(place, (x,y), 0, 0, radius)
+        # select text in map/view layer, on the unoffset point
+        for (x, y, proj, text, place, (ax, ay, _, _), radius, colour,
+                 tcolour, fname, fsize, x_off, y_off, _, data) in layer.data:
+            (vp, ex) = pex((ax, ay, 0, 0), proj, radius)
             if vp:
                 (px, py) = vp
                 d = (px - xclick)**2 + (py - yclick)**2
@@ -2547,18 +4656,18 @@ class pySlip(_BufferedCanvas):
         data = []
 
         # get correct pex function and box limits in view coords
-        pex = self.PexPointView
+        pex = self.pex_point_view
         if layer.map_rel:
-            pex = self.PexPoint
+            pex = self.pex_point
             ll = self.Geo2View(ll)
             ur = self.Geo2View(ur)
         (lx, by) = ll
         (rx, ty) = ur
 
         # get texts inside box
-        for (x, y, text, place, radius, colour,
-                tcolour, fname, fsize, x_off, y_off, udata) in layer.data:
-            (vp, ex) = pex(place, (x,y), x_off, y_off, radius)
+        for (x, y, proj, text, place, pl, radius, colour,
+                tcolour, fname, fsize, x_off, y_off, _, udata) in layer.data:
+            (vp, ex) = pex(pl, proj, radius)
             if vp:
                 (px, py) = vp
                 if lx <= px <= rx and ty <= py <= by:
@@ -2589,18 +4698,24 @@ class pySlip(_BufferedCanvas):
 
         result = None
 
-        # get correct 'point in polygon' routine
-        pip = self.point_in_polygon_view
-        if layer.map_rel:
-            pip = self.point_in_polygon_geo
+        # get click point in view coords
+        map_rel = layer.map_rel
+        (xclick, yclick) = point
+        if map_rel:
+            (xclick, yclick) = self.Geo2View(point)
 
         # check polyons in layer, choose first point is inside
-        for (poly, place, width, colour, close,
+        # the click is moved into the space of the packed polygon
+        for (poly, coords, extent, place, pl, width, colour, close,
                  filled, fcolour, x_off, y_off, udata) in layer.data:
-            if pip(poly, point, place, x_off, y_off):
-                sel = (poly, {'placement': place,
-                              'offset_x': x_off,
-                              'offset_y': y_off})
+            if extent is None:
+                continue
+            (sx, sy, dx, dy) = self.shape_transform(pl, map_rel)
+            if self.point_inside_shape((xclick - dx) / sx, (yclick - dy) / sy,
+                                       coords, extent):
+                sel = (self.unpack_points(poly), {'placement': place,
+                                                  'offset_x': x_off,
+                                                  'offset_y': y_off})
                 result = ([sel], udata, None)
                 break
 
@@ -2621,25 +4736,24 @@ class pySlip(_BufferedCanvas):
         selection = []
         data = []
 
-        # get correct pex function and box limits in view coords
-        pex = self.PexPolygonView
-        if layer.map_rel:
-            pex = self.PexPolygon
+        # get box limits in view coords
+        map_rel = layer.map_rel
+        if map_rel:
             p1 = self.Geo2View(p1)
             p2 = self.Geo2View(p2)
         (lx, by) = p1
         (rx, ty) = p2
 
         # check polygons in layer
-        for (poly, place, width, colour, close,
+        for (poly, coords, extent, place, pl, width, colour, close,
                 filled, fcolour, x_off, y_off, udata) in layer.data:
-            (pt, ex) = pex(place, poly, x_off, y_off)
+            ex = self.shape_extent(extent, *self.shape_transform(pl, map_rel))
             if ex:
                 (plx, prx, pty, pby) = ex
                 if lx <= plx and prx <= rx and ty <= pty and pby <= by:
-                    sel = (poly, {'placement': place,
-                                  'offset_x': x_off,
-                                  'offset_y': y_off})
+                    sel = (self.unpack_points(poly), {'placement': place,
+                                                      'offset_x': x_off,
+                                                      'offset_y': y_off})
                     selection.append(sel)
                     data.append(udata)
 
@@ -2662,15 +4776,21 @@ class pySlip(_BufferedCanvas):
         result = None
         delta = layer.delta
 
-        # get correct 'point in polyline' routine
-        pip = self.point_near_polyline_view
-        if layer.map_rel:
-            pip = self.point_near_polyline_geo
+        # get click point in view coords
+        map_rel = layer.map_rel
+        click = point
+        if map_rel:
+            click = self.Geo2View(point)
 
         # check polyons in layer, choose first where point is close enough
-        for (polyline, place, width, colour, x_off, y_off, udata) in layer.data:
-            seg = pip(point, polyline, place, x_off, y_off, delta=delta)
-            if seg:
+        for (polyline, coords, extent, place, pl, width, colour,
+                 x_off, y_off, udata) in layer.data:
+            i = self.point_near_shape(click, coords, extent,
+                                      self.shape_transform(pl, map_rel),
+                                      delta)
+            if i is not None:
+                polyline = self.unpack_points(polyline)
+                seg = (polyline[i], polyline[i+1])
                 sel = (polyline, {'placement': place,
                                   'offset_x': x_off,
                                   'offset_y': y_off})
@@ -2694,26 +4814,24 @@ class pySlip(_BufferedCanvas):
         selection = []
         data = []
 
-        # get correct pex function and box limits in view coords
-        #pex = self.PexPolylineView
-        pex = self.PexPolygonView
-        if layer.map_rel:
-            #pex = self.PexPolyline
-            pex = self.PexPolygon
+        # get box limits in view coords
+        map_rel = layer.map_rel
+        if map_rel:
             p1 = self.Geo2View(p1)
             p2 = self.Geo2View(p2)
         (lx, by) = p1
         (rx, ty) = p2
 
-        # check polygons in layer
-        for (poly, place, width, colour, x_off, y_off, udata) in layer.data:
-            (pt, ex) = pex(place, poly, x_off, y_off)
+        # check polylines in layer
+        for (poly, coords, extent, place, pl, width, colour,
+                 x_off, y_off, udata) in layer.data:
+            ex = self.shape_extent(extent, *self.shape_transform(pl, map_rel))
             if ex:
                 (plx, prx, pty, pby) = ex
                 if lx <= plx and prx <= rx and ty <= pty and pby <= by:
-                    sel = (poly, {'placement': place,
-                                  'offset_x': x_off,
-                                  'offset_y': y_off})
+                    sel = (self.unpack_points(poly), {'placement': place,
+                                                      'offset_x': x_off,
+                                                      'offset_y': y_off})
                     selection.append(sel)
                     data.append(udata)
 
@@ -2747,7 +4865,7 @@ class pySlip(_BufferedCanvas):
         self.ResizeCallback()
 
         # redraw the map
-        self.Update()
+        self.Invalidate()
 
     def ZoomOut(self, gposn):
         """Zoom map out to the previous level.
@@ -2764,7 +4882,7 @@ class pySlip(_BufferedCanvas):
         self.ResizeCallback()
 
         # redraw the map
-        self.Update()
+        self.Invalidate()
 
 ######
 # Routines for pySlip events
@@ -2945,21 +5063,17 @@ class pySlip(_BufferedCanvas):
         May return True or False if point on edge of polygon.
 
         Slightly modified version of the 'published' algorithm found on the 'net.
-        Instead of indexing into the poly, create a new poly that 'wraps around'.
-        Even with the extra code, it runs in 2/3 the time.
+        The first edge checked runs from the last point to the first, so the
+        polygon wraps around without making a copy of it.
         """
 
         (x, y) = point
 
-        # we want a *copy* of original iterable plus extra wraparound point
-        l_poly = list(poly)
-        l_poly.append(l_poly[0])  # ensure poly wraps around
-
         inside = False
 
-        (p1x, p1y) = l_poly[0]
+        (p1x, p1y) = poly[-1]
 
-        for (p2x, p2y) in l_poly:
+        for (p2x, p2y) in poly:
             if y > min(p1y, p2y):
                 if y <= max(p1y, p2y):
                     if x <= max(p1x, p2x):
@@ -2971,101 +5085,100 @@ class pySlip(_BufferedCanvas):
 
         return inside
 
-    def point_in_polygon_geo(self, poly, geo, placement, offset_x, offset_y):
-        """Decide if a point is inside a map-relative polygon.
-
-        poly       an iterable of (x,y) where x,y are in geo coordinates
-        geo        tuple (xgeo, ygeo) of point position
-        placement  a placement string
-        offset_x   X offset in pixels
-        offset_y   Y offset in pixels
+    @staticmethod
+    def point_inside_shape(x, y, coords, extent):
+        """Decide if point is inside a packed polygon.
 
-        The 'geo' point, while in geo coordinates, must be a click point
-        within the view.
+        x, y    the point, in the same coordinates as the polygon
+        coords  the packed polygon points, see pack_shape()
+        extent  the polygon extent
 
-        Returns True if point is inside the polygon.
+        Returns True if point is properly inside polygon, as for
+        point_inside_polygon().
         """
 
-        return self.point_inside_polygon(geo, poly)
-
-    def point_in_polygon_view(self, poly, view, place, x_off, y_off):
-        """Decide if a point is inside a view-relative polygon.
+        (lx, rx, ty, by) = extent
+        if x < lx or x > rx or y < ty or y > by:
+            return False
 
-        poly      an iterable of (x,y) where x,y are in view (pixel) coordinates
-        ptx       point X coordinate (view)
-        pty       point Y coordinate (view)
-        place     a placement string
-        offset_x  X offset in pixels
-        offset_y  Y offset in pixels
+        inside = False
 
-        Returns True if point is inside the polygon.
-        """
+        num = len(coords)
+        p1x = coords[num-2]
+        p1y = coords[num-1]
 
-        # convert polygon and placement into list of (x,y) tuples
-        view_poly = []
-        for (x, y) in poly:
-            (x, y) = self.point_placement(place, x, y, x_off, y_off,
-                                          self.view_width, self.view_height)
-            view_poly.append((x, y))
+        for i in range(0, num, 2):
+            p2x = coords[i]
+            p2y = coords[i+1]
+            if y > min(p1y, p2y):
+                if y <= max(p1y, p2y):
+                    if x <= max(p1x, p2x):
+                        if p1y != p2y:
+                            xinters = (y-p1y)*(p2x-p1x)/(p2y-p1y) + p1x
+                        if p1x == p2x or x <= xinters:
+                            inside = not inside
+            p1x = p2x
+            p1y = p2y
 
-        # decide if (ptx,pty) is inside polygon
-        return self.point_inside_polygon(view, view_poly)
+        return inside
 
-    def point_near_polyline_geo(self, point, poly, placement,
-                                offset_x, offset_y, delta):
-        """Decide if a point is near a map-relative polyline.
+    def point_near_shape(self, point, coords, extent, transform, delta):
+        """Decide if a point is near a packed polyline.
 
-        point      tuple (xgeo, ygeo) of point position
-        poly       an iterable of (x,y) where x,y are in geo coordinates
-        placement  a placement string
-        offset_x   X offset in pixels
-        offset_y   Y offset in pixels
+        point      tuple (xview, yview) of the point in view coordinates
+        coords     the packed polyline points, see pack_shape()
+        extent     the polyline extent
+        transform  tuple (sx, sy, dx, dy) from polyline to view coordinates,
+                   see shape_transform()
         delta      distance (squared) before selection allowed
 
-        The 'geo' point, while in geo coordinates, must be a click point
-        within the view.
-
-        Returns nearest line segment of polyline that is 'close enough'
-        to the point.  Returns None if no segment close enough.
+        Returns the index of the first point of the nearest segment of the
+        polyline that is 'close enough' to the point.  Returns None if no
+        segment is close enough.
         """
 
-        return self.point_near_polyline(point, poly, delta=delta)
+        if extent is None:
+            return None
 
-    def point_near_polyline_view(self, point, polyline, place,
-                                 x_off, y_off, delta):
-        """Decide if a point is near a view-relative polyline.
+        (ptx, pty) = point
+        (sx, sy, dx, dy) = transform
 
-        point     a tuple (viewx, viewy) of selection point in view coordinates
-        polyline  an iterable of (x,y) where x,y are in view (pixel) coordinates
-        place     a placement string
-        offset_x  X offset in pixels
-        offset_y  Y offset in pixels
-        delta     distance (squared) before selection allowed
+        # no segment is close if the point is too far from the extent
+        reach = math.sqrt(delta)
+        (lx, rx, ty, by) = extent
+        if (ptx < lx*sx + dx - reach or ptx > rx*sx + dx + reach
+                or pty < ty*sy + dy - reach or pty > by*sy + dy + reach):
+            return None
 
-        Returns nearest line segment of polyline that is 'close enough'
-        to the point.  Returns None if no segment close enough.
-        """
+        result = None
+        last_delta = delta + 1
 
-        # dict to convert selected segment back to orig coords
-        back_to_orig = {}
+        s1x = coords[0]*sx + dx
+        s1y = coords[1]*sy + dy
+        for i in range(2, len(coords), 2):
+            s2x = coords[i]*sx + dx
+            s2y = coords[i+1]*sy + dy
+
+            # distance squared from point to segment, see point_segment_distance()
+            px = s2x - s1x
+            py = s2y - s1y
+            u = ((ptx - s1x)*px + (pty - s1y)*py) / float(px**2 + py**2)
+            if u > 1:
+                u = 1
+            elif u < 0:
+                u = 0
+            d = (s1x + u*px - ptx)**2 + (s1y + u*py - pty)**2
 
-        # convert polyline and placement into list of (x,y) tuples
-        view_poly = []
-        for (x, y) in polyline:
-            (vx, vy) = self.point_placement(place, x, y, x_off, y_off,
-                                            self.view_width, self.view_height)
-            view_poly.append((vx, vy))
-            back_to_orig[(vx, vy)] = (x, y)
+            if d < last_delta:
+                result = i//2 - 1
+                last_delta = d
+            s1x = s2x
+            s1y = s2y
 
-        # decide if (ptx,pty) is inside polyline (gets nearest segment)
-        seg = self.point_near_polyline(point, view_poly, delta=delta)
+        if last_delta > delta:
+            result = None
 
-        if seg:
-            (s1, s2) = seg
-            s1 = back_to_orig[s1]
-            s2 = back_to_orig[s2]
-            return (s1, s2)
-        return None
+        return result
 
     def point_near_polyline(self, point, polyline, delta=50):
         """Decide if point is within 'delta' of the given polyline.
@@ -3122,36 +5235,6 @@ class pySlip(_BufferedCanvas):
 
         return dx**2 + dy**2
 
-    def ViewExtent(self, place, view, w, h, x_off, y_off, dcw=0, dch=0):
-        """Get view extent of area.
-
-        place         placement string ('cc', 'se', etc)
-        view          tuple (xview,yview) of view coordinates of object point
-        w, h          area width and height (pixels)
-        x_off, y_off  x and y offset (pixels)
-
-        Return the view extent of the area: (left, right, top, bottom)
-        where:
-            left    pixel coords of left side of area
-            right   pixel coords of right side of area
-            top     pixel coords of top of area
-            bottom  pixel coords of bottom of area
-
-        Return a tuple (left, right, top, bottom) of the view coordinates of
-        the extent rectangle.
-        """
-
-        # top left corner
-        (x, y) = view
-        (left, top) = self.extent_placement(place, x, y, x_off, y_off,
-                                            w, h, dcw, dch)
-
-        # bottom right corner
-        right = left + w
-        bottom = top + h
-
-        return (left, right, top, bottom)
-
     def PositionIsOnMap(self, posn):
         """Return True if 'posn' is actually on map (not just view).
 
@@ -3177,26 +5260,6 @@ class pySlip(_BufferedCanvas):
 
         return True
 
-    def get_i18n_kw(self, kwargs, kws, default):
-        """Get alternate international keyword value.
-
-        kwargs   dictionary to look for keyword value
-        kws      iterable of keyword spelling strings
-        default  default value if no keyword found
-
-        Returns the keyword value.
-        """
-
-        result = None
-        for kw_str in kws[:-1]:
-            result = kwargs.get(kw_str, None)
-            if result:
-                break
-        else:
-            result = kwargs.get(kws[-1], default)
-
-        return result
-
 # already have this?
 #    def get_level_and_position(self, place='cc'):
 #        """Get the level and geo position of a cardinal point within the view.
@@ -3330,67 +5393,3 @@ class pySlip(_BufferedCanvas):
                 tr_corner_vy = self.sbox_1_y + self.sbox_h
 
         return (ll_corner_vx, ll_corner_vy, tr_corner_vx, tr_corner_vy)
-
-######
-# Placement routines instead of original 'exec' code.
-# Code in test_assumptions.py shows this is faster.
-######
-
-    @staticmethod
-    def point_placement(place, x, y, x_off, y_off, dcw=0, dch=0):
-        """Perform map- or view-relative placement for a single point.
-
-        place         placement key string
-        x, y          point relative to placement origin
-        x_off, y_off  offset from point
-        dcw, dch      width, height of the view draw context (0 if map-rel)
-
-        Returns a tuple (x, y) in view coordinates.
-        """
-
-        dcw2 = dcw/2
-        dch2 = dch/2
-
-        if   place == 'cc': x+=dcw2;       y+=dch2
-        elif place == 'nw': x+=x_off;      y+=y_off
-        elif place == 'cn': x+=dcw2;       y+=y_off
-        elif place == 'ne': x+=dcw-x_off;  y+=y_off
-        elif place == 'ce': x+=dcw-x_off;  y+=dch2
-        elif place == 'se': x+=dcw-x_off;  y+=dch-y_off
-        elif place == 'cs': x+=dcw2;       y+=dch-y_off
-        elif place == 'sw': x+=x_off;      y+=dch-y_off
-        elif place == 'cw': x+=x_off;      y+=dch2
-
-        return (x, y)
-
-    @staticmethod
-    def extent_placement(place, x, y, x_off, y_off, w, h, dcw=0, dch=0):
-        """Perform map- and view-relative placement for an extent object.
-
-        place         placement key string
-        x, y          point relative to placement origin
-        x_off, y_off  offset from point
-        w, h          width, height of the image
-        dcw, dcw      width/height of the view draw context
-
-        Returns a tuple (x, y).
-        """
-
-        w2 = w/2
-        h2 = h/2
-
-        dcw2 = dcw/2
-        dch2 = dch/2
-
-        if place == 'cc':   x+=dcw2-w2;       y+=dch2-h2
-        elif place == 'nw': x+=x_off;         y+=y_off
-        elif place == 'cn': x+=dcw2-w2;       y+=y_off
-        elif place == 'ne': x+=dcw-w-x_off;   y+=y_off
-        elif place == 'ce': x+=dcw-w-x_off;   y+=dch2-h2
-        elif place == 'se': x+=dcw-w-x_off;   y+=dch-h-y_off
-        elif place == 'cs': x+=dcw2-w2;       y+=dch-h-y_off
-        elif place == 'sw': x+=x_off;         y+=dch-h-y_off
-        elif place == 'cw': x+=x_off;         y+=dch2-h2
-
-        return (x, y)
-
@@ -0,0 +1,218 @@
+"""
+An off-screen renderer for pySlip maps.
+
+StaticMap draws tiles and layers exactly as the pySlip widget does, but into
+a memory bitmap rather than a window.  Use it to produce map images in batch
+or from a script:
+
+    app = wx.App(False)     # a wx.App must exist, no window is needed
+    tile_src = tiles.Tiles()
+    smap = StaticMap(tile_src, level=4, centre=(145.0, -37.8), size=(800, 600))
+    smap.AddPointLayer(points, colour='red')
+    smap.RenderToFile('melbourne.png')
+
+The tile source object is given a new tile callback, so don't share a tile
+source object between a StaticMap and a live pySlip widget.
+"""
+
+import time
+import wx
+from pyslip.pyslip import _MapRenderer
+import pyslip.log as log
+
+try:
+    log = log.Log('pyslip.log')
+except AttributeError:
+    # means log already set up
+    pass
+
+
+###############################################################################
+# The off-screen renderer
+###############################################################################
+
+class StaticMap(_MapRenderer):
+    """Render a map view with layers into a bitmap, no window required."""
+
+    # default number of seconds we wait for tiles to arrive
+    DefaultTimeout = 30.0
+
+    # seconds between checks for newly arrived tiles
+    PollInterval = 0.01
+
+    def __init__(self, tile_src, level, centre, size):
+        """Initialise a StaticMap instance.
+
+        tile_src  the Tiles source object
+        level     the tile level to render
+        centre    a tuple (xgeo, ygeo) of the view centre
+        size      a tuple (width, height) of the image size in pixels
+
+        Raises ValueError if the tile source doesn't have the level.
+        """
+
+        _MapRenderer.__init__(self, tile_src, size)
+
+        self.bitmap = None                  # reused between renders
+        self.centre = None                  # geo position of view centre
+        self.complete = False               # True if last render had all tiles
+        self.tile_src.setCallback(self.OnTileAvailable)
+
+        if not self.GotoLevelAndPosition(level, centre):
+            msg = "Tile source doesn't have level %s" % str(level)
+            raise ValueError(msg)
+
+    def Invalidate(self, rect=None):
+        """Mark the view, or part of it, as needing a redraw.
+
+        rect  a tuple (x, y, w, h) of the view area to redraw, None means all
+
+        Nothing is drawn until Render() is called, so this does nothing.
+        """
+
+        pass
+
+    def OnTileAvailable(self, level, x, y, img, bmp):
+        """Callback routine: tile level/x/y is available.
+
+        The new tile is already in the tile source cache and Render() polls
+        the tile source, so there's nothing to do.
+        """
+
+        pass
+
+    def GotoLevel(self, level):
+        """Use a new tile level.
+
+        level  the new tile level to use.
+
+        Returns True if all went well.
+        """
+
+        if not self.tile_src.UseLevel(level):
+            return False        # couldn't change level
+
+        self.level = level
+        self.map_width = self.tile_src.num_tiles_x * self.tile_width
+        self.map_height = self.tile_src.num_tiles_y * self.tile_height
+        (self.map_llon, self.map_rlon,
+         self.map_blat, self.map_tlat) = self.tile_src.extent
+        self.set_projection()
+
+        return True
+
+    def GotoPosition(self, geo):
+        """Set view to centre on a geo position in the current level.
+
+        geo  a tuple (xgeo,ygeo) to centre view on
+        """
+
+        self.centre = geo
+        self.centre_view(geo)
+
+    def GotoLevelAndPosition(self, level, geo):
+        """Goto a map level and set view to centre on a position.
+
+        level  the map level to use
+        geo    a tuple (xgeo,ygeo) to centre view on
+
+        Returns True if all went well.
+        """
+
+        if not self.GotoLevel(level):
+            return False
+
+        self.GotoPosition(geo)
+        return True
+
+    def SetSize(self, size):
+        """Change the size of the rendered image.
+
+        size  a tuple (width, height) of the image size in pixels
+
+        The view stays centred on the same geo position.
+        """
+
+        (self.view_width, self.view_height) = size
+        self.GotoPosition(self.centre)
+
+    def fetch_tiles(self, timeout):
+        """Wait until all tiles in the view are available.
+
+        timeout  maximum number of seconds to wait
+
+        Returns True if all tiles arrived, False on timeout.
+
+        Local tile sources always have tiles available.  For internet tile
+        sources we request all view tiles up front and then process wx events
+        until no tile is the 'pending' tile.
+        """
+
+        pending = getattr(self.tile_src, 'pending_tile', None)
+        if pending is None:
+            return True
+
+        (_, _, col_list, row_list) = self.view_tiles()
+        waiting = [(x, y) for x in col_list for y in row_list]
+
+        app = wx.GetApp()
+        deadline = time.time() + timeout
+        while True:
+            waiting = [(x, y) for (x, y) in waiting
+                           if self.tile_src.GetTile(x, y) is pending]
+            if not waiting:
+                return True
+
+            if time.time() >= deadline:
+                log.warn('StaticMap: %d tiles not available after %.1fs'
+                         % (len(waiting), timeout))
+                return False
+
+            # let tile worker callbacks run, then wait a little
+            if app:
+                app.ProcessPendingEvents()
+            time.sleep(self.PollInterval)
+
+    def Render(self, timeout=None):
+        """Render the view into a bitmap.
+
+        timeout  seconds to wait for tiles (default is DefaultTimeout)
+
+        Returns the wx.Bitmap holding the image.  The bitmap is reused by the
+        next call to Render(), so copy it if you need to keep it.  Sets
+        self.complete to False if some tiles didn't arrive in time.
+        """
+
+        if timeout is None:
+            timeout = self.DefaultTimeout
+
+        self.complete = self.fetch_tiles(timeout)
+
+        # reuse the bitmap if the size hasn't changed
+        if (self.bitmap is None
+                or self.bitmap.GetWidth() != self.view_width
+                or self.bitmap.GetHeight() != self.view_height):
+            self.bitmap = wx.Bitmap(self.view_width, self.view_height)
+
+        dc = wx.MemoryDC(self.bitmap)
+        dc.SetBackground(wx.Brush(self.BackgroundColour))
+        dc.Clear()
+        self.draw_tiles(dc)
+        self.draw_layers(dc)
+        dc.SelectObject(wx.NullBitmap)
+
+        return self.bitmap
+
+    def RenderToFile(self, filename, filetype=wx.BITMAP_TYPE_PNG,
+                     timeout=None):
+        """Render the view and save it to a file.
+
+        filename  path to the file to write
+        filetype  the wx bitmap type of the file (default PNG)
+        timeout   seconds to wait for tiles (default is DefaultTimeout)
+
+        Returns True if the file was written.
+        """
+
+        bitmap = self.Render(timeout)
+        return bitmap.SaveFile(filename, filetype)
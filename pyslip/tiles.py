@@ -8,6 +8,11 @@ For example, see gmt_local.py (local tiles) and open_street_map.py
 
 import os
 import math
+import time
+import json
+import atexit
+import threading
+import collections
 import wx
 import pyslip.pycacheback as pycacheback
 import pyslip.log as log
@@ -25,6 +30,127 @@ except AttributeError:
 RefreshTilesAfterDays = 60
 
 
+################################################################################
+# Define a bounded cache of keys known to be missing, entries expire.
+################################################################################
+
+class NegativeCache(object):
+    """A bounded set of keys for failed lookups, each key has a lifetime.
+
+    A key added to the cache is 'in' the cache until 'ttl' seconds have
+    passed.  If more than 'max_size' keys are added the oldest are dropped.
+    """
+
+    # default maximum number of keys held
+    DefaultMaxSize = 10000
+
+    # default lifetime of a key in seconds
+    DefaultTTL = 300
+
+    def __init__(self, max_size=DefaultMaxSize, ttl=DefaultTTL):
+        """Initialise the negative cache.
+
+        max_size  maximum number of keys held
+        ttl       lifetime of each key in seconds
+        """
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self._expires = collections.OrderedDict()   # key -> expiry time
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            try:
+                expiry = self._expires[key]
+            except KeyError:
+                return False
+            if expiry < time.monotonic():
+                del self._expires[key]
+                return False
+            return True
+
+    def __len__(self):
+        """Return the number of live keys, expired keys are dropped.
+
+        Keys may have different lifetimes, so all keys are checked.
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            expired = [key for (key, expiry) in self._expires.items()
+                       if expiry < now]
+            for key in expired:
+                del self._expires[key]
+            return len(self._expires)
+
+    def add(self, key, ttl=None):
+        """Add 'key' to the cache, (re)starting its lifetime.
+
+        key  the key to add
+        ttl  lifetime of this key in seconds, if not the cache default
+        """
+
+        if ttl is None:
+            ttl = self.ttl
+
+        with self._lock:
+            self._expires.pop(key, None)
+            self._expires[key] = time.monotonic() + ttl
+            while len(self._expires) > self.max_size:
+                self._expires.popitem(last=False)
+
+    def discard(self, key):
+        """Remove 'key' from the cache, if it's there."""
+
+        with self._lock:
+            self._expires.pop(key, None)
+
+    def clear(self):
+        """Remove all keys from the cache."""
+
+        with self._lock:
+            self._expires.clear()
+
+################################################################################
+# A thread that keeps the on-disk tile cache under its size quota.
+################################################################################
+
+class DiskSweeper(threading.Thread):
+    """Thread that evicts tiles from a Cache on-disk store when over quota.
+
+    The sweeper scans the on-disk cache once at startup, then sweeps every
+    'interval' seconds or when woken by the cache, until stopped.
+    """
+
+    def __init__(self, cache, interval):
+        """Prepare the sweeper.
+
+        cache     the Cache object to keep under quota
+        interval  seconds between sweeps
+        """
+
+        threading.Thread.__init__(self)
+
+        self.cache = cache
+        self.interval = interval
+        self.wakeup = threading.Event()
+        self.stopped = False
+        self.daemon = True
+
+    def stop(self):
+        """Stop the sweeper after any sweep in progress."""
+
+        self.stopped = True
+        self.wakeup.set()
+
+    def run(self):
+        self.cache._scan_disk()
+        while not self.stopped:
+            self.cache._sweep_disk()
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+
 ################################################################################
 # Define a cache for tiles.  This is an in-memory cache backed to disk.
 ################################################################################
@@ -34,17 +160,385 @@ class Cache(pycacheback.pyCacheBack):
 
     Instance variables we use from pyCacheBack:
         self._tiles_dir  path to the on-disk cache directory
+
+    We keep an in-memory index of the tiles on-disk and their dates so we
+    don't need to stat() a tile file to see if it's there, or how old it is.
+    The index is filled one tile column directory at a time as needed and
+    is updated when a tile is saved.  The index may be saved between runs.
+
+    The on-disk store may have a size quota.  A background DiskSweeper thread
+    evicts least recently used (or oldest) tiles to keep usage under quota.
+
+    Tiles and the index are written to a temporary file which is then renamed,
+    so a reader never sees a partly written file.  If the tiles directory is
+    shared with other processes, set 'shared_disk' so tiles another process
+    saved are found even though our index doesn't know about them.
     """
 
     PicExtension = 'png'
     TilePath = '{Z}/{X}/{Y}.%s' % PicExtension
     TileDiskFormat = wx.BITMAP_TYPE_PNG
 
+    # limits for the cache of tiles known to be missing on-disk
+    MaxNegative = 10000
+    NegativeTTL = 60
+
+    # name of the file the on-disk index is saved to, in the tiles directory
+    # the index is JSON, as the directory may be shared with other users
+    IndexFilename = 'tile_index.json'
+
+    # on-disk eviction policies
+    EvictLRU = 'lru'            # evict least recently used tiles first
+    EvictAge = 'age'            # evict oldest tiles first
+
+    # seconds between disk quota sweeps
+    DiskSweepInterval = 60
+
+    # an over-quota sweep evicts until usage is below this fraction of quota
+    DiskLowWater = 0.9
+
+    def __init__(self, *args, **kwargs):
+        max_negative = kwargs.pop('max_negative', self.MaxNegative)
+        negative_ttl = kwargs.pop('negative_ttl', self.NegativeTTL)
+        persist_index = kwargs.pop('persist_index', False)
+        disk_quota = kwargs.pop('disk_quota', None)
+        self._evict_policy = kwargs.pop('evict_policy', self.EvictLRU)
+        self._shared_disk = kwargs.pop('shared_disk', False)
+
+        # on-disk quota state, only used if a quota is set
+        # set before the base class calls reset_stats()
+        self._disk_lock = threading.Lock()
+        self._disk_sizes = {}           # key -> (size, date) for on-disk tiles
+        self._disk_used = {}            # key -> time tile was last used
+        self._disk_usage = 0            # bytes used by on-disk tiles
+        self._disk_evictions = 0        # number of tiles evicted
+        self._disk_evicted_bytes = 0    # bytes freed by eviction
+        self._disk_quota = None
+        self._sweeper = None
+
+        # on-disk lookup counters
+        self._disk_hits = 0
+        self._disk_misses = 0
+
+        super().__init__(*args, **kwargs)
+
+        # keys of tiles known to be missing on-disk, saves a stat() call
+        self._negative = NegativeCache(max_size=max_negative, ttl=negative_ttl)
+
+        # index of on-disk tiles, maps (level, x) -> {y: date}
+        # 'date' is None until we need it
+        # used from the GUI thread and tile worker threads, so we lock
+        # when adding a column or looking at the whole index
+        self._index_lock = threading.Lock()
+        self._index = {}
+        self._index_path = os.path.join(self._tiles_dir, self.IndexFilename)
+        self._persist_index = False
+        if persist_index:
+            self.load_index()
+            self.set_persist_index(True)
+
+        if disk_quota:
+            self.set_disk_quota(disk_quota)
+
+    def set_disk_quota(self, quota):
+        """Set the size quota for the on-disk cache.
+
+        quota  maximum bytes used by on-disk tiles (None means no limit)
+
+        Starts the background sweeper thread if required, or stops it if
+        there is no longer a quota.
+        """
+
+        self._disk_quota = quota
+        if quota:
+            if self._sweeper is None:
+                self._sweeper = DiskSweeper(self, self.DiskSweepInterval)
+                self._sweeper.start()
+            else:
+                self._sweeper.wakeup.set()
+        elif self._sweeper is not None:
+            self._sweeper.stop()
+            self._sweeper = None
+
+    def __getitem__(self, key):
+        """Get a tile, noting when it was last used if there's a disk quota.
+
+        Tiles found in memory are marked as used too, so the sweeper doesn't
+        evict the most displayed tiles first.
+        """
+
+        value = super().__getitem__(key)
+        if self._disk_quota and key in self._disk_sizes:
+            self._disk_used[key] = time.time()
+        return value
+
+    def set_persist_index(self, persist):
+        """Say if the on-disk index is saved between runs.
+
+        persist  True if the index is to be saved when the program exits
+        """
+
+        if persist and not self._persist_index:
+            atexit.register(self.save_index)
+        elif self._persist_index and not persist:
+            atexit.unregister(self.save_index)
+        self._persist_index = persist
+
+    def close(self):
+        """Finish with the cache.
+
+        Stops the sweeper thread and saves a persistent index now, so
+        nothing holds on to the cache until the program exits.
+        """
+
+        self.set_disk_quota(None)
+        if self._persist_index:
+            self.set_persist_index(False)
+            self.save_index()
+
+    def set_shared_disk(self, shared):
+        """Say if the on-disk cache is shared with other processes.
+
+        shared  True if other processes may save tiles to our directory
+
+        If shared, a tile missing from our index is looked for on-disk before
+        we decide it isn't there, and the negative cache isn't used.
+        """
+
+        self._shared_disk = shared
+        self._negative.clear()
+
+    def disk_stats(self):
+        """Return a dictionary of on-disk cache usage and eviction values.
+
+        Usage values are only maintained if a disk quota is set.
+        """
+
+        with self._disk_lock:
+            return {'quota': self._disk_quota,
+                    'usage': self._disk_usage,
+                    'tiles': len(self._disk_sizes),
+                    'evictions': self._disk_evictions,
+                    'evicted_bytes': self._disk_evicted_bytes}
+
+    def get_stats(self):
+        """Return a dictionary of cache statistics.
+
+        Adds these to the in-memory statistics:
+            disk_hits            number of tiles read from disk
+            disk_misses          number of tiles not found on disk
+            negative_size        number of keys in the negative cache
+            disk_evictions       number of on-disk tiles evicted by quota
+            disk_evicted_bytes   bytes freed by on-disk evictions
+            disk_usage           bytes used by on-disk tiles (if quota set)
+        """
+
+        stats = super().get_stats()
+        stats.update({'disk_hits': self._disk_hits,
+                      'disk_misses': self._disk_misses,
+                      'negative_size': len(self._negative),
+                      'disk_evictions': self._disk_evictions,
+                      'disk_evicted_bytes': self._disk_evicted_bytes,
+                      'disk_usage': self._disk_usage})
+        return stats
+
+    def reset_stats(self):
+        """Zero the statistics counters."""
+
+        super().reset_stats()
+        self._disk_hits = 0
+        self._disk_misses = 0
+        with self._disk_lock:
+            self._disk_evictions = 0
+            self._disk_evicted_bytes = 0
+
+    def _scan_disk(self):
+        """Find the size and date of all tiles in the on-disk cache.
+
+        Runs in the sweeper thread.  Entries for tiles saved during the scan
+        are not overwritten.
+        """
+
+        suffix = '.' + self.PicExtension
+        found = {}
+        for (dirpath, _, filenames) in os.walk(self._tiles_dir):
+            rel_dir = os.path.relpath(dirpath, self._tiles_dir)
+            try:
+                (level, x) = [int(part) for part in rel_dir.split(os.sep)]
+            except ValueError:
+                # not a tile column directory
+                continue
+            for fname in filenames:
+                (name, ext) = os.path.splitext(fname)
+                if ext != suffix:
+                    continue
+                try:
+                    y = int(name)
+                    st = os.stat(os.path.join(dirpath, fname))
+                except (ValueError, OSError):
+                    continue
+                found[(level, x, y)] = (st.st_size, st.st_mtime)
+
+        with self._disk_lock:
+            found.update(self._disk_sizes)
+            self._disk_sizes = found
+            self._disk_usage = sum(size for (size, _) in found.values())
+
+    def _sweep_disk(self):
+        """Evict on-disk tiles until usage is under quota.
+
+        Runs in the sweeper thread, only holds the lock briefly.
+        """
+
+        quota = self._disk_quota
+        if not quota or self._disk_usage <= quota:
+            return
+
+        # order tiles, first to be evicted first
+        with self._disk_lock:
+            if self._evict_policy == self.EvictAge:
+                candidates = [(date, key)
+                              for (key, (_, date)) in self._disk_sizes.items()]
+            else:
+                used = self._disk_used
+                candidates = [(used.get(key, date), key)
+                              for (key, (_, date)) in self._disk_sizes.items()]
+        candidates.sort()
+
+        target = quota * self.DiskLowWater
+        for (_, key) in candidates:
+            if self._disk_usage <= target:
+                break
+            try:
+                os.remove(self.tile_path(key))
+            except OSError:
+                pass
+
+            (level, x, y) = key
+            with self._index_lock:
+                column = self._index.get((level, x), None)
+            if column is not None:
+                column.pop(y, None)
+
+            with self._disk_lock:
+                (size, _) = self._disk_sizes.pop(key, (0, None))
+                self._disk_used.pop(key, None)
+                self._disk_usage -= size
+                self._disk_evictions += 1
+                self._disk_evicted_bytes += size
+
+        log('Disk cache %s: usage=%d bytes, evictions=%d'
+                % (self._tiles_dir, self._disk_usage, self._disk_evictions))
+
     def tile_date(self, key):
-        """Return the creation date of a tile given its key."""
+        """Return the creation date of a tile given its key.
+
+        Returns None if the tile isn't on-disk.
+        """
+
+        (level, x, y) = key
+        column = self._column_index(level, x)
+        try:
+            date = column[y]
+        except KeyError:
+            return None
+
+        if date is None:
+            try:
+                date = os.path.getctime(self.tile_path(key))
+            except OSError:
+                # tile removed behind our back
+                del column[y]
+                return None
+            column[y] = date
+
+        return date
+
+    def tile_on_disk(self, key):
+        """Return True if the tile with 'key' is in the on-disk cache."""
+
+        (level, x, y) = key
+        column = self._column_index(level, x)
+        if y in column:
+            return True
+
+        # another process may have saved the tile since we indexed the column
+        if self._shared_disk and os.path.isfile(self.tile_path(key)):
+            column[y] = None
+            return True
 
-        tile_path = self.tile_path(key)
-        return os.path.getctime(tile_path)
+        return False
+
+    def _column_index(self, level, x):
+        """Get the index dictionary for a column of tiles on-disk.
+
+        level  level of the tile column
+        x      X coordinate of the tile column
+
+        Returns a dictionary mapping Y coordinate to tile date (or None).
+        The column directory is scanned the first time it's needed.
+        """
+
+        with self._index_lock:
+            column = self._index.get((level, x), None)
+        if column is not None:
+            return column
+
+        # scan without the lock, another thread may add the column first
+        column = {}
+        col_dir = os.path.dirname(self.tile_path((level, x, 0)))
+        suffix = '.' + self.PicExtension
+        try:
+            with os.scandir(col_dir) as entries:
+                for entry in entries:
+                    (name, ext) = os.path.splitext(entry.name)
+                    if ext == suffix:
+                        try:
+                            column[int(name)] = None
+                        except ValueError:
+                            pass
+        except OSError:
+            # no column directory, so no tiles
+            pass
+
+        with self._index_lock:
+            return self._index.setdefault((level, x), column)
+
+    def load_index(self):
+        """Load a previously saved on-disk index, if any.
+
+        The index file holds a JSON list of [level, x, [[y, date], ...]]
+        for each indexed tile column, 'date' may be null.  A file that
+        doesn't look like that is ignored.
+        """
+
+        index = {}
+        try:
+            with open(self._index_path, 'r') as fd:
+                for (level, x, column) in json.load(fd):
+                    index[(int(level), int(x))] = {
+                        int(y): (None if date is None else float(date))
+                        for (y, date) in column}
+        except (OSError, ValueError, TypeError):
+            index = {}
+        with self._index_lock:
+            self._index = index
+
+    def save_index(self):
+        """Save the on-disk index so the next run can use it."""
+
+        with self._index_lock:
+            index = [[level, x, list(column.items())]
+                     for ((level, x), column) in self._index.items()]
+
+        tmp_path = '%s.%d.tmp' % (self._index_path, os.getpid())
+        try:
+            with open(tmp_path, 'w') as fd:
+                json.dump(index, fd)
+            os.replace(tmp_path, self._index_path)
+        except OSError as e:
+            log('%s exception saving tile index %s'
+                    % (type(e).__name__, self._index_path))
 
     def tile_path(self, key):
         """Return path to a tile file given its key."""
@@ -64,15 +558,33 @@ class Cache(pycacheback.pyCacheBack):
         Raises KeyError if tile not found.
         """
 
-        # look for item in disk cache
-        file_path = self.tile_path(key)
-        if not os.path.exists(file_path):
-            # tile not there, raise KeyError
+        # look for item in disk cache, unless we know it isn't there
+        if key in self._negative and not self._shared_disk:
+            self._disk_misses += 1
+            raise KeyError("Item with key '%s' not found in on-disk cache"
+                           % str(key))
+
+        if not self.tile_on_disk(key):
+            # tile not there, remember that and raise KeyError
+            if not self._shared_disk:
+                self._negative.add(key)
+            self._disk_misses += 1
             raise KeyError("Item with key '%s' not found in on-disk cache"
                            % str(key))
 
         # we have the tile file - read into memory & return
-        return wx.Image(file_path, Cache.TileDiskFormat).ConvertToBitmap()
+        file_path = self.tile_path(key)
+        image = wx.Image(file_path, Cache.TileDiskFormat)
+        if not image.IsOk():
+            # tile file removed or damaged behind our back
+            (level, x, y) = key
+            self._column_index(level, x).pop(y, None)
+            self._disk_misses += 1
+            raise KeyError("Item with key '%s' not readable in on-disk cache"
+                           % str(key))
+
+        self._disk_hits += 1
+        return image.ConvertToBitmap()
 
     def _put_to_back(self, key, image):
         """Put a image into on-disk cache.
@@ -94,7 +606,41 @@ class Cache(pycacheback.pyCacheBack):
             # we assume it's a "directory exists' error, which we ignore
             pass
 
-        image.SaveFile(tile_path, Cache.TileDiskFormat)
+        # write to a temporary file then rename, atomic for other readers
+        tmp_path = '%s.%d.%d.tmp' % (tile_path, os.getpid(),
+                                     threading.get_ident())
+        if not image.SaveFile(tmp_path, Cache.TileDiskFormat):
+            log('Error saving tile %s' % tile_path)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        try:
+            os.replace(tmp_path, tile_path)
+        except OSError as e:
+            log('%s exception saving tile %s' % (type(e).__name__, tile_path))
+            return
+        self._negative.discard(key)
+        now = time.time()
+        self._column_index(level, x)[y] = now
+
+        # account for new tile, wake the sweeper if over quota
+        quota = self._disk_quota
+        if quota:
+            try:
+                size = os.path.getsize(tile_path)
+            except OSError:
+                size = 0
+            with self._disk_lock:
+                (old_size, _) = self._disk_sizes.get(key, (0, None))
+                self._disk_sizes[key] = (size, now)
+                self._disk_used[key] = now
+                self._disk_usage += size - old_size
+                over_quota = self._disk_usage > quota
+            sweeper = self._sweeper
+            if over_quota and sweeper is not None:
+                sweeper.wakeup.set()
 
 ###############################################################################
 # Base class for a tile source - handles access to a source of tiles.
@@ -107,14 +653,18 @@ class BaseTiles(object):
     MaxLRU = 1000
 
     def __init__(self, levels, tile_width, tile_height,
-                       tiles_dir, max_lru=MaxLRU):
+                       tiles_dir, max_lru=MaxLRU, persist_index=False,
+                       disk_quota=None, cache=None):
         """Initialise a Tiles instance.
 
-        levels       a list of level numbers that are to be served
-        tile_width   width of each tile in pixels
-        tile_height  height of each tile in pixels
-        tiles_dir    path to on-disk tile cache directory
-        max_lru      maximum number of cached in-memory tiles
+        levels         a list of level numbers that are to be served
+        tile_width     width of each tile in pixels
+        tile_height    height of each tile in pixels
+        tiles_dir      path to on-disk tile cache directory
+        max_lru        maximum number of cached in-memory tiles
+        persist_index  if True, save the on-disk tile index between runs
+        disk_quota     maximum bytes used by on-disk tiles (None is no limit)
+        cache          an existing Cache object to use (eg, a shared cache)
         """
 
         # save params
@@ -129,12 +679,15 @@ class BaseTiles(object):
         self.max_level = max(self.levels)
         self.level = self.min_level
 
-# TODO: implement map wrap-around
-#        self.wrap_x = False
-#        self.wrap_y = False
+        # True if the map wraps around in the X direction
+        # tile X coordinates outside the map are taken modulo the map width
+        self.wrap_x = False
 
-        # setup the tile cache
-        self.cache = Cache(tiles_dir=tiles_dir, max_lru=max_lru)
+        # setup the tile cache, unless we were given one
+        if cache is None:
+            cache = Cache(tiles_dir=tiles_dir, max_lru=max_lru,
+                          persist_index=persist_index, disk_quota=disk_quota)
+        self.cache = cache
 
         #####
         # Now finish setting up
@@ -188,11 +741,9 @@ class BaseTiles(object):
         Tile coordinates are measured from map top-left.
         """
 
-#        # if we are wrapping X or Y, get wrapped tile coords
-#        if self.wrap_x:
-#            x = (x + self.num_tiles_x*self.tile_size_x) % self.num_tiles_x
-#        if self.wrap_y:
-#            y = (y + self.num_tiles_y*self.tile_size_y) % self.num_tiles_y
+        # if we are wrapping X, get wrapped tile coords
+        if self.wrap_x:
+            x %= self.num_tiles_x
 
         # retrieve the tile
         try:
@@ -232,6 +783,51 @@ class BaseTiles(object):
 
         return self.extent
 
+    def SetDiskQuota(self, quota):
+        """Set the size quota of the on-disk tile cache.
+
+        quota  maximum bytes used by on-disk tiles (None means no limit)
+
+        Least recently used tiles are evicted in the background when the
+        on-disk cache is over quota.
+        """
+
+        self.cache.set_disk_quota(quota)
+
+    def GetDiskStats(self):
+        """Get on-disk tile cache usage.
+
+        Returns a dictionary with keys:
+            quota          the disk quota in bytes (None if no limit)
+            usage          bytes used by on-disk tiles
+            tiles          number of on-disk tiles
+            evictions      number of tiles evicted
+            evicted_bytes  bytes freed by evicting tiles
+        """
+
+        return self.cache.disk_stats()
+
+    def GetStats(self, reset=False):
+        """Get a snapshot of the tile source statistics.
+
+        reset  if True, zero the counters after taking the snapshot
+
+        Returns a dictionary, see Cache.get_stats() for the keys.
+        """
+
+        stats = self.cache.get_stats()
+        if reset:
+            self.cache.reset_stats()
+        return stats
+
+    def SetSharedDisk(self, shared):
+        """Say if the on-disk tile cache is shared with other processes.
+
+        shared  True if other processes may save tiles to the tiles directory
+        """
+
+        self.cache.set_shared_disk(shared)
+
     def tile_on_disk(self, level, x, y):
         """Return True if tile at (level, x, y) is on-disk."""
 
@@ -248,6 +844,14 @@ class BaseTiles(object):
         #msg = 'You must override BaseTiles.setCallback(callback))'
         #raise NotImplementedError(msg)
 
+    def setServerStatusCallback(self, callback):
+        """Set the "server status" callback function.
+
+        Only used with internet tiles.  See "tiles_net.py".
+        """
+
+        pass
+
     def Geo2Tile(self, xgeo, ygeo):
         """Convert geo to tile fractional coordinates for level in use.
 
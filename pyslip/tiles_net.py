@@ -12,9 +12,11 @@ import time
 import math
 import threading
 import traceback
+import weakref
+import collections
+import email.utils
 import urllib
 import urllib.request as request
-import queue
 import wx
 import pyslip.tiles as tiles
 import pyslip.sys_tile_data as std
@@ -37,6 +39,163 @@ StatusError = {401: 'Looks like you need to be authorised for this server.',
                429: 'You are asking for too many tiles.',
               }
 
+# HTTP status of a 'too many requests' response
+StatusTooManyRequests = 429
+
+
+def retry_after_seconds(headers):
+    """Get the delay a server asked for in a 'Retry-After' header.
+
+    headers  the HTTP response headers
+
+    Returns the delay in seconds, or None if there is no usable header.
+    The header may be a number of seconds or an HTTP date.
+    """
+
+    value = headers.get('Retry-After', None) if headers else None
+    if not value:
+        return None
+
+    try:
+        return max(0, int(value))
+    except ValueError:
+        pass
+
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if when is None:
+        return None
+    return max(0, when.timestamp() - time.time())
+
+################################################################################
+# Statistics of tile fetches from the servers, updated by the workers
+################################################################################
+
+class FetchStats(object):
+    """Thread-safe counters for tile fetches from the servers."""
+
+    # upper bounds (seconds) of the fetch latency histogram buckets
+    # the last bucket holds everything slower
+    LatencyBuckets = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Zero all counters."""
+
+        with self.lock:
+            self.fetches = 0            # number of fetch attempts
+            self.bytes = 0              # bytes of good tile data fetched
+            self.errors = {}            # error status -> count
+            self.latency = {}           # server -> list of bucket counts
+
+    def record(self, server, latency, num_bytes, status=None):
+        """Record one tile fetch.
+
+        server     the server URL
+        latency    seconds the fetch took
+        num_bytes  bytes of tile data received
+        status     None if OK, else HTTP status code or error name
+        """
+
+        bucket = len(self.LatencyBuckets)
+        for (i, limit) in enumerate(self.LatencyBuckets):
+            if latency <= limit:
+                bucket = i
+                break
+
+        with self.lock:
+            self.fetches += 1
+            self.bytes += num_bytes
+            if status is not None:
+                self.errors[status] = self.errors.get(status, 0) + 1
+            try:
+                self.latency[server][bucket] += 1
+            except KeyError:
+                counts = [0] * (len(self.LatencyBuckets) + 1)
+                counts[bucket] = 1
+                self.latency[server] = counts
+
+    def snapshot(self):
+        """Return a dictionary copy of the counters.
+
+        fetches          number of fetch attempts
+        bytes_fetched    bytes of good tile data fetched
+        errors           dictionary of error status -> count
+        latency_buckets  upper bounds (seconds) of the histogram buckets
+        latency          dictionary of server -> list of bucket counts
+        """
+
+        with self.lock:
+            return {'fetches': self.fetches,
+                    'bytes_fetched': self.bytes,
+                    'errors': dict(self.errors),
+                    'latency_buckets': self.LatencyBuckets,
+                    'latency': {server: list(counts)
+                                for (server, counts) in self.latency.items()}}
+
+################################################################################
+# Queue of tile requests waiting for a worker
+################################################################################
+
+class RequestQueue(object):
+    """A first-in first-out queue of tile requests shared by the workers.
+
+    Unlike queue.Queue, requests no longer wanted can be removed and the
+    queue can be closed, which tells the waiting workers to finish.
+    """
+
+    def __init__(self):
+        self.requests = collections.deque()     # (level, x, y) tile keys
+        self.condition = threading.Condition()
+        self.closed = False
+
+    def __len__(self):
+        return len(self.requests)
+
+    def put(self, tile_key):
+        """Add a request to the end of the queue."""
+
+        with self.condition:
+            self.requests.append(tile_key)
+            self.condition.notify()
+
+    def get(self):
+        """Get the oldest request, waiting for one if the queue is empty.
+
+        Returns None if the queue is closed.
+        """
+
+        with self.condition:
+            while not self.requests and not self.closed:
+                self.condition.wait()
+            if self.closed:
+                return None
+            return self.requests.popleft()
+
+    def remove(self, unwanted):
+        """Remove requests from the queue.
+
+        unwanted  a set of the tile keys to remove
+        """
+
+        with self.condition:
+            self.requests = collections.deque(tile_key
+                                              for tile_key in self.requests
+                                              if tile_key not in unwanted)
+
+    def close(self):
+        """Drop all requests and tell the workers to finish."""
+
+        with self.condition:
+            self.closed = True
+            self.requests.clear()
+            self.condition.notify_all()
+
 ################################################################################
 # Worker class for server tile retrieval
 ################################################################################
@@ -46,19 +205,21 @@ class TileWorker(threading.Thread):
 
     def __init__(self, id_num, server, tilepath, requests, callback,
                  error_tile, content_type, rerequest_age, error_image,
-                 user_agent):
+                 user_agent, stats=None):
         """Prepare the tile worker.
 
         id_num         a unique numer identifying the worker instance
         server         server URL
         tilepath       path to tile on server
-        requests       the request queue
+        requests       the RequestQueue the worker gets requests from
         callback       function to call after tile available
         error_tile     image of error tile
         content_type   expected Content-Type string
         rerequest_age  number of days in tile age before re-requesting
                        (0 means don't update tiles)
         error_image    the image to return on some error
+        user_agent     User agent added to headers in requests
+        stats          a FetchStats object to record fetches in (optional)
 
         Results are returned in the callback() params.
         """
@@ -76,15 +237,24 @@ class TileWorker(threading.Thread):
         self.error_image = error_image
         self.daemon = True
         self.user_agent = user_agent
+        self.stats = stats
 
     def run(self):
         while True:
             # get zoom level and tile coordinates to retrieve
-            (level, x, y) = self.requests.get()
+            # the queue gives None when it's closed
+            tile_key = self.requests.get()
+            if tile_key is None:
+                break
+            (level, x, y) = tile_key
 
             # try to retrieve the image
             error = False
             pixmap = self.error_image
+            status = None
+            retry_after = None
+            num_bytes = 0
+            start = time.time()
             try:
                 tile_url = self.server + self.tilepath.format(Z=level, X=x, Y=y)
                 headers = {}
@@ -94,22 +264,400 @@ class TileWorker(threading.Thread):
                                            headers=headers))
                 content_type = response.info().get_content_type()
                 if content_type == self.content_type:
-                    data = io.BytesIO(response.read())
+                    raw = response.read()
+                    num_bytes = len(raw)
+                    data = io.BytesIO(raw)
                     pixmap = wx.Image(data, content_type).ConvertToBitmap()
                 else:
                     # show error tile, don't cache returned error tile
                     error = True
+                    status = 'content-type'
             except Exception as e:
                 error = True
+                status = getattr(e, 'code', None) or type(e).__name__
+                retry_after = retry_after_seconds(getattr(e, 'headers', None))
                 log('%s exception getting tile (%d,%d,%d)'
                         % (type(e).__name__, level, x, y))
 
             # call the callback function passing level, x, y and pixmap data
             # error is False if we want to cache this tile on-disk
-            wx.CallAfter(self.callback, level, x, y, pixmap, error)
+            wx.CallAfter(self.callback, level, x, y, pixmap, error,
+                         status, retry_after)
+
+            if self.stats:
+                self.stats.record(self.server, time.time() - start,
+                                  num_bytes, status)
+
+###############################################################################
+# A tile cache, request queue and workers shared by all Tiles objects for
+# one tileset.
+###############################################################################
+
+class TileService(object):
+    """Tile fetching and caching shared by Tiles objects for one tileset.
+
+    Every pySlip widget needs its own Tiles object as the object holds the
+    widget's current level.  The expensive parts - the in-memory and on-disk
+    tile cache, the request queue and the worker threads - are held here
+    and shared by all Tiles objects showing the same tileset.  A tile being
+    fetched for one widget isn't fetched again for another, and all widgets
+    share one in-memory LRU.
+
+    Tiles objects subscribe to the service and are told when a tile arrives.
+    The server is probed once for all subscribers, and each is told the
+    result.  When the last subscriber goes the service is closed, stopping
+    the workers and the disk sweeper, and a shared service is forgotten.
+    """
+
+    # maps tileset identity to the TileService for that tileset
+    # reentrant, a subscriber may be collected while we hold the lock
+    _services = {}
+    _services_lock = threading.RLock()
+
+    # limits for the cache of tiles the servers failed to supply
+    MaxFailedTiles = 10000
+    FailedTileTTL = 300
+
+    # seconds before asking again for a tile refused with 'too many
+    # requests', if the server didn't say
+    RateLimitedTileTTL = 30
+
+    @classmethod
+    def get_service(cls, identity, subscriber, **kwargs):
+        """Get the shared service for a tileset, creating it if required.
+
+        identity    a hashable value identifying the tileset
+        subscriber  the Tiles object subscribing to the service
+        kwargs      parameters for TileService()
+
+        If the service already exists it is adjusted to suit 'kwargs' too,
+        see reconcile().
+        """
+
+        with cls._services_lock:
+            service = cls._services.get(identity, None)
+            if service is not None and not service.closed:
+                service.reconcile(**kwargs)
+                service.subscribe(subscriber)
+                return service
+
+            service = cls(**kwargs)
+            service.identity = identity
+            cls._services[identity] = service
+            service.subscribe(subscriber)
+
+        return service
+
+    def __init__(self, tiles_dir, max_lru, servers, url_path,
+                 max_server_requests, content_type, error_tile,
+                 rerequest_age, user_agent, persist_index, disk_quota):
+        """Initialise the shared service.
+
+        tiles_dir            path to on-disk tile cache directory
+        max_lru              maximum number of cached in-memory tiles
+        servers              list of tile servers
+        url_path             path on server to each tile
+        max_server_requests  maximum number of requests per server
+        content_type         expected Content-Type string
+        error_tile           bitmap of the error tile
+        rerequest_age        time before which tiles are re-requested
+        user_agent           User agent added to headers in requests
+        persist_index        if True, save the on-disk tile index between runs
+        disk_quota           maximum bytes used by on-disk tiles
+        """
+
+        # save params needed to reconcile or add workers
+        self.servers = servers
+        self.url_path = url_path
+        self.max_server_requests = 0
+        self.content_type = content_type
+        self.error_tile = error_tile
+        self.rerequest_age = rerequest_age
+        self.user_agent = user_agent
+        self.disk_quota = disk_quota
+
+        # the tileset identity if shared, True once the last subscriber goes
+        self.identity = None
+        self.closed = False
+
+        # the in-memory cache backed by the on-disk cache
+        self.cache = tiles.Cache(tiles_dir=tiles_dir, max_lru=max_lru,
+                                 persist_index=persist_index,
+                                 disk_quota=disk_quota)
+
+        # tiles that recently failed to load, not requested again until expired
+        self.failed_tiles = tiles.NegativeCache(max_size=self.MaxFailedTiles,
+                                                ttl=self.FailedTileTTL)
+
+        # the Tiles objects told when a tile is available
+        self.subscribers = weakref.WeakSet()
+
+        # queued requests, maps (level, x, y) to a WeakSet of the Tiles
+        # objects wanting that tile
+        self.queued_requests = {}
+
+        # server fetch statistics, updated by the workers
+        self.fetch_stats = FetchStats()
+
+        # the server probe is done lazily in a background thread, the result
+        # is passed to each subscriber, see probe()
+        self.server_ok = None           # None means 'not yet known'
+        self.server_status = None       # message describing server state
+        self.server_status_code = None  # HTTP status code of any probe error
+        self.probe_lock = threading.Lock()
+        self.probe_started = False
+
+        # set up the request queue and worker threads
+        self.request_queue = RequestQueue()
+        self.workers = []
+        self.add_workers(max_server_requests)
+
+    def add_workers(self, max_server_requests):
+        """Start workers until there are enough for each server.
+
+        max_server_requests  the required number of workers for each server
+        """
+
+        for num_thread in range(self.max_server_requests, max_server_requests):
+            for server in self.servers:
+                worker = TileWorker(num_thread, server, self.url_path,
+                                    self.request_queue, self.tile_is_available,
+                                    self.error_tile, self.content_type,
+                                    self.rerequest_age, self.error_tile,
+                                    self.user_agent, stats=self.fetch_stats)
+                self.workers.append(worker)
+                worker.start()
+        self.max_server_requests = max(self.max_server_requests,
+                                       max_server_requests)
+
+    def reconcile(self, max_lru, max_server_requests, user_agent,
+                  persist_index, disk_quota, **kwargs):
+        """Adjust a shared service for another Tiles object's parameters.
+
+        max_lru              raises the in-memory LRU limit, if larger
+        max_server_requests  adds workers for each server, if larger
+        user_agent           logged if different, the workers keep theirs
+        persist_index        if True, the on-disk index is saved too
+        disk_quota           lowers the disk quota, if smaller
+
+        Other parameters are fixed by the tileset identity, or like
+        'rerequest_age' are used by each Tiles object itself.
+        """
+
+        if max_lru and max_lru > self.cache._max_lru:
+            self.cache._max_lru = max_lru
+
+        if max_server_requests > self.max_server_requests:
+            self.add_workers(max_server_requests)
+
+        if user_agent != self.user_agent:
+            log.warn("Shared tile service keeps user agent '%s', not '%s'"
+                     % (str(self.user_agent), str(user_agent)))
+
+        if persist_index:
+            self.cache.set_persist_index(True)
+
+        if disk_quota and (not self.disk_quota or disk_quota < self.disk_quota):
+            if self.disk_quota:
+                log.warn('Shared tile service disk quota lowered from %d to %d'
+                         % (self.disk_quota, disk_quota))
+            self.disk_quota = disk_quota
+            self.cache.set_disk_quota(disk_quota)
+
+    def subscribe(self, subscriber):
+        """Add a Tiles object to those told when a tile is available.
+
+        The service is closed when its last subscriber is collected.
+        """
+
+        self.subscribers.add(subscriber)
+        finalizer = weakref.finalize(subscriber, self.subscriber_gone)
+        finalizer.atexit = False
+
+    def unsubscribe(self, subscriber):
+        """Stop telling a Tiles object when a tile is available."""
+
+        self.subscribers.discard(subscriber)
+        self.flush(subscriber)
+        self.subscriber_gone()
+
+    def subscriber_gone(self):
+        """A subscriber went, close the service if it was the last one."""
+
+        with self._services_lock:
+            if self.closed or list(self.subscribers):
+                return
+            self.closed = True
+            if self._services.get(self.identity, None) is self:
+                del self._services[self.identity]
+
+        self.queued_requests.clear()
+        self.request_queue.close()
+        self.cache.close()
+
+    def probe(self):
+        """Start a background check of the tile server.
+
+        The check gets tile (0, 0, 0) from the first server.  It never
+        blocks the caller, each subscriber is told the result from the GUI
+        thread.  Does nothing if a probe already started.
+        """
+
+        with self.probe_lock:
+            if self.probe_started:
+                return
+            self.probe_started = True
+
+        probe = threading.Thread(target=self.probe_server, daemon=True)
+        probe.start()
+
+    def probe_server(self):
+        """Thread code that checks the tile server.
+
+        Sets self.server_ok and self.server_status and tells the subscribers
+        from the GUI thread.
+        """
+
+        test_url = self.servers[0] + self.url_path.format(Z=0, X=0, Y=0)
+        status_code = None
+        try:
+            headers = {}
+            if self.user_agent is not None:
+                headers['User-Agent'] = self.user_agent
+            request.urlopen(request.Request(test_url, headers=headers))
+            ok = True
+            msg = 'Tile server %s is responding' % self.servers[0]
+        except urllib.error.HTTPError as e:
+            status_code = e.code
+            ok = False
+            log('Error: test_url=%s, status_code=%s'
+                    % (test_url, str(status_code)))
+            msg = 'You got a %d error from: %s' % (status_code, test_url)
+            error_msg = StatusError.get(status_code, None)
+            if error_msg:
+                msg = '\n'.join([msg, error_msg])
+            log(msg)
+        except Exception as e:
+            ok = False
+            msg = ('%s exception doing simple connection to: %s'
+                   % (type(e).__name__, test_url))
+            log(msg)
+            log(''.join(traceback.format_exc()))
+
+        self.server_ok = ok
+        self.server_status = msg
+        self.server_status_code = status_code
+
+        if wx.GetApp() is not None:
+            wx.CallAfter(self.probe_done, ok, status_code, msg)
+
+    def probe_done(self, ok, status_code, msg):
+        """Tell all subscribers the result of the server probe.
+
+        Called in the GUI thread.
+        """
+
+        for subscriber in list(self.subscribers):
+            subscriber.server_status_known(ok, status_code, msg)
+
+    def request(self, tile_key, subscriber):
+        """Request a tile for a subscriber.
+
+        tile_key    (level, x, y) of the required tile
+        subscriber  the Tiles object wanting the tile
+
+        The tile is only queued if it isn't already queued.
+        """
+
+        wanted = self.queued_requests.get(tile_key, None)
+        if wanted is None:
+            wanted = weakref.WeakSet()
+            self.queued_requests[tile_key] = wanted
+            self.request_queue.put(tile_key)
+        wanted.add(subscriber)
+
+    def queued_for(self, subscriber):
+        """Return a list of tile keys queued for a subscriber."""
+
+        return [tile_key for (tile_key, wanted) in self.queued_requests.items()
+                if subscriber in wanted]
+
+    def flush(self, subscriber):
+        """Delete outstanding requests made by a subscriber.
+
+        Requests also made by other subscribers are kept.
+        """
+
+        unwanted = set()
+        for (tile_key, wanted) in self.queued_requests.items():
+            wanted.discard(subscriber)
+            if not wanted:
+                unwanted.add(tile_key)
+        if not unwanted:
+            return
+
+        for tile_key in unwanted:
+            del self.queued_requests[tile_key]
+        self.request_queue.remove(unwanted)
+
+    def get_stats(self, reset=False):
+        """Get a snapshot of the service statistics.
 
-            # finally, remove request from queue
-            self.requests.task_done()
+        reset  if True, zero the counters after taking the snapshot
+
+        Returns the tile cache and fetch statistics in one dictionary, plus:
+            queue_depth    number of requests waiting for a worker
+            queued_tiles   number of tiles requested but not yet available
+            failed_tiles   number of tiles in the recent failures cache
+        """
+
+        stats = self.cache.get_stats()
+        stats.update(self.fetch_stats.snapshot())
+        stats.update({'queue_depth': len(self.request_queue),
+                      'queued_tiles': len(self.queued_requests),
+                      'failed_tiles': len(self.failed_tiles)})
+        if reset:
+            self.cache.reset_stats()
+            self.fetch_stats.reset()
+        return stats
+
+    def tile_is_available(self, level, x, y, image, error, status=None,
+                          retry_after=None):
+        """Callback routine - a 'net tile is available.
+
+        level        level for the tile
+        x            x coordinate of tile
+        y            y coordinate of tile
+        image        tile image data
+        error        True if image is 'error' image, don't cache in that case
+        status       HTTP status code or error name of any error
+        retry_after  seconds the server asked us to wait, if it said
+
+        Called in the GUI thread.  Caches the tile and tells all subscribers.
+        """
+
+        # put good image into in-memory and on-disk cache, error images are
+        # only remembered in the failed tiles cache
+        # a 'too many requests' failure isn't the tile's fault, so we ask
+        # again when the server said to, or fairly soon
+        if error:
+            ttl = None
+            if retry_after is not None:
+                ttl = min(retry_after, self.FailedTileTTL)
+            elif status == StatusTooManyRequests:
+                ttl = self.RateLimitedTileTTL
+            self.failed_tiles.add((level, x, y), ttl)
+        else:
+            self.failed_tiles.discard((level, x, y))
+            self.cache[(level, x, y)] = image
+
+        # remove the request from the queued requests
+        # note that it may not be there - a level change can flush the dict
+        self.queued_requests.pop((level, x, y), None)
+
+        # tell the world a new tile is available
+        for subscriber in list(self.subscribers):
+            subscriber.tile_is_available(level, x, y, image, error)
 
 ###############################################################################
 # Class for a server tile source.  Extend the BaseTiles class.
@@ -133,9 +681,14 @@ class Tiles(tiles.BaseTiles):
     # the number of seconds in a day
     SecondsInADay = 60 * 60 * 24
 
+    # maximum number of offline misses remembered, the oldest are dropped
+    MaxOfflineMisses = 1000
+
     def __init__(self, levels, tile_width, tile_height, tiles_dir, max_lru,
                  servers, url_path, max_server_requests,
-                 refetch_days=RefreshTilesAfterDays, user_agent=None):
+                 refetch_days=RefreshTilesAfterDays, user_agent=None,
+                 offline=False, persist_index=False, disk_quota=None,
+                 shared=True):
         """Initialise a Tiles instance.
 
         levels               a list of level numbers that are to be served
@@ -150,24 +703,26 @@ class Tiles(tiles.BaseTiles):
                              (0 means don't ever update tiles)
         user_agent           User agent added to headers in requests.
                              It may be required by some tile providers.
+        offline              if True, start in offline mode (see SetOffline())
+        persist_index        if True, save the on-disk tile index between runs
+        disk_quota           maximum bytes used by on-disk tiles, least
+                             recently used tiles are evicted (None: no limit)
+        shared               if True, share the tile cache, request queue and
+                             workers with other Tiles objects for the same
+                             tileset (see TileService)
         """
 
-        # prepare the tile cache directory, if required
-        # we have to do this *before* the base class initialization!
-        for level in levels:
-            level_dir = os.path.join(tiles_dir, '%d' % level)
-            if not os.path.isdir(level_dir):
-                os.makedirs(level_dir)
-
-        # perform the base class initialization
-        super().__init__(levels, tile_width, tile_height, tiles_dir, max_lru)
+        # make sure the tile cache directory exists, level directories are
+        # created on demand when a tile is first written to disk
+        if not os.path.isdir(tiles_dir):
+            os.makedirs(tiles_dir)
 
         # save params not saved in super()
         self.servers = servers
         self.url_path = url_path
         self.max_requests = max_server_requests
 
-        # callback must be set by higher-level copde
+        # callback must be set by higher-level code
         self.callback = None
 
         # calculate a re-request age, if specified
@@ -175,9 +730,6 @@ class Tiles(tiles.BaseTiles):
         if refetch_days:
             self.rerequest_age = (time.time() - refetch_days*self.SecondsInADay)
 
-        # tiles extent for tile data (left, right, top, bottom)
-        self.extent = (-180.0, 180.0, -85.0511, 85.0511)
-
         # figure out tile filename extension from 'url_path'
         tile_extension = os.path.splitext(url_path)[1][1:]
         tile_extension_lower = tile_extension.lower()      # ensure lower case
@@ -198,9 +750,6 @@ class Tiles(tiles.BaseTiles):
         elif tile_extension_lower == 'png':
             self.content_type = 'image/png'
 
-        # set the list of queued unsatisfied requests to 'empty'
-        self.queued_requests = {}
-
         # prepare the "pending" and "error" images
         self.pending_tile_image = std.getPendingImage()
         self.pending_tile = self.pending_tile_image.ConvertToBitmap()
@@ -208,42 +757,51 @@ class Tiles(tiles.BaseTiles):
         self.error_tile_image = std.getErrorImage()
         self.error_tile = self.error_tile_image.ConvertToBitmap()
 
-        # test the tile server, get tile at (0, 0, 0)
-        test_url = self.servers[0] + self.url_path.format(Z=0, X=0, Y=0)
-        try:
-            headers = {}
-            if user_agent is not None:
-                headers['User-Agent'] = user_agent
-            request.urlopen(request.Request(test_url, headers=headers))
-        except urllib.error.HTTPError as e:
-            # if it's fatal, log it and die
-            status_code = e.code
-            log('Error: test_url=%s, status_code=%s'
-                    % (test_url, str(status_code)))
-            error_msg = StatusError.get(status_code, None)
-            if status_code:
-                msg = '\n'.join(['You got a %d error from: %s' % (status_code, test_url),
-                                 error_msg])
-                log(msg)
-                raise RuntimeError(msg)
-
-            log('%s exception doing simple connection to: %s'
-                    % (type(e).__name__, test_url))
-            log(''.join(traceback.format_exc()))
-            raise RuntimeError
+        # get the (possibly shared) cache, request queue and workers
+        service_params = {'tiles_dir': tiles_dir,
+                          'max_lru': max_lru,
+                          'servers': servers,
+                          'url_path': url_path,
+                          'max_server_requests': max_server_requests,
+                          'content_type': self.content_type,
+                          'error_tile': self.error_tile,
+                          'rerequest_age': self.rerequest_age,
+                          'user_agent': user_agent,
+                          'persist_index': persist_index,
+                          'disk_quota': disk_quota}
+        if shared:
+            identity = (os.path.abspath(tiles_dir), tuple(servers), url_path)
+            self.service = TileService.get_service(identity, self,
+                                                   **service_params)
+        else:
+            self.service = TileService(**service_params)
+            self.service.subscribe(self)
 
-        # set up the request queue and worker threads
-        self.request_queue = queue.Queue()  # entries are (level, x, y)
-        self.workers = []
-        for server in self.servers:
-            for num_thread in range(self.max_requests):
-                worker = TileWorker(num_thread, server, self.url_path,
-                                    self.request_queue, self.tile_is_available,
-                                    self.error_tile, self.content_type,
-                                    self.rerequest_age, self.error_tile,
-                                    user_agent)
-                self.workers.append(worker)
-                worker.start()
+        # perform the base class initialization
+        super().__init__(levels, tile_width, tile_height, tiles_dir, max_lru,
+                         cache=self.service.cache)
+
+        # tiles extent for tile data (left, right, top, bottom)
+        self.extent = (-180.0, 180.0, -85.0511, 85.0511)
+
+        # shared state we use directly
+        self.failed_tiles = self.service.failed_tiles
+        self.request_queue = self.service.request_queue
+        self.workers = self.service.workers
+
+        # the shared service probes the server, the result is reported
+        # through the 'server status' callback
+        self.user_agent = user_agent
+        self.server_status_callback = None
+
+        # offline mode state
+        # 'offline_misses' remembers recent tiles to fetch when we go back
+        # online, the dict is used as a bounded ordered set
+        # 'synth_tiles' holds tiles made from cached ancestor tiles, or None
+        # if there was no ancestor
+        self.offline = offline
+        self.offline_misses = {}
+        self.synth_tiles = {}
 
     def UseLevel(self, level):
         """Prepare to serve tiles from the required level.
@@ -271,6 +829,9 @@ class Tiles(tiles.BaseTiles):
         # sit waiting for tiles to arrive that won't be shown.
         self.FlushRequests()
 
+        # made-up offline tiles are only kept for the level in use
+        self.synth_tiles.clear()
+
         return True
 
     def GetTile(self, x, y):
@@ -289,20 +850,133 @@ class Tiles(tiles.BaseTiles):
         return old tile after starting the process to get new tile from servers.
         """
 
+        # if we are wrapping X, all copies of a tile use the one cache entry
+        if self.wrap_x:
+            x %= self.num_tiles_x
+
         try:
             # get tile from cache
             tile = self.cache[(self.level, x, y)]
-            if self.tile_on_disk(self.level, x, y):
+            if self.rerequest_age:
+                # tile_date() is None if tile isn't on-disk
                 tile_date = self.cache.tile_date((self.level, x, y))
-                if self.rerequest_age and (tile_date < self.rerequest_age):
+                if (tile_date is not None and tile_date < self.rerequest_age
+                        and (self.level, x, y) not in self.failed_tiles):
                     self.get_server_tile(self.level, x, y)
         except KeyError as e:
+            # a recent failure, don't ask again until the failure expires
+            if (self.level, x, y) in self.failed_tiles:
+                return self.error_tile
+
             # not cached, start process of getting tile from 'net, return 'pending' image
             self.get_server_tile(self.level, x, y)
             tile = self.pending_tile
+            if self.offline:
+                # no tile coming, make do with an enlarged ancestor tile
+                synth = self.synthesise_tile(self.level, x, y)
+                if synth is not None:
+                    tile = synth
 
         return tile
 
+    def SetOffline(self, offline):
+        """Set or clear offline mode.
+
+        offline  True if no network requests are to be made
+
+        In offline mode tiles are served from the in-memory and on-disk caches
+        only.  A missing tile is made from the nearest cached ancestor tile
+        and the miss is remembered.  When offline mode is turned off the
+        remembered misses at the current level are requested from the
+        servers, misses at other levels are requested when next shown.
+        """
+
+        if offline == self.offline:
+            return
+
+        self.offline = offline
+
+        if offline:
+            # anything not yet requested becomes a miss for later
+            for tile_key in self.service.queued_for(self):
+                self.add_offline_miss(tile_key)
+            self.FlushRequests()
+        else:
+            # back online, forget made-up tiles and fetch the misses
+            self.synth_tiles.clear()
+            misses = [(level, x, y) for (level, x, y) in self.offline_misses
+                      if level == self.level]
+            self.offline_misses.clear()
+            for (level, x, y) in misses:
+                self.get_server_tile(level, x, y)
+
+    def add_offline_miss(self, tile_key):
+        """Remember a tile missed in offline mode.
+
+        tile_key  (level, x, y) of the missed tile
+
+        Only the most recent 'MaxOfflineMisses' misses are kept.
+        """
+
+        self.offline_misses.pop(tile_key, None)
+        self.offline_misses[tile_key] = True
+        if len(self.offline_misses) > self.MaxOfflineMisses:
+            del self.offline_misses[next(iter(self.offline_misses))]
+
+    def IsOffline(self):
+        """Return True if the tile source is in offline mode."""
+
+        return self.offline
+
+    def synthesise_tile(self, level, x, y):
+        """Make a tile from a cached ancestor tile.
+
+        level, x, y  identify the required tile
+
+        Look for the nearest lower level tile that covers the required tile
+        in the in-memory and on-disk caches.  If found, the covering part of
+        the ancestor is enlarged to tile size.  Returns the new bitmap or None
+        if no ancestor is cached.
+
+        Both results are remembered in 'synth_tiles' until the level changes,
+        a failure until a tile that could be an ancestor arrives.
+        """
+
+        tile_key = (level, x, y)
+        try:
+            return self.synth_tiles[tile_key]
+        except KeyError:
+            pass
+
+        for delta in range(1, level - self.min_level + 1):
+            # size of the required tile within the ancestor, give up if tiny
+            sub_width = self.tile_size_x >> delta
+            sub_height = self.tile_size_y >> delta
+            if sub_width < 1 or sub_height < 1:
+                break
+
+            anc_x = x >> delta
+            anc_y = y >> delta
+            try:
+                ancestor = self.cache[(level - delta, anc_x, anc_y)]
+            except KeyError:
+                continue
+            if ancestor is self.error_tile:
+                continue
+
+            sub_x = (x - (anc_x << delta)) * sub_width
+            sub_y = (y - (anc_y << delta)) * sub_height
+            image = ancestor.ConvertToImage()
+            image = image.GetSubImage(wx.Rect(sub_x, sub_y,
+                                              sub_width, sub_height))
+            image = image.Scale(self.tile_size_x, self.tile_size_y)
+            bitmap = image.ConvertToBitmap()
+            self.synth_tiles[tile_key] = bitmap
+            return bitmap
+
+        self.synth_tiles[tile_key] = None
+        return None
+
     def GetInfo(self, level):
         """Get tile info for a particular level.
 
@@ -327,36 +1001,91 @@ class Tiles(tiles.BaseTiles):
 
         return (self.num_tiles_x, self.num_tiles_y, None, None)
 
+    def GetStats(self, reset=False):
+        """Get a snapshot of the tile source statistics.
+
+        reset  if True, zero the counters after taking the snapshot
+
+        Returns a dictionary, see TileService.get_stats() for the keys.
+        The cache, queue and workers are shared by all Tiles objects for
+        the same tileset, so the statistics are too.
+        """
+
+        return self.service.get_stats(reset)
+
     def FlushRequests(self):
         """Delete any outstanding tile requests."""
 
         # if we are serving server tiles ...
+        # requests also made by other Tiles objects are kept
         if self.servers:
-            with self.request_queue.mutex:
-                self.request_queue.queue.clear()
-            self.queued_requests.clear()
+            self.service.flush(self)
 
     def get_server_tile(self, level, x, y):
         """Start the process to get a server tile.
 
         level, x, y  identify the required tile
 
-        If we don't already have this tile (or getting it), queue a request and
-        also put the request into a 'queued request' dictionary.  We
-        do this since we can't peek into a queue to see what's there.
+        The request goes to the shared TileService which only queues it if
+        the tile isn't already being fetched for any widget.
         """
 
-        tile_key = (level, x, y)
-        if tile_key not in self.queued_requests:
-            # add tile request to the server request queue
-            self.request_queue.put(tile_key)
-            self.queued_requests[tile_key] = True
+        # in offline mode just remember the miss for later
+        if self.offline:
+            self.add_offline_miss((level, x, y))
+            return
+
+        # first server request starts the server probe
+        if not self.service.probe_started:
+            self.service.probe()
+
+        self.service.request((level, x, y), self)
+
+    def ProbeServer(self):
+        """Start a background check of the tile server.
+
+        The check is shared by all Tiles objects for the tileset, see
+        TileService.probe().  It never blocks the caller, the result is
+        reported through the callback set with setServerStatusCallback().
+        """
+
+        self.service.probe()
+
+    def server_status_known(self, ok, status_code, msg):
+        """The server probe finished, tell the 'server status' callback.
+
+        ok           True if the server responded
+        status_code  HTTP status code of any error
+        msg          describes the server state
+
+        Called in the GUI thread.
+        """
+
+        if self.server_status_callback:
+            self.server_status_callback(ok, status_code, msg)
+
+    def setServerStatusCallback(self, callback):
+        """Set the "server status" callback.
+
+        callback  reference to object to call when the server state is known
+
+        The callback is called as callback(ok, status_code, msg) where 'ok'
+        is True if the server responded, 'status_code' is the HTTP status code
+        of any error (None if not an HTTP error) and 'msg' describes the
+        server state.  If the state is already known the callback is called
+        immediately.
+        """
+
+        self.server_status_callback = callback
+        service = self.service
+        if callback and service.server_ok is not None:
+            wx.CallAfter(callback, service.server_ok,
+                         service.server_status_code, service.server_status)
 
     def tile_on_disk(self, level, x, y):
         """Return True if tile at (level, x, y) is on-disk."""
 
-        tile_path = self.cache.tile_path((level, x, y))
-        return os.path.exists(tile_path)
+        return self.cache.tile_on_disk((level, x, y))
 
     def setCallback(self, callback):
         """Set the "tile available" callback.
@@ -373,28 +1102,30 @@ class Tiles(tiles.BaseTiles):
         x       x coordinate of tile
         y       y coordinate of tile
         image   tile image data
-        error   True if image is 'error' image, don't cache in that case
+        error   True if image is 'error' image
+
+        Called by the shared TileService, which has already cached the tile.
         """
 
-        # put image into in-memory cache, but error images don't go to disk
-        self.cache[(level, x, y)] = image
-        if not error:
-            self.cache._put_to_back((level, x, y), image)
+        # any made-up tile is now superseded
+        self.synth_tiles.pop((level, x, y), None)
 
-        # remove the request from the queued requests
-        # note that it may not be there - a level change can flush the dict
-        try:
-            del self.queued_requests[(level, x, y)]
-        except KeyError:
-            pass
+        # a new ancestor tile may make up tiles we couldn't before
+        if level < self.level:
+            self.synth_tiles = {tile_key: bitmap
+                                for (tile_key, bitmap) in self.synth_tiles.items()
+                                if bitmap is not None}
+
+        # a tile for another level isn't shown, don't bother the widget
+        if level != self.level:
+            return
 
         # tell the world a new tile is available
+        # don't raise an error, other subscribers must still be told
         if self.callback:
             self.callback(level, x, y, image, True)
         else:
-            msg = f'tile_is_available: self.callback is NOT SET!'
-            log.error(msg)
-            raise RuntimeError(msg)
+            log.error('tile_is_available: self.callback is NOT SET!')
 
     def SetAgeThresholdDays(self, num_days):
         """Set the tile refetch threshold time.